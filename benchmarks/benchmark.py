@@ -0,0 +1,423 @@
+""" Benchmark suite. Times the force evaluation of the Lennard-Jones
+potential and full integration steps of the solver over the number of
+particles, the number of dimensions, the boundary conditions and the
+integrators, and the startup time, i.e., importing the package and
+setting up a solver. Every case records the wall time, the peak memory traced by
+tracemalloc, the peak resident set size of the process and the number of
+evaluations (or steps) per second. The results can be stored as a
+baseline, and later runs compared against it, where cases that are
+slower than the baseline by more than a threshold are flagged.
+
+Usage from the root of the repository, where the baseline is recorded on
+the commit to compare against, on the same machine:
+    python -m benchmarks.benchmark --save-baseline baseline.json
+    python -m benchmarks.benchmark --baseline baseline.json --threshold 0.2
+
+The number of particles is given approximately, the FCC lattice with the
+closest number of unit cells is used. The dense distance matrix is only
+benchmarked up to DENSELIMIT particles, larger systems use cell lists.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import platform
+import itertools
+import contextlib
+import tracemalloc
+import numpy as np
+
+try:
+    import resource
+except ImportError:     # not available on Windows
+    resource = None
+
+SIZES = [32, 256, 2048, 16384, 100000]      # approximate number of particles
+DIMENSIONS = [1, 2, 3]
+BOUNDARIES = ["open", "reflective", "periodic"]
+INTEGRATORS = ["ForwardEuler", "EulerChromer", "VelocityVerlet", "MultipleTimestep"]
+LATTICE = {1 : 2.2, 2 : 2.2, 3 : 1.7}       # unit cell length in every dimension
+DENSELIMIT = 2048                           # largest system with dense distances
+MINTIME = 0.5                               # minimum time of every case in seconds
+SUITES = ["forces", "steps", "startup"]
+STAGES = ["import", "construct"]            # stages of the startup suite
+
+def cellsFor(size, dim):
+    """ Number of FCC unit cells in every dimension giving approximately
+    'size' particles.
+
+    Parameters
+    ----------
+    size : int
+        approximate number of particles
+    dim : int
+        number of dimensions
+
+    Returns
+    -------
+    int
+        number of unit cells
+    """
+    return max(1, int(round((size / (dim + 1)) ** (1 / dim))))
+
+def expandCases(suites, sizes, dims, boundaries, integrators):
+    """ Expand the benchmark axes into a list of cases.
+
+    Parameters
+    ----------
+    suites : list of str
+        'forces', 'steps' and/or 'startup'
+    sizes : list of int
+        approximate number of particles
+    dims : list of int
+        number of dimensions
+    boundaries : list of str
+        boundary conditions
+    integrators : list of str
+        integrators used by the 'steps' suite
+
+    Returns
+    -------
+    list of dict
+        parameters of every case
+    """
+    cases = []
+    for suite in suites:
+        if suite == "startup":
+            for stage in STAGES:
+                cases.append({"suite" : suite, "stage" : stage,
+                              "name" : "startup " + stage})
+            continue
+        methods = integrators if suite == "steps" else [None]
+        for size, dim, boundary, method in itertools.product(sizes, dims, boundaries, methods):
+            neighbors = ["dense", "cells"] if size <= DENSELIMIT else ["cells"]
+            if suite == "steps":
+                neighbors = neighbors[-1:]
+            for neighbor in neighbors:
+                case = {"suite" : suite, "size" : size, "dim" : dim,
+                        "boundaries" : boundary, "neighbors" : neighbor,
+                        "integrator" : method}
+                case["name"] = caseName(case)
+                cases.append(case)
+    return cases
+
+def caseName(case):
+    """ Unique name of a case, used to compare with the baseline.
+    """
+    name = "{suite} P={size} D={dim} {boundaries} {neighbors}".format(**case)
+    if case["integrator"] is not None:
+        name += " " + case["integrator"]
+    return name
+
+def setupSolver(case, steps=1):
+    """ Set up the solver, potential and integrator of a case.
+
+    Parameters
+    ----------
+    case : dict
+        parameters of the case
+    steps : int
+        number of steps of the solver
+
+    Returns
+    -------
+    obj
+        MDSolver object
+    obj
+        Lennard-Jones potential
+    obj
+        integrator, or None for the 'forces' suite
+    """
+    from mdsolver import MDSolver
+    from mdsolver import integrator
+    from mdsolver.potential import LennardJones
+    from mdsolver.initpositions import FCC
+    from mdsolver.initvelocities import Temperature
+    from mdsolver.boundaryconditions import Open, Reflective, Periodic
+    from mdsolver.neighborlists import CellList
+
+    np.random.seed(0)
+    dim = case["dim"]
+    cells = cellsFor(case["size"], dim)
+    lenbulk = cells * LATTICE[dim]
+    boundaries = {"open" : lambda: Open(),
+                  "reflective" : lambda: Reflective(lenbulk),
+                  "periodic" : lambda: Periodic(lenbulk)}[case["boundaries"]]()
+    dt = 0.005
+    solver = MDSolver(positions=FCC(cells, lenbulk, dim),
+                      velocities=Temperature(100),
+                      boundaries=boundaries,
+                      T=(steps + 0.5) * dt,
+                      dt=dt,
+                      buffersize=1,
+                      initialdump=None)
+    neighbors = CellList if case["neighbors"] == "cells" else lambda: None
+    potential = LennardJones(solver, cutoff=3, neighbors=neighbors())
+    method = None
+    if case["integrator"] == "MultipleTimestep":
+        short = LennardJones(solver, cutoff=2, neighbors=neighbors())
+        method = integrator.MultipleTimestep(solver, short)
+    elif case["integrator"] is not None:
+        method = getattr(integrator, case["integrator"])(solver)
+    return solver, potential, method
+
+def runCase(case, mintime=MINTIME):
+    """ Time a case. The 'forces' suite evaluates the potential of the
+    initial positions repeatedly, the 'steps' suite runs the solver. The
+    case is repeated until it has run for at least 'mintime' seconds, and
+    the peak memory is found in a separate run with tracemalloc, which
+    slows down the allocations.
+
+    Parameters
+    ----------
+    case : dict
+        parameters of the case
+    mintime : float
+        minimum time of the case in seconds
+
+    Returns
+    -------
+    dict
+        results of the case
+    """
+    if case["suite"] == "startup":
+        return runStartup(case, mintime)
+        
+    def once(steps):
+        solver, potential, method = setupSolver(case, steps)
+        if method is None:
+            start = time.perf_counter()
+            potential(solver.r[0])
+        else:
+            start = time.perf_counter()
+            solver(potential=potential, integrator=method, poteng=False,
+                   progress=False)
+        return time.perf_counter() - start, solver
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Warm up, e.g. compile the kernels, and find the number of steps
+        elapsed, solver = once(1)
+        steps = 1 if case["suite"] == "forces" else \
+                int(np.clip(mintime / max(elapsed, 1e-6), 5, 1000))
+        repeats, times = 0, []
+        while sum(times) < mintime or repeats < 3:
+            times.append(once(steps)[0])
+            repeats += 1
+
+        tracemalloc.start()
+        once(steps)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    walltime = float(np.median(times))
+    result = dict(case)
+    result.update(numparticles=solver.numparticles,
+                  steps=steps,
+                  repeats=repeats,
+                  walltime=walltime,
+                  stepspersecond=steps / walltime,
+                  atomstepspersecond=steps * solver.numparticles / walltime,
+                  peakmemory=peak / 2**20,
+                  peakrss=peakRSS())
+    return result
+
+def runStartup(case, mintime=MINTIME):
+    """ Time the startup. The 'import' stage imports the package, the
+    potential and the integrator in a fresh interpreter, as a script
+    running a simulation does, and the 'construct' stage sets up a solver of 32 
+    particles in this process. The stage is repeated until it has run 
+    for at least 'mintime' seconds.
+
+    Parameters
+    ----------
+    case : dict
+        parameters of the case
+    mintime : float
+        minimum time of the case in seconds
+
+    Returns
+    -------
+    dict
+        results of the case
+    """
+    from mdsolver import MDSolver
+    from mdsolver.initpositions import FCC
+    from mdsolver.initvelocities import Temperature
+    from mdsolver.boundaryconditions import Periodic
+
+    if case["stage"] == "import":
+        # Make the package found by the child from any directory
+        import mdsolver
+        root = os.path.dirname(os.path.dirname(os.path.abspath(mdsolver.__file__)))
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+        code = ("import time; start = time.perf_counter(); "
+                "import mdsolver, mdsolver.potential, mdsolver.integrator; "
+                "print(time.perf_counter() - start)")
+        def once():
+            child = subprocess.run([sys.executable, "-c", code], env=env,
+                                   capture_output=True, text=True, check=True)
+            return float(child.stdout.split()[-1])
+    else:
+        def once():
+            start = time.perf_counter()
+            MDSolver(positions=FCC(cells=2, lenbulk=3.4),
+                     velocities=Temperature(100),
+                     boundaries=Periodic(3.4),
+                     initialdump=None)
+            return time.perf_counter() - start
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        times = []
+        while sum(times) < mintime or len(times) < 3:
+            times.append(once())
+        peak, numparticles = None, None
+        if case["stage"] == "construct":
+            tracemalloc.start()
+            once()
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+            numparticles = 32
+
+    walltime = float(np.median(times))
+    result = dict(case)
+    result.update(numparticles=numparticles,
+                  steps=1,
+                  repeats=len(times),
+                  walltime=walltime,
+                  stepspersecond=1 / walltime,
+                  atomstepspersecond=None,
+                  peakmemory=peak,
+                  peakrss=peakRSS())
+    return result
+
+def peakRSS():
+    """ Peak resident set size of the process in MB, or None if it is
+    not available.
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+def environment():
+    """ Versions of the software the benchmarks were run with.
+    """
+    return {"python" : platform.python_version(),
+            "numpy" : np.__version__,
+            "platform" : platform.platform(),
+            "processor" : platform.processor(),
+            "date" : time.strftime("%Y-%m-%d %H:%M:%S")}
+
+def compare(results, baseline, threshold):
+    """ Compare the wall time of the cases with a baseline.
+
+    Parameters
+    ----------
+    results : list of dict
+        results of every case
+    baseline : dict
+        stored results, as written by '--save-baseline'
+    threshold : float
+        relative slowdown flagged as a regression, e.g. 0.2 for 20%
+
+    Returns
+    -------
+    list of dict
+        the results that are slower than the baseline by more than the
+        threshold
+    """
+    stored = {result["name"] : result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        base = stored.get(result["name"])
+        if base is None:
+            result["ratio"] = None
+            continue
+        result["ratio"] = result["walltime"] / base["walltime"]
+        if result["ratio"] > 1 + threshold:
+            regressions.append(result)
+    return regressions
+
+def printResults(results, regressions=()):
+    """ Print the results table to terminal.
+
+    Parameters
+    ----------
+    results : list of dict
+        results of every case
+    regressions : list of dict
+        results flagged as regressions
+    """
+    print("\n\n" + 34 * "=", " BENCHMARKS ", 34 * "=")
+    print("{:<54} {:>7} {:>10} {:>10} {:>8} {:>6}".format(
+          "case", "P", "time [s]", "steps/s", "mem [MB]", "ratio"))
+    for r in results:
+        ratio = "" if r.get("ratio") is None else "{:.2f}".format(r["ratio"])
+        if any(r is regression for regression in regressions):
+            ratio += " !"
+        memory = "" if r["peakmemory"] is None else "{:.1f}".format(r["peakmemory"])
+        print("{:<54} {:>7} {:>10.4g} {:>10.4g} {:>8} {:>6}".format(
+              r["name"], r["numparticles"] or "", r["walltime"],
+              r["stepspersecond"], memory, ratio))
+    print(82 * "=" + "\n\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the force "
+                                     "evaluation, the integration steps and "
+                                     "the startup")
+    parser.add_argument("--suite", nargs="+", default=SUITES, choices=SUITES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES,
+                        help="approximate numbers of particles")
+    parser.add_argument("--dims", nargs="+", type=int, default=DIMENSIONS,
+                        choices=DIMENSIONS)
+    parser.add_argument("--boundaries", nargs="+", default=BOUNDARIES,
+                        choices=BOUNDARIES)
+    parser.add_argument("--integrators", nargs="+", default=INTEGRATORS,
+                        choices=INTEGRATORS)
+    parser.add_argument("--mintime", type=float, default=MINTIME,
+                        help="minimum time of every case in seconds")
+    parser.add_argument("--output", help="JSON file the results are written to")
+    parser.add_argument("--save-baseline", help="store the results as a baseline")
+    parser.add_argument("--baseline", help="compare the results with a baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown flagged as a regression")
+    args = parser.parse_args(argv)
+
+    cases = expandCases(args.suite, args.sizes, args.dims, args.boundaries,
+                        args.integrators)
+
+    results = []
+    for k, case in enumerate(cases):
+        print("[{}/{}] {}".format(k + 1, len(cases), case["name"]), flush=True)
+        results.append(runCase(case, args.mintime))
+
+    regressions = []
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        stored = baseline.get("environment", {})
+        if any(stored.get(key) != environment()[key] for key in ("platform", "processor")):
+            print("Warning: the baseline was recorded on another machine ({}, {})"
+                  .format(stored.get("platform"), stored.get("processor")))
+        regressions = compare(results, baseline, args.threshold)
+    printResults(results, regressions)
+
+    report = {"environment" : environment(), "results" : results}
+    for filename in (args.output, args.save_baseline):
+        if filename is not None:
+            with open(filename, 'w') as f:
+                json.dump(report, f, indent=2)
+
+    if regressions:
+        print("{} case(s) slower than the baseline by more than {:.0%}"
+              .format(len(regressions), args.threshold))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,40 +1,108 @@
+import os
+import pickle
+import itertools
 import numpy as np
-import matplotlib.pyplot as plt
+from mdsolver.sinks import DistanceSink, ThreadedSink, XYZSink
 import warnings
 warnings.filterwarnings("ignore", category=RuntimeWarning) 
 
+class State:
+    """ Lightweight view of the state of the system at one step, yielded
+    by MDSolver.steps and passed to the registered callbacks. The arrays
+    are not copied.
+    
+    Parameters
+    ----------
+    t : int
+        current step
+    time : float
+        current time
+    r : ndarray
+        current position array
+    v : ndarray
+        current velocity array
+    a : ndarray
+        current acceleration array
+    u : float
+        current potential energy
+    d : ndarray
+        current distance matrix, if computed by the potential
+    """
+    __slots__ = ("t", "time", "r", "v", "a", "u", "d")
+    
+    def __init__(self, t, time, r, v, a, u, d):
+        self.t = t
+        self.time = time
+        self.r = r
+        self.v = v
+        self.a = a
+        self.u = u
+        self.d = d
+        
+    def __repr__(self):
+        return "State at step {} (t={:g})".format(self.t, self.time)
+
 class MDSolver:
     """ Initialize the MDSolver class. This includes defining the
-    time scales, initialize positions and velocities, and define
-    matplotlib fixes.
+    time scales and initialize positions and velocities. Matplotlib is
+    imported and set up the first time a plot is made.
     
     Parameters
     ----------
     positions : obj
         class object defined by initpositions.py. Face-centered cube
-        with length 3 and 4 particles as default.
+        with length 3 and 4 particles if None (default). If the positions have
+        a leading replica axis (R, P, D), all replicas are integrated
+        together in one vectorized step.
     velocity : obj
-        class object defined by initvelocities.py. No velocity as default.
+        class object defined by initvelocities.py. No velocity if None
+        (default).
     boundaries : obj
         class object defined by boundaryconditions.py. Open boundaries 
-        as default.
+        if None (default).
     T : float
         total time
     dt : float
         time step
+    buffersize : int
+        number of states kept in memory. If None (default), the full
+        trajectory is stored. Otherwise, only the last 'buffersize' 
+        states are kept in a ring buffer, and sinks should be used to 
+        store positions, velocities and observables.
+    initialdump : str
+        name and address of the file the initial positions are dumped to.
+        If None, the initial positions are not dumped.
     """
     
-    from mdsolver.initpositions import FCC
-    from mdsolver.initvelocities import Zero
-    from mdsolver.boundaryconditions import Open
+    # for plotting
+    label_size = {"size":14}    # Dictionary with size
+    plotStyle = False           # Whether or not the plot style is set
     
-    def __init__(self, positions=FCC(cells=1, lenbulk=3), 
-                       velocities=Zero(), 
-                       boundaries=Open(),
+    def __init__(self, positions=None, 
+                       velocities=None, 
+                       boundaries=None,
                        T=5, 
-                       dt=0.01):
+                       dt=0.01,
+                       buffersize=None,
+                       initialdump="initialPositions.data"):
         
+        if positions is None:
+            from mdsolver.initpositions import FCC
+            positions = FCC(cells=1, lenbulk=3)
+        if velocities is None:
+            from mdsolver.initvelocities import Zero
+            velocities = Zero()
+        if boundaries is None:
+            from mdsolver.boundaryconditions import Open
+            boundaries = Open()
+            
         self.boundaries = boundaries
+        self.buffersize = buffersize
+        self.resume = None
+        self.integrator = None
+        self.stepTimes = None
+        self.callbacks = []
+        self.profiler = None
         
         # Define time scale and number of steps
         self.T = T
@@ -43,25 +111,27 @@ class MDSolver:
         self.time = np.linspace(0, T, self.N)
         
         # Initialize positions
-        r0 = positions()
-        self.numparticles = len(r0)
-        self.numdimensions = len(r0[0])
-        self.r = np.zeros((self.N+1, self.numparticles, self.numdimensions))
+        r0 = np.asarray(positions(), dtype=float)
+        self.numreplicas = len(r0) if r0.ndim == 3 else None
+        self.numparticles, self.numdimensions = r0.shape[-2:]
+        states = self.N+1 if buffersize is None else buffersize
+        self.r = np.zeros((states,) + r0.shape)
         self.r[0] = r0
-        self.dumpPositions(r0, "initialPositions.data")
+        if initialdump is not None:
+            self.dumpPositions(r0, initialdump)
         
-        # Initialize velocities
+        # Initialize velocities. With replicas, the initialization is done
+        # for every replica unless all velocities are given at once
         self.v = np.zeros(self.r.shape)
-        self.v[0] = velocities(self.numparticles, self.numdimensions)
+        v0 = np.asarray(velocities(self.numparticles, self.numdimensions))
+        if self.numreplicas is not None and v0.ndim == 2:
+            v0 = [v0] + [velocities(self.numparticles, self.numdimensions)
+                         for _ in range(self.numreplicas - 1)]
+        self.v[0] = v0
         
         # print to terminal
         self.print_to_terminal()
         
-        # for plotting
-        self.label_size = {"size":14}    # Dictionary with size
-        plt.style.use("bmh")                    # Beautiful plots
-        plt.rcParams["font.family"] = "Serif"   # Font
-        
     def __repr__(self):
         return """MDSolver is the heart of the molecular dynamics code. 
                   It sets up the solver and distribute tasks to other 
@@ -71,6 +141,8 @@ class MDSolver:
         """ Print information to terminal
         """
         print("\n\n" + 14 * "=", " SYSTEM INFORMATION ", 14 * "=")
+        if self.numreplicas is not None:
+            print("Number of replicas:   ", self.numreplicas)
         print("Number of particles:  ", self.numparticles)
         print("Number of dimensions: ", self.numdimensions)
         print("Boundary conditions:  ", self.boundaries)
@@ -78,6 +150,75 @@ class MDSolver:
         print("Timestep:             ", self.dt, "\tps")
         print(50 * "=" + "\n\n")
         
+    def checkpoint(self, filename, t):
+        """ Write a checkpoint of the state at step t to a binary file. 
+        The checkpoint contains positions, velocities, accelerations, 
+        the step, the time, the state of the random number generator, 
+        the stored potential energy and the state of the thermostat of the
+        integrator. The file is replaced atomically, such that a killed run
+        never leaves a broken checkpoint behind.
+        
+        Parameters
+        ----------
+        filename : str
+            name and address of the checkpoint file
+        t : int
+            current step
+        """
+        states = len(self.r)
+        thermostat = getattr(self.integrator, "thermostat", None)
+        state = {"step" : t,
+                 "time" : self.now,
+                 "r" : self.r[t % states],
+                 "v" : self.v[t % states],
+                 "a" : self.a,
+                 "u" : getattr(self, "u", None),
+                 "random" : np.random.get_state(),
+                 "thermostat" : None if thermostat is None else thermostat.getState(),
+                 "boundaries" : self.boundaries,
+                 "T" : self.T,
+                 "dt" : self.dt,
+                 "buffersize" : self.buffersize}
+        with open(filename + ".tmp", 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(filename + ".tmp", filename)
+        
+    @classmethod
+    def fromCheckpoint(cls, filename):
+        """ Set up a solver from a checkpoint written by 'checkpoint'. 
+        The next call to the solver continues the run from the step of
+        the checkpoint, without recomputing the initial forces. 
+        
+        Parameters
+        ----------
+        filename : str
+            name and address of the checkpoint file
+            
+        Returns
+        -------
+        obj
+            MDSolver object
+        """
+        from mdsolver.initpositions import SetPositions
+        from mdsolver.initvelocities import Zero
+        with open(filename, 'rb') as f:
+            state = pickle.load(f)
+        solver = cls(positions=SetPositions(state["r"]),
+                     velocities=Zero(),
+                     boundaries=state["boundaries"],
+                     T=state["T"],
+                     dt=state["dt"],
+                     buffersize=state["buffersize"],
+                     initialdump=None)
+        t = state["step"]
+        states = len(solver.r)
+        solver.r[t % states] = state["r"]
+        solver.v[t % states] = state["v"]
+        solver.resume = (t, state["a"], state["u"], state.get("time", t * solver.dt),
+                         state.get("thermostat"))
+        np.random.set_state(state["random"])
+        return solver
+        
     @staticmethod
     def kineticEnergy(v):
         """ Returns the total kinetic energy for each timestep.
@@ -91,27 +232,36 @@ class MDSolver:
         
         Returns
         -------
-        1darray
-            total kinetic energy at all timesteps
+        ndarray
+            total kinetic energy at all timesteps (and replicas)
         """
-        return (v**2).sum(axis=1).sum(axis=1)/2
+        return (v**2).sum(axis=(-2,-1))/2
         
     @staticmethod
     def dumpPositions(r, dumpfile):
         """ Dumping positions at timestep t to a dumpfile. We use the xyz-
-        format, which can easily be visualized using Ovito.
+        format, which can easily be visualized using Ovito. With replicas, 
+        every replica is dumped as a separate frame.
         
         Parameters
         ----------
         r : ndarray
             position array
-        dumpfile : str
-            name and address of dumpfile
+        dumpfile : str or file
+            name and address of dumpfile, or an open text file
+            
+        The coordinates are written at full precision, as the shortest
+        strings that read back to the same floats.
         """
-        numparticles = len(r)
-        dat = np.column_stack((numparticles * ['Ar'], r))
-        np.savetxt(dumpfile, dat, header="{}\ntype x y z"
-                   .format(numparticles), fmt="%s", comments='')
+        if isinstance(dumpfile, str):
+            with open(dumpfile, 'w') as f:
+                MDSolver.dumpPositions(r, f)
+            return
+        numparticles, numdimensions = np.shape(r)[-2:]
+        for frame in np.reshape(r, (-1, numparticles, numdimensions)):
+            dumpfile.write("{}\ntype x y z\n".format(numparticles))
+            dumpfile.write("".join("Ar " + " ".join(map(repr, row)) + "\n"
+                                   for row in frame.tolist()))
                
     @staticmethod    
     def print_simulation(potential, integrator, poteng, distance, dumpfile):
@@ -140,13 +290,56 @@ class MDSolver:
         print("Dump file:            ", dumpfile)
         print(50 * "=" + "\n\n")
     
-    def __call__(self, potential, 
-                       integrator, 
-                       poteng=True, 
-                       distance=False, 
-                       dumpfile=None):
-        """ Integration loop. Computes the time-development of position and 
-        velocity using a given integrator and inter-atomic potential.
+    def register(self, callback, stride=1):
+        """ Register a callback that is called with the state of the 
+        system every 'stride' steps when the solver is run, e.g. a writer,
+        an analyzer or a thermostat changing the velocities in place. If 
+        the callback returns a truthy value, the run is stopped after the 
+        current step.
+        
+        Parameters
+        ----------
+        callback : callable
+            function taking a State object
+        stride : int
+            number of steps between every call
+        """
+        self.callbacks.append((callback, stride))
+        
+    def unregister(self, callback):
+        """ Remove a callback registered by 'register'.
+        
+        Parameters
+        ----------
+        callback : callable
+            the registered function
+        """
+        self.callbacks = [(function, stride) for function, stride in self.callbacks
+                          if function is not callback]
+        
+    def steps(self, potential, integrator, poteng=True, distance=False, progress=False):
+        """ Integration loop as a generator. Computes the time-development 
+        of position and velocity using a given integrator and inter-atomic 
+        potential, and yields the state of the system after every step 
+        (and the initial state, unless resuming from a checkpoint).
+        
+        The arrays of the yielded states are views into the stored arrays,
+        which are overwritten when a buffer size is given, so they have to
+        be copied to be kept. The velocities can be changed in place before
+        the next step is taken. If the generator is closed before the end
+        of the run, the stored arrays are cut after the last step.
+        
+        If the solver was set up with a buffer size, state t is stored
+        at index t % buffersize of the position and velocity arrays.
+        
+        If the solver was set up from a checkpoint, the run continues
+        from the step of the checkpoint.
+        
+        If the integrator has an adaptive timestep, the run continues 
+        until the total time T is reached. The time of every state is 
+        then found in 'time', and the stored arrays are extended when 
+        needed and cut after the last step (unless a buffer size is 
+        given).
         
         Parameters
         ----------
@@ -159,63 +352,390 @@ class MDSolver:
             energy should be calculated and stored.
         distance : bool or int
             boolean saying whether or not the distance matrix should be stored. 
-        dumpfile : str
-            filename that all the positions should be dumped to. If not 
-            specified, positions are not dumped.
+        progress : bool
+            whether or not to show a progress bar. Requires tqdm.
+            
+        Yields
+        ------
+        obj
+            State object of the current step
         """
         self.potential = potential
+        self.integrator = integrator
         
-        # Print information
-        self.print_simulation(potential, integrator, poteng, distance, dumpfile)
-        
-        # Compute initial acceleration, potential energy and distance matrix
-        a, u, d = potential(self.r[0])
+        # Compute initial acceleration, potential energy and distance matrix,
+        # or take them from the checkpoint when resuming a run
+        resume, self.resume = self.resume, None
+        if resume is None:
+            start, self.now = 0, 0.0
+            a, u, d = potential(self.r[0])
+        else:
+            start, a, uStored, self.now, thermostatState = resume
+            d = u = None
+            
+            # Continue the thermostat where the checkpoint left it
+            thermostat = getattr(integrator, "thermostat", None)
+            if thermostat is not None and thermostatState is not None:
+                thermostat.setState(thermostatState)
+        self.a = a
         
-        # Dump positions to dumpfile if dumpfile is defined
-        if dumpfile is not None: 
-            f = open(dumpfile,'w')       # Open dumpfile
-            self.dumpPositions(self.r[0],f)     # Dump initial positions
+        # Record the time of every state if the timestep is adaptive
+        adaptive = getattr(integrator, "adaptive", False)
+        self.stepTimes = {start : self.now} if adaptive else None
+        times = None
+        if adaptive:
+            times = np.zeros(len(self.r))
+            times[start % len(self.r)] = self.now
         
         # Store distance matrix if distance=True
         if distance: 
+            if resume is None and d is None:
+                raise ValueError("{} did not return a distance matrix, which is "
+                                 "only computed by the serial numpy path without "
+                                 "neighbor list. Use distance=DistanceSink() to "
+                                 "store the distances of the pairs within the "
+                                 "cutoff".format(potential))
             self.d = np.zeros((self.N, self.numparticles, self.numparticles))
-            self.d[0] = d
+            if d is not None:
+                self.d[0] = d
             
         # Store potential energy if poteng=True
         if poteng: 
-            self.u = np.zeros(self.N) # Potential energy
-            self.u[0] = u
-            
-        # Integration loop
-        from tqdm import tqdm
-        for t in tqdm(range(self.N)):   # Integration loop
-            self.r[t+1], self.v[t+1], a, u, d = integrator(self.r[t], self.v[t], a)
-            
-            # Dump positions to dumpfile if dumpfile is defined
-            if dumpfile is not None: 
-                self.dumpPositions(self.r[t+1],f) # dump positions to file
+            if resume is not None and uStored is not None:
+                self.u = uStored
+            else:
+                self.u = np.zeros((self.N,) + np.shape(u)) # Potential energy
+                self.u[0] = u
+                
+        # Show a progress bar if tqdm is installed
+        states = len(self.r)
+        steps = itertools.count(start) if adaptive else range(start, self.N)
+        bar = None
+        if progress:
+            try:
+                from tqdm import tqdm
+                steps = bar = tqdm(steps)
+            except ImportError:
+                pass
+            else:
+                # Time the progress bar separately when profiling
+                if self.profiler is not None and self.profiler.running:
+                    steps = self.profiler.iterate(bar, "progress bar")
                 
-            # Store distance matrix if distance=True
-            if distance:
-                self.d[t] = d
+        done = start
+        try:
+            if resume is None:
+                yield State(0, self.now, self.r[0], self.v[0], a, u, d)
                 
-            # Store potential energy if poteng=True
-            if poteng:
-                self.u[t] = u
+            for t in steps:   # Integration loop
+                # Extend the stored arrays when they are full
+                if adaptive:
+                    if self.buffersize is None and t+1 == states:
+                        states = 2 * states
+                        self.r, self.v = self.extend(self.r, states), self.extend(self.v, states)
+                        times = self.extend(times, states)
+                    if poteng and t == len(self.u):
+                        self.u = self.extend(self.u, 2 * t)
+                    if distance and t == len(self.d):
+                        self.d = self.extend(self.d, 2 * t)
+                i, j = t % states, (t+1) % states
+                remaining = self.T - self.now
+                _, _, a, u, d = integrator(self.r[i], self.v[i], a, self.r[j], self.v[j])
+                self.a = a
+                if adaptive:
+                    # The last step is shortened to end exactly at T
+                    self.now = float(self.T) if integrator.dt >= remaining else self.now + integrator.dt
+                    times[j] = self.now
+                else:
+                    self.now = (t+1) * self.dt
                 
-        # Close dumpfile
+                # Store distance matrix if distance=True
+                if distance:
+                    self.d[t] = d
+                    
+                # Store potential energy if poteng=True
+                if poteng:
+                    self.u[t] = u
+                    
+                done = t + 1
+                yield State(t+1, self.now, self.r[j], self.v[j], a, u, d)
+                
+                # Stop when the total time is reached with an adaptive timestep
+                if adaptive and self.now >= self.T:
+                    break
+        finally:
+            if bar is not None:
+                bar.close()
+                
+            # Cut the stored arrays after the last step with an adaptive 
+            # timestep or when the run is stopped early
+            if adaptive or done < self.N:
+                if self.buffersize is None:
+                    self.r, self.v = self.r[:done+1], self.v[:done+1]
+                    self.time = times[:done] if adaptive else self.time[:done]
+                elif adaptive:
+                    self.time = times
+                if poteng:
+                    self.u = self.u[:done]
+                if distance:
+                    self.d = self.d[:done]
+        
+    def run(self, potential, 
+                  integrator, 
+                  poteng=True, 
+                  distance=False, 
+                  dumpfile=None,
+                  sinks=(),
+                  progress=True,
+                  profile=False):
+        """ Run the simulation. Drives the integration loop of 'steps', 
+        and passes the state to the sinks and to the registered callbacks
+        at their strides. The run is stopped early if a callback returns 
+        a truthy value.
+        
+        Parameters
+        ----------
+        potential : obj
+            object defining the inter-atomic potential
+        integrator : obj
+            object defining the integrator
+        poteng : bool or int
+            boolean saying whether or not the potential
+            energy should be calculated and stored.
+        distance : bool, int or obj
+            boolean saying whether or not the distance matrix should be stored. 
+            Alternatively, a DistanceSink object storing the distances of the 
+            pairs closer than the cutoff as a sparse record.
+        dumpfile : str
+            filename that all the positions should be dumped to. If not 
+            specified, positions are not dumped. Positions are dumped
+            from a background thread.
+        sinks : list of obj
+            class objects defined by sinks.py. Every sink receives the
+            state of the system every 'stride' steps.
+        progress : bool
+            whether or not to show a progress bar. Requires tqdm.
+        profile : bool, str or obj
+            whether or not to time the phases of every step and print a
+            summary at the end of the run. If a filename is given, the 
+            summary is also written to it as JSON. Alternatively, a 
+            Profiler object defined by profiling.py. The profiler is 
+            found in 'profiler' after the run.
+        """
+        # Store distances as a sparse record if distance is a DistanceSink
+        if isinstance(distance, DistanceSink):
+            sinks = list(sinks) + [distance]
+            self.d = distance
+            distance = False
+            
+        # Dump positions to dumpfile if dumpfile is defined
         if dumpfile is not None: 
-            f.close()
+            sinks = list(sinks) + [ThreadedSink(XYZSink(dumpfile))]
+        
+        # Print information
+        self.print_simulation(potential, integrator, poteng, distance, dumpfile)
+        
+        # Count neighbor list rebuilds if the potential uses a Verlet list
+        neighbors = getattr(potential, "neighbors", None)
+        rebuilds = getattr(neighbors, "rebuilds", None)
+        
+        # Time the phases of every step if profile is given
+        original, self.profiler = (potential, integrator), None
+        if profile:
+            from mdsolver.profiling import Profiler
+            if isinstance(profile, Profiler):
+                self.profiler = profile
+            else:
+                self.profiler = Profiler(profile if isinstance(profile, str) else None)
+            potential, integrator = self.profiler.start(self, potential, integrator)
+        
+        # Sinks are called like callbacks, but never stop the run
+        self.potential = potential
+        observers = list(self.callbacks)
+        for sink in sinks:
+            sink.open(self)
+            observers.append((lambda state, sink=sink: 
+                              sink(state.t, state.r, state.v, state.u), sink.stride))
+        if self.profiler is not None:
+            numcallbacks = len(self.callbacks)
+            observers = [(self.profiler.timed(observer, "callbacks" if k < numcallbacks else "sinks"), stride)
+                         for k, (observer, stride) in enumerate(observers)]
+            
+        states = self.steps(potential, integrator, poteng, distance, progress)
+        try:
+            failed = True
+            try:
+                for state in states:
+                    stop = False
+                    for observer, stride in observers:
+                        if state.t % stride == 0:
+                            if self.stepTimes is not None:
+                                self.stepTimes[state.t] = state.time
+                            stop = observer(state) or stop
+                    if stop:
+                        break
+                failed = False
+            finally:
+                states.close()
+                self.potential, self.integrator = original
+                
+                # Close sinks, also when the run failed, such that the 
+                # queued states are written and the files are closed
+                self.closeSinks(sinks, failed)
+        finally:
+            # Restore the timed objects and print the profile
+            if self.profiler is not None:
+                self.profiler.stop()
+            
+        # Report number of neighbor list rebuilds
+        if rebuilds is not None:
+            self.rebuilds = neighbors.rebuilds - rebuilds
+            print("Neighbor list rebuilds: ", self.rebuilds)
+            
+    def __call__(self, potential, 
+                       integrator, 
+                       poteng=True, 
+                       distance=False, 
+                       dumpfile=None,
+                       sinks=(),
+                       progress=True,
+                       profile=False):
+        """ Integration loop. Computes the time-development of position and 
+        velocity using a given integrator and inter-atomic potential. Same
+        as 'run'.
+        
+        Parameters
+        ----------
+        potential : obj
+            object defining the inter-atomic potential
+        integrator : obj
+            object defining the integrator
+        poteng : bool or int
+            boolean saying whether or not the potential
+            energy should be calculated and stored.
+        distance : bool, int or obj
+            boolean saying whether or not the distance matrix should be stored. 
+            Alternatively, a DistanceSink object storing the distances of the 
+            pairs closer than the cutoff as a sparse record.
+        dumpfile : str
+            filename that all the positions should be dumped to. If not 
+            specified, positions are not dumped. Positions are dumped
+            from a background thread.
+        sinks : list of obj
+            class objects defined by sinks.py. Every sink receives the
+            state of the system every 'stride' steps.
+        progress : bool
+            whether or not to show a progress bar. Requires tqdm.
+        profile : bool, str or obj
+            whether or not to time the phases of every step. See 'run'.
+        """
+        self.run(potential, integrator, poteng, distance, dumpfile, sinks, 
+                 progress, profile)
+        
+    @staticmethod
+    def closeSinks(sinks, failed=False):
+        """ Close all the sinks, even if closing one of them fails. 
+        
+        Parameters
+        ----------
+        sinks : list of obj
+            class objects defined by sinks.py
+        failed : bool
+            whether or not the run failed. The error of the run is then
+            raised instead of the errors of the sinks.
+        """
+        errors = []
+        for sink in sinks:
+            try:
+                sink.close()
+            except Exception as error:
+                errors.append(error)
+        if errors and not failed:
+            raise errors[0]
+        
+    @staticmethod
+    def extend(array, length):
+        """ Extend an array with zeros along the first axis.
+        
+        Parameters
+        ----------
+        array : ndarray
+            array to extend
+        length : int
+            new length of the first axis
+            
+        Returns
+        -------
+        ndarray
+            extended array
+        """
+        extension = np.zeros((length - len(array),) + array.shape[1:])
+        return np.concatenate((array, extension))
+        
+    def timeOf(self, steps):
+        """ Time of the states at the given steps. With an adaptive 
+        timestep, the time is recorded for the steps where a sink is 
+        called.
+        
+        Parameters
+        ----------
+        steps : array_like
+            steps of the states
+            
+        Returns
+        -------
+        ndarray
+            time of every state
+        """
+        if self.stepTimes is None:
+            return np.array(steps) * self.dt
+        return np.array([self.stepTimes[step] for step in steps], dtype=float)
+        
+    def checkTrajectory(self):
+        """ Check that the full trajectory is stored, which is needed
+        for plotting. 
+        """
+        if self.buffersize is not None:
+            raise ValueError("Plotting requires the full trajectory. Use "
+                             "buffersize=None or store observables with sinks")
+            
+    @classmethod
+    def pyplot(cls):
+        """ Import matplotlib and set up the plot style the first time a 
+        plot is made, such that matplotlib is not imported by simulations
+        that do not plot.
+        
+        Returns
+        -------
+        module
+            matplotlib.pyplot
+        """
+        import matplotlib.pyplot as plt
+        if not cls.plotStyle:
+            plt.style.use("bmh")                    # Beautiful plots
+            plt.rcParams["font.family"] = "Serif"   # Font
+            cls.plotStyle = True
+        return plt
         
     def plot_distance(self):
         """ Plot distance between all particles. The plot will contain a 
         graph for each particle pair, giving N(N-1)/2 graphs. It is 
         recommended to use just for a small number of particles.
+        
+        If the distances are stored by a DistanceSink, a graph is plotted
+        for every pair that is closer than the cutoff in at least one 
+        frame. Frames where a pair is further apart than the cutoff are 
+        left blank.
         """
-        distance = np.sqrt(self.d)
-        for i in range(self.numparticles):
-            for j in range(i):
-                plt.plot(self.time, distance[:,i,j], label="$i={}$, $j={}$".format(i,j))
+        plt = self.pyplot()
+        if isinstance(self.d, DistanceSink):
+            for i, j in self.d.uniquePairs():
+                plt.plot(self.d.t, self.d.pair(i, j), label="$i={}$, $j={}$".format(j,i))
+        else:
+            distance = np.sqrt(self.d)
+            for i in range(self.numparticles):
+                for j in range(i):
+                    plt.plot(self.time, distance[:,i,j], label="$i={}$, $j={}$".format(i,j))
         plt.legend(loc="best", fontsize=14)
         plt.xlabel(r"Time [$t'/\tau$]", **self.label_size)
         plt.ylabel("$r_{ij}$", **self.label_size)
@@ -227,6 +747,8 @@ class MDSolver:
         while the potential energy is taken from the specified potential
         (which in our case is Lennard-Jones).
         """
+        self.checkTrajectory()
+        plt = self.pyplot()
         k = self.kineticEnergy(self.v)[:-1]   # Kinetic energy
         e = k + self.u                  # Total energy
         plt.plot(self.time, k, label="Kinetic")
@@ -241,6 +763,8 @@ class MDSolver:
         """ Plot the temperature as a function of time. The temperature
         is calculated using the formula T=v^2/ND.
         """
+        self.checkTrajectory()
+        plt = self.pyplot()
         k = self.kineticEnergy(self.v)[:-1]
         T = k * 2 * 119.7 / (self.numparticles * self.numdimensions)
         plt.plot(self.time, T)
@@ -0,0 +1,279 @@
+""" On-the-fly analysis. The accumulators are sinks, which are given to
+the solver by the 'sinks' argument and updated every 'stride' steps
+during the integration loop. They use a bounded amount of memory, and
+the results are found as attributes after the simulation, such that
+no trajectory has to be stored.
+"""
+
+import math
+import numpy as np
+from collections import deque
+from mdsolver.sinks import Sink
+from mdsolver.boundaryconditions import Periodic
+
+class RDF(Sink):
+    """ Radial distribution function g(r). The pair distances computed
+    by the potential inside the cutoff are added to a histogram, such
+    that no extra distances are computed. The histogram is normalized
+    by the number of pairs an ideal gas of the same density would have
+    in every shell. After the simulation, the bin centres are found in
+    'r' and the radial distribution function in 'g'.
+
+    Parameters
+    ----------
+    stride : int
+        number of steps between every sampled frame
+    bins : int
+        number of bins. 100 by default.
+    rmax : float
+        largest distance in the histogram. The cutoff of the potential
+        by default, larger values are not sampled. With periodic
+        boundaries, only distances up to half the box length are
+        complete.
+    volume : float
+        volume of the system. The box volume is used with periodic
+        boundaries, otherwise it has to be given.
+    """
+    def __init__(self, stride=1, bins=100, rmax=None, volume=None):
+        self.stride = stride
+        self.bins = bins
+        self.rmax = rmax
+        self.volume = volume
+
+    def __repr__(self):
+        return "Radial distribution function with stride {}".format(self.stride)
+
+    def open(self, solver):
+        """ Reset the histogram.
+
+        Parameters
+        ----------
+        solver : obj
+            the MDSolver object running the simulation
+        """
+        self.potential = solver.potential
+        self.numparticles = solver.numparticles
+        self.numdimensions = solver.numdimensions
+        cutoff = getattr(self.potential, "cutoff", None)
+        rmax = cutoff if self.rmax is None else self.rmax
+        if rmax is None:
+            raise ValueError("rmax has to be given when the potential has no cutoff")
+        if cutoff is not None and rmax > cutoff:
+            raise ValueError("rmax cannot be larger than the cutoff of the potential")
+        self.edges = np.linspace(0, rmax, self.bins + 1)
+        self.rmaxSqrd = rmax * rmax
+
+        if self.volume is not None:
+            self.boxVolume = self.volume
+        elif isinstance(solver.boundaries, Periodic):
+            self.boxVolume = float(solver.boundaries.lenbox) ** self.numdimensions
+        else:
+            raise ValueError("The volume has to be given with non-periodic boundaries")
+        self.histogram = np.zeros(self.bins)
+        self.frames = 0
+
+    def __call__(self, t, r, v, u):
+        """ Add the pair distances of the current frame to the histogram.
+
+        Parameters
+        ----------
+        t : int
+            current step
+        r : ndarray
+            current position array
+        v : ndarray
+            current velocity array
+        u : float
+            current potential energy
+        """
+        if getattr(self.potential, "pairs", None) is None:
+            raise ValueError("{} does not store its pairs, which is needed "
+                             "by RDF".format(self.potential))
+        distanceSqrd = self.potential.distanceSqrd
+        distance = np.sqrt(distanceSqrd[distanceSqrd < self.rmaxSqrd])
+        self.histogram += np.histogram(distance, self.edges)[0]
+        self.frames += 1
+
+    def close(self):
+        """ Normalize the histogram.
+        """
+        # Volume of the shells, V_D (r_out^D - r_in^D)
+        dim = self.numdimensions
+        unitBall = np.pi ** (dim / 2) / math.gamma(dim / 2 + 1)
+        shells = unitBall * np.diff(self.edges ** dim)
+        numpairs = self.numparticles * (self.numparticles - 1) / 2
+        ideal = numpairs * shells / self.boxVolume
+        self.r = 0.5 * (self.edges[1:] + self.edges[:-1])
+        self.g = self.histogram / (max(self.frames, 1) * ideal)
+
+class MSD(Sink):
+    """ Mean squared displacement from the initial positions. The
+    positions are unwrapped by adding up the minimum image displacement
+    between every sampled frame, such that particles crossing periodic
+    boundaries are followed. This requires that no particle moves more
+    than half the box length between two sampled frames. After the
+    simulation, the times are found in 't' and the mean squared
+    displacement in 'msd' (per replica).
+
+    Parameters
+    ----------
+    stride : int
+        number of steps between every sampled frame
+    """
+    def __init__(self, stride=1):
+        self.stride = stride
+
+    def __repr__(self):
+        return "Mean squared displacement with stride {}".format(self.stride)
+
+    def open(self, solver):
+        """ Reset the displacements.
+
+        Parameters
+        ----------
+        solver : obj
+            the MDSolver object running the simulation
+        """
+        self.solver = solver
+        self.boundaries = solver.boundaries
+        self.rStart = None
+        self.steps, self.msdList = [], []
+
+    def __call__(self, t, r, v, u):
+        """ Unwrap the current positions and store the mean squared
+        displacement.
+
+        Parameters
+        ----------
+        t : int
+            current step
+        r : ndarray
+            current position array
+        v : ndarray
+            current velocity array
+        u : float
+            current potential energy
+        """
+        if self.rStart is None:
+            self.rStart, self.rPrev, self.rUnwrapped = r.copy(), r.copy(), r.copy()
+        else:
+            self.rUnwrapped += self.boundaries.checkDistance(r - self.rPrev)
+            self.rPrev[:] = r
+        dr = self.rUnwrapped - self.rStart
+        self.steps.append(t)
+        self.msdList.append(np.einsum('...ij,...ij->...', dr, dr) / r.shape[-2])
+
+    def close(self):
+        """ Convert the stored displacements to arrays.
+        """
+        self.t = self.solver.timeOf(self.steps)
+        self.msd = np.array(self.msdList)
+
+class VACF(Sink):
+    """ Velocity autocorrelation function <v(0)·v(τ)>, averaged over the
+    particles and time origins, computed with a multiple-tau correlator.
+    Level 0 correlates the last 'points' sampled velocities. Every level
+    above averages 'average' values of the level below, such that the
+    lag times grow geometrically with a fixed number of stored values
+    per level. After the simulation, the lag times are found in 't' and
+    the autocorrelation in 'vacf' (per replica). The lag times assume a
+    fixed timestep.
+
+    Parameters
+    ----------
+    stride : int
+        number of steps between every sampled frame
+    points : int
+        number of correlation points per level. 16 by default.
+    average : int
+        number of values averaged when moving one level up. 2 by default.
+    levels : int
+        number of levels. The longest lag time is
+        points * average^(levels-1) * stride steps. 12 by default.
+    """
+    def __init__(self, stride=1, points=16, average=2, levels=12):
+        if points % average != 0:
+            raise ValueError("points has to be a multiple of average")
+        self.stride = stride
+        self.points = points
+        self.average = average
+        self.levels = levels
+
+    def __repr__(self):
+        return "Velocity autocorrelation function with stride {}".format(self.stride)
+
+    def open(self, solver):
+        """ Reset the correlator.
+
+        Parameters
+        ----------
+        solver : obj
+            the MDSolver object running the simulation
+        """
+        self.dt = solver.dt
+        self.buffers = [deque(maxlen=self.points) for level in range(self.levels)]
+        self.accumulators = [None] * self.levels
+        self.accumulated = [0] * self.levels
+        self.correlation = [np.zeros(self.points) for level in range(self.levels)]
+        self.counts = np.zeros((self.levels, self.points))
+
+    def add(self, v, level):
+        """ Add a value to a level of the correlator, correlate it with
+        the stored values, and pass the average of every 'average' values
+        on to the next level.
+
+        Parameters
+        ----------
+        v : ndarray
+            velocity array (averaged at levels above 0)
+        level : int
+            level of the correlator
+        """
+        numparticles = v.shape[-2]
+        buffer = self.buffers[level]
+        buffer.appendleft(v)
+        for lag, old in enumerate(buffer):
+            self.correlation[level][lag] = self.correlation[level][lag] + \
+                np.einsum('...ij,...ij->...', v, old) / numparticles
+            self.counts[level, lag] += 1
+
+        if level + 1 < self.levels:
+            if self.accumulators[level] is None:
+                self.accumulators[level] = v.copy()
+            else:
+                self.accumulators[level] += v
+            self.accumulated[level] += 1
+            if self.accumulated[level] == self.average:
+                self.add(self.accumulators[level] / self.average, level + 1)
+                self.accumulators[level] = None
+                self.accumulated[level] = 0
+
+    def __call__(self, t, r, v, u):
+        """ Add the current velocities to the correlator.
+
+        Parameters
+        ----------
+        t : int
+            current step
+        r : ndarray
+            current position array
+        v : ndarray
+            current velocity array
+        u : float
+            current potential energy
+        """
+        self.add(v.copy(), 0)
+
+    def close(self):
+        """ Collect the correlation of all the levels. The lags of a
+        level that are covered by the level below are skipped.
+        """
+        lags, values = [], []
+        for level in range(self.levels):
+            first = 0 if level == 0 else self.points // self.average
+            for lag in range(first, self.points):
+                if self.counts[level, lag] > 0:
+                    lags.append(lag * self.average ** level)
+                    values.append(self.correlation[level][lag] / self.counts[level, lag])
+        self.t = np.array(lags) * self.stride * self.dt
+        self.vacf = np.array(values)
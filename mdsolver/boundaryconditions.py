@@ -7,10 +7,54 @@ class Boundaries:
     def __init__(self):
         pass
     
-    def checkPosition(self, r):
+    def checkPosition(self, r, out=None):
         raise NotImplementedError ("Class {} has no instance 'checkPosition'."
                                    .format(self.__class__.__name__))
                                    
+    @staticmethod
+    def replicaLength(lenbox):
+        """ Box lengths given for every replica are reshaped to (R, 1, 1), 
+        such that they broadcast over arrays of shape (R, P, D).
+        
+        Parameters
+        ----------
+        lenbox : float or array_like
+            length of the box
+            
+        Returns
+        -------
+        float or ndarray
+            length of the box
+        """
+        if np.ndim(lenbox) == 0:
+            return lenbox
+        return np.reshape(np.asarray(lenbox, dtype=float), (-1, 1, 1))
+        
+    def buffer(self, name, like, dtype=float):
+        """ Get a preallocated scratch array with the same shape as 
+        'like', such that the boundary checks can be done without 
+        allocating new arrays every step.
+        
+        Parameters
+        ----------
+        name : str
+            name of the scratch array
+        like : ndarray
+            array with the desired shape
+        dtype : data-type
+            data type of the scratch array
+            
+        Returns
+        -------
+        ndarray
+            scratch array
+        """
+        buf = self.__dict__.get(name)
+        if buf is None or buf.shape != like.shape or buf.dtype != dtype:
+            buf = np.empty(like.shape, dtype)
+            setattr(self, name, buf)
+        return buf
+                                   
 class Open(Boundaries):
     """ Open boundary conditions. Does not alter positions, velocities or
     forces.
@@ -23,36 +67,50 @@ class Open(Boundaries):
         return "Open boundaries"
         
     @staticmethod
-    def checkPosition(r):
+    def checkPosition(r, out=None):
         """ Check if the positions satisfy the boundary conditions.
         
         Parameters
         ----------
         r : ndarray
             current position array
+        out : ndarray
+            array to store the result in. If not given, a new array
+            is returned
             
         Returns
         -------
         ndarray
             changed position array
         """
-        return r
+        if out is None:
+            return r
+        if out is not r:
+            np.copyto(out, r)
+        return out
         
     @staticmethod
-    def checkVelocity(v):
+    def checkVelocity(v, out=None):
         """ Check if the velocities satisfy the boundary conditions.
         
         Parameters
         ----------
         v : ndarray
             current velocity array
+        out : ndarray
+            array to store the result in. If not given, a new array
+            is returned
             
         Returns
         -------
         ndarray
             changed velocity array
         """
-        return v
+        if out is None:
+            return v
+        if out is not v:
+            np.copyto(out, v)
+        return out
         
     @staticmethod
     def checkDistance(dr):
@@ -71,44 +129,80 @@ class Open(Boundaries):
         return dr
         
 class Reflective(Boundaries):
+    """ Reflective boundary conditions. Particles hitting a wall are 
+    reflected back into the box.
+    
+    Parameters
+    ----------
+    lenbox : float or array_like
+        length of the box. When running replicas, a separate length 
+        can be given for every replica.
+    """
     def __init__(self, lenbox):
-        self.lenbox = lenbox
+        self.lenbox = self.replicaLength(lenbox)
         
     def __repr__(self):
-        return "Reflective boundaries with box length {}".format(self.lenbox)
+        lenbox = self.lenbox if np.ndim(self.lenbox) == 0 else np.ravel(self.lenbox)
+        return "Reflective boundaries with box length {}".format(lenbox)
         
-    def checkPosition(self, r):
+    def checkPosition(self, r, out=None):
         """ Check if the positions satisfy the boundary conditions.
         
         Parameters
         ----------
         r : ndarray
             current position array
+        out : ndarray
+            array to store the result in. If not given, a new array
+            is returned
             
         Returns
         -------
         ndarray
             changed position array
         """
-        self.r = r
-        r = np.where(r>self.lenbox, 2*self.lenbox - r, r)
-        r = np.where(r<0, - r, r)
-        return r
+        if out is None:
+            self.r = r
+            r = np.where(r>self.lenbox, 2*self.lenbox - r, r)
+            r = np.where(r<0, - r, r)
+            return r
+        self.r = self.buffer("rOld", r)
+        np.copyto(self.r, r)
+        if out is not r:
+            np.copyto(out, r)
+        mask = self.buffer("mask", r, bool)
+        np.greater(out, self.lenbox, out=mask)
+        np.subtract(2*self.lenbox, out, out=out, where=mask)
+        np.less(out, 0, out=mask)
+        np.negative(out, out=out, where=mask)
+        return out
         
-    def checkVelocity(self, v):
+    def checkVelocity(self, v, out=None):
         """ Check if the velocities satisfy the boundary conditions.
         
         Parameters
         ----------
         v : ndarray
             current velocity array
+        out : ndarray
+            array to store the result in. If not given, a new array
+            is returned
             
         Returns
         -------
         ndarray
             changed velocity array
         """
-        return np.where(self.r//self.lenbox == 0, v, -v)
+        if out is None:
+            return np.where(self.r//self.lenbox == 0, v, -v)
+        if out is not v:
+            np.copyto(out, v)
+        cell = self.buffer("cell", v)
+        mask = self.buffer("mask", v, bool)
+        np.floor_divide(self.r, self.lenbox, out=cell)
+        np.not_equal(cell, 0, out=mask)
+        np.negative(out, out=out, where=mask)
+        return out
         
     @staticmethod
     def checkDistance(dr):
@@ -127,42 +221,69 @@ class Reflective(Boundaries):
         return dr
         
 class Periodic(Boundaries):
+    """ Periodic boundary conditions. Particles leaving the box enter 
+    the box on the opposite side, and distances are computed using the 
+    minimum image convention.
+    
+    Parameters
+    ----------
+    lenbox : float or array_like
+        length of the box. When running replicas, a separate length 
+        can be given for every replica.
+    """
     def __init__(self, lenbox):
-        self.lenbox = lenbox
+        self.lenbox = self.replicaLength(lenbox)
         
     def __repr__(self):
-        return "Periodic boundaries with box length {}".format(self.lenbox)
+        lenbox = self.lenbox if np.ndim(self.lenbox) == 0 else np.ravel(self.lenbox)
+        return "Periodic boundaries with box length {}".format(lenbox)
         
-    def checkPosition(self, r):
+    def checkPosition(self, r, out=None):
         """ Check if the positions satisfy the boundary conditions.
         
         Parameters
         ----------
         r : ndarray
             current position array
+        out : ndarray
+            array to store the result in. If not given, a new array
+            is returned
             
         Returns
         -------
         ndarray
             changed position array
         """
-        return r - np.floor(r/self.lenbox) * self.lenbox
+        if out is None:
+            return r - np.floor(r/self.lenbox) * self.lenbox
+        shift = self.buffer("shift", r)
+        np.divide(r, self.lenbox, out=shift)
+        np.floor(shift, out=shift)
+        shift *= self.lenbox
+        return np.subtract(r, shift, out=out)
         
     @staticmethod
-    def checkVelocity(v):
+    def checkVelocity(v, out=None):
         """ Check if the velocities satisfy the boundary conditions.
         
         Parameters
         ----------
         v : ndarray
             current velocity array
+        out : ndarray
+            array to store the result in. If not given, a new array
+            is returned
             
         Returns
         -------
         ndarray
             changed velocity array
         """
-        return v
+        if out is None:
+            return v
+        if out is not v:
+            np.copyto(out, v)
+        return out
         
     def checkDistance(self, dr):
         """ Check if the distance vectors satisfy the boundary conditions.
@@ -0,0 +1,204 @@
+import weakref
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from mdsolver.potential import Potential
+from mdsolver.neighborlists import CellList
+from mdsolver.boundaryconditions import Periodic
+
+def slabWorker(rank, numworkers, potential, shape, names, conn):
+    """ Main loop of a worker process. The worker owns the particles in
+    slab 'rank' along the first axis. Every step, it finds its own
+    particles and the ghost particles within the cutoff of the slab
+    faces, computes the pair forces with a cell list, and writes the
+    forces on its own particles and its share of the potential energy
+    to the shared buffers.
+
+    Parameters
+    ----------
+    rank : int
+        index of the slab owned by the worker
+    numworkers : int
+        number of workers (slabs)
+    potential : obj
+        pair potential with a 'pairForces' method, e.g. LennardJones
+    shape : tuple
+        shape of the position and force arrays
+    names : tuple of str
+        names of the shared position, force and energy buffers
+    conn : obj
+        worker end of the pipe to the main process
+    """
+    buffers = [shared_memory.SharedMemory(name=name) for name in names]
+    r = np.ndarray(shape, dtype=float, buffer=buffers[0].buf)
+    forces = np.ndarray(shape, dtype=float, buffer=buffers[1].buf)
+    energy = np.ndarray(numworkers, dtype=float, buffer=buffers[2].buf)
+
+    lenbox = potential.boundaries.lenbox
+    width = lenbox / numworkers
+    centre = (rank + 0.5) * width
+    neighbors = CellList()
+    neighbors.setup(potential.boundaries, potential.cutoff)
+    try:
+        while conn.recv():
+            try:
+                # Own particles are in the slab, ghosts are closer than
+                # the cutoff to one of the slab faces
+                x = r[:,0] - np.floor(r[:,0]/lenbox) * lenbox
+                own = np.minimum((x / width).astype(int), numworkers - 1) == rank
+                dx = x - centre
+                dx -= np.round(dx/lenbox) * lenbox
+                local = np.nonzero(own | (np.abs(dx) < 0.5 * width + potential.cutoff))[0]
+                ownLocal = own[local]
+
+                i, j, distanceSqrd, dr = neighbors(r[local])
+                keep = ownLocal[i] | ownLocal[j]
+                i, j, distanceSqrd, dr = i[keep], j[keep], distanceSqrd[keep], dr[keep]
+                force, u = potential.pairForces(distanceSqrd, dr)
+                u[u == np.inf] = 0
+
+                # Pairs across the slab faces are computed by both workers,
+                # so the energy of such a pair is split between them
+                forceLocal = potential.accumulateForces(force, (i, j), len(local))
+                forces[local[ownLocal]] = forceLocal[ownLocal]
+                energy[rank] = np.sum(u * 0.5 * (ownLocal[i].astype(float) + ownLocal[j]))
+                conn.send(None)
+            except Exception as error:
+                conn.send(repr(error))
+    finally:
+        del r, forces, energy
+        for buffer in buffers:
+            buffer.close()
+
+def shutdown(processes, connections, buffers):
+    """ Stop the worker processes and release the shared buffers.
+
+    Parameters
+    ----------
+    processes : list of obj
+        worker processes
+    connections : list of obj
+        main end of the pipes to the workers
+    buffers : list of obj
+        shared memory buffers
+    """
+    for conn in connections:
+        try:
+            conn.send(False)
+        except (BrokenPipeError, OSError):
+            pass
+    for process in processes:
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
+    for buffer in buffers:
+        buffer.close()
+        buffer.unlink()
+
+class DomainDecomposition(Potential):
+    """ Domain decomposition of a pair potential. The periodic box is
+    split into slabs along the first axis, and the forces on the
+    particles in every slab are computed by a separate worker process.
+    The positions, forces and energies are kept in shared memory, such
+    that only a short message is sent through a pipe every step. Every
+    worker also sees the ghost particles within the cutoff of its slab
+    faces, and finds the pairs using a cell list.
+
+    The decomposition is used in place of the wrapped potential, i.e.,
+    it is given as the 'potential' argument of the solver.
+
+    Parameters
+    ----------
+    solver : obj
+        class object defined by moleculardynamics.py. Takes the MDSolver
+        class as argument
+    potential : obj
+        pair potential to decompose, e.g. LennardJones. Its neighbor
+        list is not used, the workers use cell lists.
+    workers : int
+        number of worker processes (slabs). 2 by default.
+
+    The distance matrix and the pairs are not gathered from the workers,
+    so distance=True and DistanceSink are not supported.
+    """
+    def __init__(self, solver, potential, workers=2):
+        if not isinstance(solver.boundaries, Periodic):
+            raise ValueError("Domain decomposition requires periodic boundaries")
+        if getattr(solver, "numreplicas", None) is not None:
+            raise ValueError("Domain decomposition is not supported with replicas")
+        self.potential = potential
+        self.workers = workers
+        self.cutoff = potential.cutoff
+        self.boundaries = solver.boundaries
+        self.shape = (solver.numparticles, solver.numdimensions)
+        self.pairs = self.distanceSqrd = None
+        self.processes = None
+
+    def __repr__(self):
+        """ Representing the potential.
+        """
+        return "{} decomposed into {} slabs".format(self.potential, self.workers)
+
+    def start(self):
+        """ Allocate the shared buffers and start the worker processes.
+        Called on the first force evaluation.
+        """
+        size = int(np.prod(self.shape)) * np.dtype(float).itemsize
+        self.buffers = [shared_memory.SharedMemory(create=True, size=size),
+                        shared_memory.SharedMemory(create=True, size=size),
+                        shared_memory.SharedMemory(create=True, size=8 * self.workers)]
+        self.r = np.ndarray(self.shape, dtype=float, buffer=self.buffers[0].buf)
+        self.forces = np.ndarray(self.shape, dtype=float, buffer=self.buffers[1].buf)
+        self.energy = np.ndarray(self.workers, dtype=float, buffer=self.buffers[2].buf)
+        names = tuple(buffer.name for buffer in self.buffers)
+
+        self.processes, self.connections = [], []
+        for rank in range(self.workers):
+            conn, child = mp.Pipe()
+            process = mp.Process(target=slabWorker, daemon=True,
+                                 args=(rank, self.workers, self.potential,
+                                       self.shape, names, child))
+            process.start()
+            child.close()
+            self.processes.append(process)
+            self.connections.append(conn)
+        self.finalizer = weakref.finalize(self, shutdown, self.processes,
+                                          self.connections, self.buffers)
+
+    def close(self):
+        """ Stop the worker processes and release the shared buffers.
+        """
+        if self.processes is not None:
+            del self.r, self.forces, self.energy
+            self.finalizer()
+            self.processes = None
+
+    def __call__(self, r):
+        """ Inter-atomic force computed by the worker processes.
+
+        Parameters
+        ----------
+        r : ndarray
+            spatial coordinates at some timestep
+
+        Returns
+        -------
+        ndarray
+            the netto force acting on every particle
+        float
+            total potential energy
+        None
+            the distance matrix is not computed
+        """
+        if self.processes is None:
+            self.start()
+        self.r[:] = r
+        for conn in self.connections:
+            conn.send(True)
+        errors = [conn.recv() for conn in self.connections]
+        errors = [error for error in errors if error is not None]
+        if errors:
+            raise RuntimeError("Domain decomposition worker failed: {}"
+                               .format(errors[0]))
+        u = self.potential.potentialEnergy(self.energy.copy(), self.cutoff)
+        return self.forces.copy(), u, None
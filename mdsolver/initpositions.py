@@ -91,4 +91,31 @@ class FCC(InitPositions):
         # Scale initial positions correctly
         r *= self.lenbulk / self.cells
         return r
-                                   
+
+class Replicas(InitPositions):
+    """ Set up an ensemble of independent replicas of the system, which 
+    are integrated together in one vectorized step. The initial positions
+    get a leading replica axis, giving the shape (R, P, D). All replicas
+    need the same number of particles and dimensions.
+    
+    Parameters
+    ----------
+    *positions : obj
+        class objects defined by initpositions.py, one for every replica
+    """
+    def __init__(self, *positions):
+        self.positions = positions
+        
+    def __call__(self):
+        """ Get the initial positions.
+        
+        Returns
+        -------
+        ndarray
+            initial particle configuration of all replicas
+        """
+        from numpy import array
+        r = [positions() for positions in self.positions]
+        if len(set(len(ri) for ri in r)) > 1:
+            raise ValueError("All replicas need the same number of particles")
+        return array(r, dtype=float)
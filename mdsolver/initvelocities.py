@@ -130,3 +130,34 @@ class Temperature(InitVelocities):
             initial velocity configuration
         """
         return np.random.normal(0, np.sqrt(self.T), size=(par, dim))
+        
+class Replicas(InitVelocities):
+    """ Initial velocities of an ensemble of independent replicas, with
+    one initialization method for every replica. If the solver is set up
+    with replicas and another initialization method is used, that method 
+    is called once for every replica instead.
+    
+    Parameters
+    ----------
+    *velocities : obj
+        class objects defined by initvelocities.py, one for every replica
+    """
+    def __init__(self, *velocities):
+        self.velocities = velocities
+        
+    def __call__(self, par, dim):
+        """ Get the velocities.
+        
+        Parameters
+        ----------
+        par : int
+            number of particles
+        dim : int
+            number of dimensions
+        
+        Returns
+        -------
+        ndarray
+            initial velocity configuration of all replicas
+        """
+        return np.array([velocities(par, dim) for velocities in self.velocities])
@@ -1,10 +1,72 @@
+import numpy as np
+from mdsolver.potential import SwitchedPotential
+
 class Integrator:
     """ Integrator class. Takes a old state and returns a new state.
+    The new state is written to preallocated arrays using in-place 
+    operations, such that no arrays are allocated in the integration 
+    loop.
     """
     def __init__(self):
         pass
         
-    def __call__(self, r, v, a):
+    def allocate(self, solver):
+        """ Preallocate the arrays of the new state and a scratch array.
+        
+        Parameters
+        ----------
+        solver : obj
+            class object defined by moleculardynamics.py
+        """
+        shape = solver.r[0].shape
+        self.rNew = np.empty(shape)
+        self.vNew = np.empty(shape)
+        self.tmp = np.empty(shape)
+        
+    def setupTimestep(self, solver, adaptive, maxdisplacement, dtmin, dtmax):
+        """ Set up a fixed or an adaptive timestep.
+        
+        Parameters
+        ----------
+        solver : obj
+            class object defined by moleculardynamics.py
+        adaptive : bool
+            whether or not the timestep is adapted every step
+        maxdisplacement : float
+            largest distance a particle may move in one step
+        dtmin : float
+            smallest timestep. solver.dt/100 if not given.
+        dtmax : float
+            largest timestep. 10*solver.dt if not given.
+        """
+        self.solver = solver
+        self.dt = solver.dt
+        self.adaptive = adaptive
+        self.maxdisplacement = maxdisplacement
+        self.dtmin = solver.dt / 100 if dtmin is None else dtmin
+        self.dtmax = 10 * solver.dt if dtmax is None else dtmax
+        
+    def adaptTimestep(self, v, a):
+        """ Find the largest timestep for which no particle moves further
+        than maxdisplacement, using the estimate |v| dt + 0.5 |a| dt^2 
+        of the displacement. The timestep is limited to [dtmin, dtmax], 
+        and the last step is shortened such that the run ends at the
+        total time of the solver.
+        
+        Parameters
+        ----------
+        v : ndarray
+            current velocity array
+        a : ndarray
+            current acceleration
+        """
+        speed = np.sqrt(np.einsum('...i,...i->...', v, v).max())
+        acceleration = np.sqrt(np.einsum('...i,...i->...', a, a).max())
+        root = speed + np.sqrt(speed**2 + 2 * acceleration * self.maxdisplacement)
+        dt = 2 * self.maxdisplacement / root if root > 0 else self.dtmax
+        self.dt = min(max(dt, self.dtmin), self.dtmax, self.solver.T - self.solver.now)
+        
+    def __call__(self, r, v, a, rNew=None, vNew=None):
         raise NotImplementedError ("Class {} has no instance '__call__'."
                                    .format(self.__class__.__name__))
 
@@ -18,11 +80,16 @@ class ForwardEuler(Integrator):
     solver : obj
         class object defined by moleculardynamics.py. Takes the MDSolver 
         class as argument
+    thermostat : obj
+        class object defined by thermostats.py. Applied to the velocities
+        after every step. None (NVE) by default.
     """
-    def __init__(self, solver):
+    def __init__(self, solver, thermostat=None):
         self.solver = solver
         self.boundaries = solver.boundaries
         self.dt = solver.dt
+        self.thermostat = thermostat
+        self.allocate(solver)
         
         
     def __repr__(self):
@@ -30,7 +97,7 @@ class ForwardEuler(Integrator):
         """
         return "Forward-Euler integrator"
         
-    def __call__(self, r, v, a):
+    def __call__(self, r, v, a, rNew=None, vNew=None):
         """ This function calculated the new position and velocity based on 
         the integration scheme, and check if they satisfy the boundary
         conditions. Furthermore, the new acceleration is calculated.
@@ -43,6 +110,12 @@ class ForwardEuler(Integrator):
             previous velocity array
         a : ndarray
             previous acceleration
+        rNew : ndarray
+            array to store the new positions in. May be the same array 
+            as r. If not given, a preallocated array is used
+        vNew : ndarray
+            array to store the new velocities in. May be the same array 
+            as v. If not given, a preallocated array is used
             
         Returns
         -------
@@ -57,13 +130,18 @@ class ForwardEuler(Integrator):
         d : ndarray
             distance matrix of the new state
         """
-        r, v, a = r.copy(), v.copy(), a.copy()
-        r += v * self.dt
-        v += a * self.dt
-        r = self.boundaries.checkPosition(r)
-        v = self.boundaries.checkVelocity(v)
-        a, u, d = self.solver.potential(r)
-        return r, v, a, u, d
+        rNew = self.rNew if rNew is None else rNew
+        vNew = self.vNew if vNew is None else vNew
+        np.multiply(v, self.dt, out=self.tmp)
+        np.add(r, self.tmp, out=rNew)
+        np.multiply(a, self.dt, out=self.tmp)
+        np.add(v, self.tmp, out=vNew)
+        self.boundaries.checkPosition(rNew, out=rNew)
+        self.boundaries.checkVelocity(vNew, out=vNew)
+        if self.thermostat is not None:
+            self.thermostat(vNew, self.dt)
+        a, u, d = self.solver.potential(rNew)
+        return rNew, vNew, a, u, d
         
 class EulerChromer(Integrator):
     """ Euler-Chromer integrator, based on the integration scheme
@@ -75,18 +153,36 @@ class EulerChromer(Integrator):
     solver : obj
         class object defined by moleculardynamics.py. Takes the MDSolver 
         class as argument
+    adaptive : bool
+        whether or not the timestep is adapted every step, such that no 
+        particle moves further than maxdisplacement. The solver then 
+        stops when the total time is reached. False by default.
+    maxdisplacement : float
+        largest distance a particle may move in one step. 0.05 by default.
+    dtmin : float
+        smallest adaptive timestep. solver.dt/100 by default.
+    dtmax : float
+        largest adaptive timestep. 10*solver.dt by default.
+    thermostat : obj
+        class object defined by thermostats.py. Applied to the velocities
+        after every step. None (NVE) by default.
     """
-    def __init__(self, solver):
+    def __init__(self, solver, adaptive=False, maxdisplacement=0.05, 
+                 dtmin=None, dtmax=None, thermostat=None):
         self.solver = solver
         self.boundaries = solver.boundaries
-        self.dt = solver.dt
+        self.thermostat = thermostat
+        self.setupTimestep(solver, adaptive, maxdisplacement, dtmin, dtmax)
+        self.allocate(solver)
         
     def __repr__(self):
         """ Representing the integrator.
         """
+        if self.adaptive:
+            return "Euler-Chromer integrator with adaptive timestep"
         return "Euler-Chromer integrator"
         
-    def __call__(self, r, v, a):
+    def __call__(self, r, v, a, rNew=None, vNew=None):
         """ This function calculated the new position and velocity based on 
         the integration scheme, and check if they satisfy the boundary
         conditions. Furthermore, the new acceleration is calculated.
@@ -99,6 +195,12 @@ class EulerChromer(Integrator):
             previous velocity array
         a : ndarray
             previous acceleration
+        rNew : ndarray
+            array to store the new positions in. May be the same array 
+            as r. If not given, a preallocated array is used
+        vNew : ndarray
+            array to store the new velocities in. May be the same array 
+            as v. If not given, a preallocated array is used
             
         Returns
         -------
@@ -113,13 +215,20 @@ class EulerChromer(Integrator):
         d : ndarray
             distance matrix of the new state
         """
-        r, v, a = r.copy(), v.copy(), a.copy()
-        v += a * self.dt
-        r += v * self.dt
-        r = self.boundaries.checkPosition(r)
-        v = self.boundaries.checkVelocity(v) 
-        a, u, d = self.solver.potential(r)
-        return r, v, a, u, d
+        rNew = self.rNew if rNew is None else rNew
+        vNew = self.vNew if vNew is None else vNew
+        if self.adaptive:
+            self.adaptTimestep(v, a)
+        np.multiply(a, self.dt, out=self.tmp)
+        np.add(v, self.tmp, out=vNew)
+        np.multiply(vNew, self.dt, out=self.tmp)
+        np.add(r, self.tmp, out=rNew)
+        self.boundaries.checkPosition(rNew, out=rNew)
+        self.boundaries.checkVelocity(vNew, out=vNew)
+        if self.thermostat is not None:
+            self.thermostat(vNew, self.dt)
+        a, u, d = self.solver.potential(rNew)
+        return rNew, vNew, a, u, d
 
 class VelocityVerlet(Integrator):
     """ Velocity-Verlet integrator, based on the integration scheme
@@ -131,18 +240,36 @@ class VelocityVerlet(Integrator):
     solver : obj
         class object defined by moleculardynamics.py. Takes the MDSolver 
         class as argument
+    adaptive : bool
+        whether or not the timestep is adapted every step, such that no 
+        particle moves further than maxdisplacement. The solver then 
+        stops when the total time is reached. False by default.
+    maxdisplacement : float
+        largest distance a particle may move in one step. 0.05 by default.
+    dtmin : float
+        smallest adaptive timestep. solver.dt/100 by default.
+    dtmax : float
+        largest adaptive timestep. 10*solver.dt by default.
+    thermostat : obj
+        class object defined by thermostats.py. Applied to the velocities
+        after every step. None (NVE) by default.
     """
-    def __init__(self, solver):
+    def __init__(self, solver, adaptive=False, maxdisplacement=0.05, 
+                 dtmin=None, dtmax=None, thermostat=None):
         self.solver = solver
         self.boundaries = solver.boundaries
-        self.dt = solver.dt
+        self.thermostat = thermostat
+        self.setupTimestep(solver, adaptive, maxdisplacement, dtmin, dtmax)
+        self.allocate(solver)
         
     def __repr__(self):
         """ Representing the integrator.
         """
+        if self.adaptive:
+            return "VelocityVerlet integrator with adaptive timestep"
         return "VelocityVerlet integrator"
         
-    def __call__(self, r, v, a):
+    def __call__(self, r, v, a, rNew=None, vNew=None):
         """ This function calculated the new position and velocity based on 
         the integration scheme, and check if they satisfy the boundary
         conditions. Furthermore, the new acceleration is calculated.
@@ -155,6 +282,12 @@ class VelocityVerlet(Integrator):
             previous velocity array
         a : ndarray
             previous acceleration
+        rNew : ndarray
+            array to store the new positions in. May be the same array 
+            as r. If not given, a preallocated array is used
+        vNew : ndarray
+            array to store the new velocities in. May be the same array 
+            as v. If not given, a preallocated array is used
             
         Returns
         -------
@@ -169,10 +302,135 @@ class VelocityVerlet(Integrator):
         d : ndarray
             distance matrix of the new state
         """
-        r, v, a = r.copy(), v.copy(), a.copy()
-        r += v * self.dt + 0.5 * a * self.dt**2
-        r = self.boundaries.checkPosition(r)
-        a_new, u, d = self.solver.potential(r)
-        v += 0.5 * (a_new + a) * self.dt
-        v = self.boundaries.checkVelocity(v)
-        return r, v, a_new, u, d
+        rNew = self.rNew if rNew is None else rNew
+        vNew = self.vNew if vNew is None else vNew
+        if self.adaptive:
+            self.adaptTimestep(v, a)
+        np.multiply(a, 0.5 * self.dt, out=self.tmp)      # v * dt + 0.5 * a * dt^2 
+        np.add(self.tmp, v, out=self.tmp)
+        np.multiply(self.tmp, self.dt, out=self.tmp)
+        np.add(r, self.tmp, out=rNew)
+        self.boundaries.checkPosition(rNew, out=rNew)
+        a_new, u, d = self.solver.potential(rNew)
+        np.add(a_new, a, out=self.tmp)                   # 0.5 * (a_new + a) * dt
+        np.multiply(self.tmp, 0.5 * self.dt, out=self.tmp)
+        np.add(v, self.tmp, out=vNew)
+        self.boundaries.checkVelocity(vNew, out=vNew)
+        if self.thermostat is not None:
+            self.thermostat(vNew, self.dt)
+        return rNew, vNew, a_new, u, d
+
+class MultipleTimestep(Integrator):
+    """ Multiple-timestep integrator (r-RESPA). The force is split into a
+    short-range part, which changes quickly, and a long-range part, 
+    which changes slowly. The short-range part is given by a potential
+    with a shorter cutoff that is switched smoothly off, see 
+    SwitchedPotential, and the long-range part is the full potential 
+    minus the short-range part. The long-range force is applied as a
+    half kick at the beginning and end of every step of length dt, and
+    the short-range force is integrated by 'steps' Velocity-Verlet
+    steps of length dt/steps in between:
+        v = v + 0.5 * a_long * dt
+        (steps) x Velocity-Verlet with a_short and dt/steps
+        v = v + 0.5 * a_long_new * dt
+    The full potential of the solver is evaluated once per step, such
+    that dt can be several times larger than with Velocity-Verlet.
+        
+    Parameters
+    ----------
+    solver : obj
+        class object defined by moleculardynamics.py. Takes the MDSolver 
+        class as argument
+    short : obj
+        potential with a shorter cutoff giving the short-range part, 
+        e.g. LennardJones(solver, cutoff=2). Needs to be a pair potential
+    steps : int
+        number of inner steps per step. 4 by default.
+    width : float
+        width of the region where the short-range part is switched off.
+        0.5 by default.
+    thermostat : obj
+        class object defined by thermostats.py. Applied to the velocities
+        after every step. None (NVE) by default.
+    """
+    def __init__(self, solver, short, steps=4, width=0.5, thermostat=None):
+        self.solver = solver
+        self.thermostat = thermostat
+        self.boundaries = solver.boundaries
+        self.dt = solver.dt
+        self.steps = steps
+        self.innerdt = solver.dt / steps
+        self.short = SwitchedPotential(solver, short, width)
+        self.allocate(solver)
+        self.a = None
+        
+    def __repr__(self):
+        """ Representing the integrator.
+        """
+        return "Multiple-timestep integrator with {} inner steps".format(self.steps)
+        
+    def __call__(self, r, v, a, rNew=None, vNew=None):
+        """ This function calculated the new position and velocity based on 
+        the integration scheme, and check if they satisfy the boundary
+        conditions. Furthermore, the new acceleration is calculated.
+        
+        Parameters
+        ----------
+        r : ndarray
+            previous position array
+        v : ndarray
+            previous velocity array
+        a : ndarray
+            previous acceleration
+        rNew : ndarray
+            array to store the new positions in. May be the same array 
+            as r. If not given, a preallocated array is used
+        vNew : ndarray
+            array to store the new velocities in. May be the same array 
+            as v. If not given, a preallocated array is used
+            
+        Returns
+        -------
+        r : ndarray
+            new position array
+        v : ndarray
+            new velocity array
+        a : ndarray
+            new acceleration array
+        u : float
+            potential energy of the new state
+        d : ndarray
+            distance matrix of the new state
+        """
+        rNew = self.rNew if rNew is None else rNew
+        vNew = self.vNew if vNew is None else vNew
+        
+        # The short-range acceleration is kept from the previous step,
+        # unless the acceleration is not the one returned last time
+        if a is not self.a:
+            self.aShort = self.short(r)[0]
+        np.subtract(a, self.aShort, out=self.tmp)        # 0.5 * a_long * dt
+        np.multiply(self.tmp, 0.5 * self.dt, out=self.tmp)
+        np.add(v, self.tmp, out=vNew)
+        if rNew is not r:
+            np.copyto(rNew, r)
+            
+        for step in range(self.steps):
+            np.multiply(self.aShort, 0.5 * self.innerdt, out=self.tmp)
+            np.add(vNew, self.tmp, out=vNew)
+            np.multiply(vNew, self.innerdt, out=self.tmp)
+            np.add(rNew, self.tmp, out=rNew)
+            self.boundaries.checkPosition(rNew, out=rNew)
+            self.aShort = self.short(rNew)[0]
+            np.multiply(self.aShort, 0.5 * self.innerdt, out=self.tmp)
+            np.add(vNew, self.tmp, out=vNew)
+            self.boundaries.checkVelocity(vNew, out=vNew)
+            
+        a_new, u, d = self.solver.potential(rNew)
+        np.subtract(a_new, self.aShort, out=self.tmp)    # 0.5 * a_long_new * dt
+        np.multiply(self.tmp, 0.5 * self.dt, out=self.tmp)
+        np.add(vNew, self.tmp, out=vNew)
+        if self.thermostat is not None:
+            self.thermostat(vNew, self.dt)
+        self.a = a_new
+        return rNew, vNew, a_new, u, d
@@ -0,0 +1,117 @@
+""" Compiled pair kernels. The kernels are fused loops over the candidate
+pairs, which compute the distance, the forces, the potential energy and
+the virial in one pass without temporary arrays. They are compiled with
+Numba when it is installed (HAVE_NUMBA), otherwise they are plain Python
+functions that are only useful for testing. Numba is only imported when
+a kernel is called for the first time, such that importing the package
+stays fast when the numba backend is not used.
+"""
+
+import threading
+import importlib.util
+import numpy as np
+
+HAVE_NUMBA = importlib.util.find_spec("numba") is not None
+
+class Kernel:
+    """ Function compiled with Numba the first time it is called, if Numba
+    is installed. The kernel is pickled by name, such that potentials
+    holding a kernel can still be pickled.
+
+    Parameters
+    ----------
+    function : callable
+        function to compile
+    """
+    lock = threading.Lock()
+
+    def __init__(self, function):
+        self.function = function
+        self.compiled = None
+        self.__module__ = function.__module__
+        self.__name__ = function.__name__
+        self.__doc__ = function.__doc__
+
+    def __reduce__(self):
+        return self.__name__
+
+    def compile(self):
+        """ Compile the function, or use it as it is without Numba.
+
+        Returns
+        -------
+        callable
+            compiled function
+        """
+        with self.lock:
+            if self.compiled is None:
+                if HAVE_NUMBA:
+                    import numba
+                    self.compiled = numba.njit(cache=True, nogil=True)(self.function)
+                else:
+                    self.compiled = self.function
+        return self.compiled
+
+    def __call__(self, *args):
+        compiled = self.compiled if self.compiled is not None else self.compile()
+        return compiled(*args)
+
+def jit(function):
+    """ Compile a function with Numba on its first call, if it is installed.
+    """
+    return Kernel(function)
+
+@jit
+def lennardJonesKernel(r, i, j, lenbox, cutoffSqrd, forces, distanceSqrd):
+    """ Lennard-Jones forces, energy and virial of the candidate pairs.
+
+    Parameters
+    ----------
+    r : ndarray
+        spatial coordinates at some timestep
+    i : ndarray
+        index of the first particle in every candidate pair
+    j : ndarray
+        index of the second particle in every candidate pair
+    lenbox : float
+        box length of periodic boundaries, 0 for other boundaries
+    cutoffSqrd : float
+        cutoff distance squared
+    forces : ndarray
+        zero array where the force on every particle is added
+    distanceSqrd : ndarray
+        array where the distance of every candidate pair squared is
+        written. Set to -1 for pairs beyond the cutoff.
+
+    Returns
+    -------
+    float
+        unscaled potential energy (1/r^12 - 1/r^6) of all the pairs
+    float
+        virial, the sum of r·F over all the pairs
+    """
+    dim = r.shape[1]
+    dr = np.empty(dim)
+    u = 0.0
+    virial = 0.0
+    for k in range(len(i)):
+        a, b = i[k], j[k]
+        rSqrd = 0.0
+        for d in range(dim):
+            dr[d] = r[a,d] - r[b,d]
+            if lenbox > 0:
+                dr[d] -= np.rint(dr[d] / lenbox) * lenbox
+            rSqrd += dr[d] * dr[d]
+        if rSqrd >= cutoffSqrd or rSqrd == 0:
+            distanceSqrd[k] = -1.0
+            continue
+        distanceSqrd[k] = rSqrd
+        rSixInv = 1.0 / (rSqrd * rSqrd * rSqrd)
+        rTwelveInv = rSixInv * rSixInv
+        factor = 24 * (2 * rTwelveInv - rSixInv) / rSqrd
+        for d in range(dim):
+            forces[a,d] += factor * dr[d]
+            forces[b,d] -= factor * dr[d]
+        u += rTwelveInv - rSixInv
+        virial += factor * rSqrd
+    return u, virial
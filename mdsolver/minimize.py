@@ -0,0 +1,126 @@
+import numpy as np
+
+class Minimizer:
+    """ Minimizer class. Relaxes the initial positions of a solver to a
+    local minimum of the potential energy, before the simulation is run.
+    """
+    def __init__(self):
+        pass
+
+    def __call__(self):
+        raise NotImplementedError ("Class {} has no instance '__call__'."
+                                   .format(self.__class__.__name__))
+
+class FIRE(Minimizer):
+    """ Fast inertial relaxation engine (FIRE). The particles are moved
+    by damped dynamics, where the velocity is steered towards the force
+    direction. The timestep grows as long as the power F·v is positive,
+    and the particles are stopped as soon as they move uphill. The
+    initial positions of the solver are relaxed in place, such that the
+    solver can be called right after the minimization. With replicas,
+    every replica has its own timestep and is stopped independently.
+
+    Parameters
+    ----------
+    solver : obj
+        class object defined by moleculardynamics.py. Takes the MDSolver
+        class as argument
+    potential : obj
+        class object defined by potential.py
+    ftol : float
+        the minimization stops when the largest force on a particle is
+        below ftol. 1e-3 by default.
+    maxsteps : int
+        largest number of steps. 10000 by default.
+    maxmove : float
+        largest distance a particle moves in one step. 0.1 by default.
+    dt : float
+        initial timestep. solver.dt by default.
+    """
+    def __init__(self, solver, potential, ftol=1e-3, maxsteps=10000, maxmove=0.1, dt=None):
+        self.solver = solver
+        self.potential = potential
+        self.boundaries = solver.boundaries
+        self.ftol = ftol
+        self.maxsteps = maxsteps
+        self.maxmove = maxmove
+        self.dt = solver.dt if dt is None else dt
+
+        # Standard FIRE parameters
+        self.dtmax = 10 * self.dt
+        self.delay = 5          # steps with positive power before speeding up
+        self.grow = 1.1         # timestep increase
+        self.shrink = 0.5       # timestep decrease
+        self.alphaStart = 0.1   # initial mixing of velocity and force
+        self.alphaShrink = 0.99 # mixing decrease
+
+    def __repr__(self):
+        """ Representing the minimizer.
+        """
+        return "FIRE minimizer with force tolerance {}".format(self.ftol)
+
+    def __call__(self):
+        """ Relax the initial positions of the solver. The number of steps,
+        the potential energy and the largest force of the relaxed state
+        are stored in 'steps', 'energy' and 'fmax'.
+
+        Returns
+        -------
+        bool
+            whether or not the force tolerance was reached
+        """
+        r = self.solver.r[0]
+        v = np.zeros(r.shape)
+
+        # The timestep, mixing and power are kept per replica, such that
+        # the replicas are relaxed independently
+        replicas = r.shape[:-2]
+        expand = lambda x: np.reshape(x, np.shape(x) + (1, 1))
+        tiny = np.finfo(float).tiny
+        dt = np.full(replicas, float(self.dt))
+        alpha = np.full(replicas, float(self.alphaStart))
+        positive = np.zeros(replicas, dtype=int)
+
+        force, u, _ = self.potential(r)
+        for step in range(self.maxsteps):
+            fmax = np.sqrt(np.einsum('...i,...i->...', force, force).max())
+            if fmax < self.ftol:
+                break
+
+            # Steer velocity towards the force, or stop if moving uphill
+            power = np.einsum('...ij,...ij->...', force, v)
+            uphill = power <= 0
+            vnorm = np.sqrt(np.einsum('...ij,...ij->...', v, v))
+            fnorm = np.sqrt(np.einsum('...ij,...ij->...', force, force))
+            v = expand(1 - alpha) * v + expand(alpha * vnorm / np.maximum(fnorm, tiny)) * force
+            v[uphill] = 0
+            positive = np.where(uphill, 0, positive + 1)
+            speedup = positive > self.delay
+            dt = np.where(speedup, np.minimum(dt * self.grow, self.dtmax), dt)
+            dt = np.where(uphill, dt * self.shrink, dt)
+            alpha = np.where(speedup, alpha * self.alphaShrink, alpha)
+            alpha = np.where(uphill, self.alphaStart, alpha)
+
+            # Euler step with the displacement of every particle limited
+            # to maxmove
+            v += expand(dt) * force
+            dr = expand(dt) * v
+            move = np.sqrt(np.einsum('...i,...i->...', dr, dr).max(axis=-1))
+            dr *= expand(np.minimum(1, self.maxmove / np.maximum(move, tiny)))
+            r += dr
+            self.boundaries.checkPosition(r, out=r)
+            force, u, _ = self.potential(r)
+        else:
+            step = self.maxsteps
+            fmax = np.sqrt(np.einsum('...i,...i->...', force, force).max())
+
+        self.steps, self.energy, self.fmax = step, np.sum(u), fmax
+        self.converged = fmax < self.ftol
+        print("\n\n" + 17 * "=", " MINIMIZATION ", 17 * "=")
+        print("Minimizer:            ", self)
+        print("Converged:            ", self.converged)
+        print("Steps:                ", self.steps)
+        print("Potential energy:     ", self.energy)
+        print("Largest force:        ", self.fmax)
+        print(50 * "=" + "\n\n")
+        return self.converged
@@ -0,0 +1,308 @@
+import numpy as np
+from itertools import product
+from mdsolver.boundaryconditions import Periodic
+
+class NeighborList:
+    """ Neighbor list class. Finds the particle pairs that are closer
+    than the cutoff distance without computing the distance between
+    all the particles.
+    """
+    def __init__(self):
+        pass
+
+    def setup(self, boundaries, cutoff):
+        """ Connect the neighbor list to the boundary conditions and
+        the cutoff distance of the potential. Called by the potential.
+
+        Parameters
+        ----------
+        boundaries : obj
+            class object defined by boundaryconditions.py
+        cutoff : float
+            cutoff distance of the potential
+        """
+        self.boundaries = boundaries
+        self.cutoff = cutoff
+        self.cutoffSqrd = cutoff * cutoff
+
+    def candidates(self, r):
+        raise NotImplementedError ("Class {} has no instance 'candidates'."
+                                   .format(self.__class__.__name__))
+
+    def withinCutoff(self, r, i, j):
+        """ Pick the candidate pairs that are closer than the cutoff.
+
+        Parameters
+        ----------
+        r : ndarray
+            spatial coordinates at some timestep
+        i : ndarray
+            index of the first particle in every candidate pair
+        j : ndarray
+            index of the second particle in every candidate pair
+
+        Returns
+        -------
+        i : ndarray
+            index of the first particle in every pair
+        j : ndarray
+            index of the second particle in every pair
+        distanceSqrd : ndarray
+            distance between the particles in every pair squared
+        dr : ndarray
+            distance vector between the particles in every pair
+        """
+        dr = self.boundaries.checkDistance(r[i] - r[j])
+        distanceSqrd = np.einsum('ij,ij->i',dr,dr)
+        indices = np.nonzero(distanceSqrd<self.cutoffSqrd)
+        return i[indices], j[indices], distanceSqrd[indices], dr[indices]
+
+    def __call__(self, r):
+        """ Find the particle pairs that are closer than the cutoff.
+
+        Parameters
+        ----------
+        r : ndarray
+            spatial coordinates at some timestep
+
+        Returns
+        -------
+        i : ndarray
+            index of the first particle in every pair
+        j : ndarray
+            index of the second particle in every pair
+        distanceSqrd : ndarray
+            distance between the particles in every pair squared
+        dr : ndarray
+            distance vector between the particles in every pair
+        """
+        i, j = self.candidates(r)
+        return self.withinCutoff(r, i, j)
+
+class CellList(NeighborList):
+    """ Linked-cell list. The box is divided into cells with side length
+    of at least the cutoff distance, such that all the neighbors of a
+    particle are found in the same cell or in the adjacent cells. The
+    cost of finding the pairs then scales as O(N) for a fixed density.
+
+    With periodic boundaries, the cell grid spans the box length and
+    wraps around. With open and reflective boundaries, the cell grid
+    spans the bounding box of the particles.
+    """
+    def __init__(self):
+        pass
+
+    def __repr__(self):
+        """ Representing the neighbor list.
+        """
+        return "Cell list"
+
+    def cellGrid(self, r, length):
+        """ Assign the particles to cells with side length of at least
+        'length'. The number of cells is capped by the number of
+        particles, such that sparse systems do not give huge grids.
+
+        Parameters
+        ----------
+        r : ndarray
+            spatial coordinates at some timestep
+        length : float
+            minimum side length of the cells
+
+        Returns
+        -------
+        coords : ndarray
+            integer cell coordinates of every particle
+        numcells : ndarray
+            number of cells in each dimension
+        periodic : bool
+            whether or not the cell grid wraps around
+        """
+        par, dim = r.shape
+        periodic = isinstance(self.boundaries, Periodic)
+        if periodic:
+            lenbox = self.boundaries.lenbox
+            lower = np.zeros(dim)
+            extent = np.full(dim, float(lenbox))
+            r = r - np.floor(r/lenbox) * lenbox
+        else:
+            lower = r.min(axis=0)
+            extent = r.max(axis=0) - lower
+        maxcells = int(par ** (1 / dim)) + 1
+        numcells = np.clip((extent // length).astype(int), 1, maxcells)
+        cellsize = np.where(extent > 0, extent / numcells, 1.0)
+        coords = ((r - lower) // cellsize).astype(int)
+        coords = np.clip(coords, 0, numcells - 1)
+        return coords, numcells, periodic
+
+    def findPairs(self, r, length):
+        """ Find all the particle pairs (i<j) that are located in the
+        same cell or in adjacent cells. This includes all the pairs that
+        are closer than 'length', and some that are further apart.
+
+        Parameters
+        ----------
+        r : ndarray
+            spatial coordinates at some timestep
+        length : float
+            minimum side length of the cells
+
+        Returns
+        -------
+        i : ndarray
+            index of the first particle in every pair
+        j : ndarray
+            index of the second particle in every pair
+        """
+        coords, numcells, periodic = self.cellGrid(r, length)
+        strides = np.cumprod(np.append(1, numcells[:-1]))
+        cell = coords @ strides
+
+        # Sort particles by cell, such that each cell is a contiguous slice
+        order = np.argsort(cell, kind="stable")
+        counts = np.bincount(cell, minlength=np.prod(numcells))
+        starts = np.cumsum(counts) - counts
+
+        # Neighbor cell offsets. With less than three periodic cells in a
+        # dimension, some offsets point to the same cell and are skipped
+        offsets = []
+        for n in numcells:
+            if periodic and n < 3:
+                offsets.append(range(n))
+            else:
+                offsets.append((-1, 0, 1))
+
+        iList, jList = [], []
+        for offset in product(*offsets):
+            neighbor = coords + offset
+            if periodic:
+                neighbor %= numcells
+                particles = np.arange(len(r))
+            else:
+                inside = np.all((neighbor >= 0) & (neighbor < numcells), axis=1)
+                particles = np.nonzero(inside)[0]
+                neighbor = neighbor[particles]
+            neighborCell = neighbor @ strides
+
+            # Pair every particle with all the particles in the neighbor cell
+            count = counts[neighborCell]
+            i = np.repeat(particles, count)
+            first = np.repeat(starts[neighborCell] - np.cumsum(count) + count, count)
+            j = order[first + np.arange(len(i))]
+
+            # Every pair is found twice, keep the one with i<j
+            keep = i < j
+            iList.append(i[keep])
+            jList.append(j[keep])
+        return np.concatenate(iList), np.concatenate(jList)
+
+    def candidates(self, r):
+        """ Find the candidate pairs, i.e., the pairs in the same or in
+        adjacent cells.
+
+        Parameters
+        ----------
+        r : ndarray
+            spatial coordinates at some timestep
+
+        Returns
+        -------
+        i : ndarray
+            index of the first particle in every candidate pair
+        j : ndarray
+            index of the second particle in every candidate pair
+        """
+        return self.findPairs(r, self.cutoff)
+
+class VerletList(CellList):
+    """ Verlet neighbor list. Stores all the pairs closer than the cutoff
+    plus a skin, found using a cell list. Since particles only move a
+    fraction of the skin per step, the list can be reused for several
+    steps. The list is rebuilt when a particle has moved more than half
+    the skin since the last build, which guarantees that no pair closer 
+    than the cutoff is missed.
+    
+    Parameters
+    ----------
+    skin : float
+        thickness of the skin added to the cutoff. 0.3 by default.
+    """
+    def __init__(self, skin=0.3):
+        self.skin = skin
+        self.rebuilds = 0
+        self.rBuild = None
+        
+    def __repr__(self):
+        """ Representing the neighbor list.
+        """
+        return "Verlet list with skin {}".format(self.skin)
+        
+    def setup(self, boundaries, cutoff):
+        """ Connect the neighbor list to the boundary conditions and
+        the cutoff distance of the potential. Called by the potential.
+
+        Parameters
+        ----------
+        boundaries : obj
+            class object defined by boundaryconditions.py
+        cutoff : float
+            cutoff distance of the potential
+        """
+        NeighborList.setup(self, boundaries, cutoff)
+        self.listSqrd = (cutoff + self.skin) ** 2
+        self.rBuild = None
+        
+    def build(self, r):
+        """ Build the list of pairs closer than the cutoff plus the skin,
+        and store the positions at the time of the build.
+        
+        Parameters
+        ----------
+        r : ndarray
+            spatial coordinates at some timestep
+        """
+        i, j = self.findPairs(r, self.cutoff + self.skin)
+        dr = self.boundaries.checkDistance(r[i] - r[j])
+        distanceSqrd = np.einsum('ij,ij->i',dr,dr)
+        indices = np.nonzero(distanceSqrd<self.listSqrd)
+        self.i, self.j = i[indices], j[indices]
+        self.rBuild = r.copy()
+        self.rebuilds += 1
+        
+    def maxDisplacement(self, r):
+        """ Largest distance a particle has moved since the last build.
+        
+        Parameters
+        ----------
+        r : ndarray
+            spatial coordinates at some timestep
+            
+        Returns
+        -------
+        float
+            maximum displacement
+        """
+        dr = self.boundaries.checkDistance(r - self.rBuild)
+        return np.sqrt(np.einsum('ij,ij->i',dr,dr).max())
+        
+    def candidates(self, r):
+        """ Get the candidate pairs, i.e., the pairs in the Verlet list. 
+        The list is rebuilt if a particle has moved more than half the
+        skin since the last build.
+
+        Parameters
+        ----------
+        r : ndarray
+            spatial coordinates at some timestep
+
+        Returns
+        -------
+        i : ndarray
+            index of the first particle in every candidate pair
+        j : ndarray
+            index of the second particle in every candidate pair
+        """
+        if self.rBuild is None or self.rBuild.shape != r.shape or \
+           self.maxDisplacement(r) > 0.5 * self.skin:
+            self.build(r)
+        return self.i, self.j
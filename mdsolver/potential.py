@@ -1,4 +1,8 @@
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from mdsolver.boundaryconditions import Periodic
+from mdsolver.kernels import HAVE_NUMBA, lennardJonesKernel
+
 class Potential:
     """ Potential class. Find the force acting on the particles
     given a potential.
@@ -15,9 +19,11 @@ class Potential:
         raise NotImplementedError ("Class {} has no instance 'potentialEnergy'."
                                    .format(self.__class__.__name__))
 
-class LennardJones(Potential):
-    """ The Lennard-Jones potential. Taking the form
-        U(r) = 4ε((σ/r)^12 - (σ/r)^6)
+class PairPotential(Potential):
+    """ Pair potential class. Finds the pairs closer than the cutoff and
+    sums the pair forces acting on every particle. A pair potential only
+    has to define the force and energy of a pair in 'pairForces', and
+    the total energy in 'potentialEnergy'.
     
     Parameters
     ----------
@@ -25,25 +31,77 @@ class LennardJones(Potential):
         class object defined by moleculardynamics.py. Takes the MDSolver 
         class as argument
     cutoff : float
-        cutoff distance: maximum length of the interactions. 3 by default.
+        cutoff distance: maximum length of the interactions
+    neighbors : obj
+        class object defined by neighborlists.py. If not given, the 
+        distance between all particles is computed (O(N^2)).
+    workers : int
+        number of threads used to compute the forces. 1 by default.
+        
+    After every call, the indices (i, j) of the pairs closer than the
+    cutoff and their distance squared are found in 'pairs' and
+    'distanceSqrd', and the virial (the sum of r·F over all the pairs)
+    is found in 'virial'.
+    
+    If the solver is set up with replicas, the positions have the shape 
+    (R, P, D) and the forces and energies of all replicas are computed
+    in one vectorized step. Neighbor lists are not supported with 
+    replicas.
+    
+    With more than one worker, the candidate pairs are split into chunks
+    that are handled by a thread pool. Every chunk picks the pairs
+    closer than the cutoff and sums its pair forces into its own force
+    array, and the arrays of all chunks are added at the end. The heavy
+    lifting is done by numpy, which releases the GIL. The distance 
+    matrix is not computed in this mode.
     """
-    def __init__(self, solver, cutoff=3):
+    def __init__(self, solver, cutoff, neighbors=None, workers=1):
         self.cutoff = cutoff
         self.cutoffSqrd = cutoff * cutoff
         self.boundaries = solver.boundaries
         
-        # Generate indices of upper and lower triangles
-        par = solver.numparticles
-        dim = solver.numdimensions
-        self.forceShell = np.zeros((par,par,dim))
-        self.upperTri = np.triu_indices(par, 1)
-        self.index = np.array(self.upperTri).T
+        self.numparticles = solver.numparticles
+        self.numreplicas = getattr(solver, "numreplicas", None)
         
+        # Connect neighbor list to boundaries and cutoff. Without a
+        # neighbor list, generate indices of the upper triangle
+        self.neighbors = neighbors
+        if neighbors is not None and self.numreplicas is not None:
+            raise ValueError("Neighbor lists are not supported with replicas")
+        elif neighbors is not None:
+            neighbors.setup(solver.boundaries, cutoff)
+        else:
+            self.upperTri = np.triu_indices(solver.numparticles, 1)
+            
+        self.workers = workers
+        if workers > 1 and self.numreplicas is not None:
+            raise ValueError("Multiple workers are not supported with replicas")
+        self.pool = ThreadPoolExecutor(workers) if workers > 1 else None
+        
+        # Compiled kernel computing the forces of a chunk, see kernels.py.
+        # The kernel takes a single box length, 0 for non-periodic boundaries
+        self.kernel = None
+        self.lenbox = 0.0
+        if isinstance(solver.boundaries, Periodic) and np.ndim(solver.boundaries.lenbox) == 0:
+            self.lenbox = float(solver.boundaries.lenbox)
         
     def __repr__(self):
         """ Representing the potential.
         """
-        return "Lennard-Jones potential"
+        return "Pair potential"
+        
+    def __getstate__(self):
+        """ The thread pool cannot be pickled, e.g. when the potential is
+        sent to a worker process. It is recreated when unpickled.
+        """
+        state = self.__dict__.copy()
+        state["pool"] = None
+        return state
+        
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.workers > 1:
+            self.pool = ThreadPoolExecutor(self.workers)
         
     def calculateDistanceMatrix(self, r):
         """ Compute the distance matrix (squared) at timestep t. In the
@@ -58,17 +116,25 @@ class LennardJones(Potential):
         r : ndarray
             spatial coordinates at some timestep
             
+        If a neighbor list is given, only the pairs found by the neighbor
+        list are considered and the full distance matrix is not computed.
+        
         Returns
         -------
-        distanceSqrdAll : ndarray
-            distance between all particles squared
+        distanceSqrdAll : ndarray or None
+            distance between all particles squared. None if a neighbor
+            list is used
         distanceSqrd : ndarray
             distance between particles that are closer than the cutoff
         dr : ndarray
             distance vector between particles that are closer than the cutoff
-        indices : ndarray
-            indices of the distance components that are closer than cutoff
+        pairs : tuple of ndarray
+            indices (i, j) of the particle pairs that are closer than cutoff
         """
+        if self.neighbors is not None:
+            i, j, distanceSqrd, dr = self.neighbors(r)
+            return None, distanceSqrd, dr, (i, j)
+            
         # Find distance vector matrix and distance matrix
         x, y = r[:,np.newaxis,:], r[np.newaxis,:,:]
         drAll = x - y                                 # distance vector matrix
@@ -83,32 +149,160 @@ class LennardJones(Potential):
         indices = np.nonzero(distanceSqrdHalf<self.cutoffSqrd)
         distanceSqrd = distanceSqrdHalf[indices]
         dr = drHalf[indices]
-        return distanceSqrdAll, distanceSqrd, dr, indices
+        pairs = (self.upperTri[0][indices], self.upperTri[1][indices])
+        return distanceSqrdAll, distanceSqrd, dr, pairs
+        
+    def pairForces(self, distanceSqrd, dr):
+        raise NotImplementedError ("Class {} has no instance 'pairForces'."
+                                   .format(self.__class__.__name__))
         
     @staticmethod
-    def potentialEnergy(u, cutoff):
-        """ Calculates the total potential energy, based on 
-        the potential energies of all particles stored in the matrix
-        u. Shifts the potential according to the cutoff.
+    def accumulateForces(force, pairs, numparticles):
+        """ Sum the pair forces acting on every particle. The force
+        on particle i is added, while the force on particle j is
+        subtracted according to Newton's third law. This is a
+        scatter-add over the pair indices, such that no matrix over
+        all particle pairs is needed.
         
         Parameters
         ----------
-        u : ndarray
-            array containing the potential energy of all the particles.
-        cutoff : float
-            cutoff distance: maximum length of the interactions. 3 by default.
+        force : ndarray
+            force between the particles in every pair
+        pairs : tuple of ndarray
+            indices (i, j) of the particles in every pair
+        numparticles : int
+            number of particles
             
         Returns
         -------
+        ndarray
+            the netto force acting on every particle
+        """
+        i, j = pairs
+        forceParticles = np.empty((numparticles, force.shape[1]))
+        for k in range(force.shape[1]):
+            forceParticles[:,k] = np.bincount(i, force[:,k], numparticles) \
+                                - np.bincount(j, force[:,k], numparticles)
+        return forceParticles
+        
+    def chunkForces(self, r, i, j):
+        """ Net force and potential energy from one chunk of candidate
+        pairs. Called by the worker threads.
+        
+        Parameters
+        ----------
+        r : ndarray
+            spatial coordinates at some timestep
+        i : ndarray
+            index of the first particle in every candidate pair
+        j : ndarray
+            index of the second particle in every candidate pair
+            
+        Returns
+        -------
+        ndarray
+            the force acting on every particle from the pairs in the chunk
+        float
+            pair energy of the pairs in the chunk, before the total
+            potential energy is found by 'potentialEnergy'
+        float
+            virial of the pairs in the chunk
+        tuple of ndarray
+            indices (i, j) of the pairs closer than the cutoff
+        ndarray
+            distance between the particles in these pairs squared
+        """
+        if self.kernel is not None:
+            forceParticles = np.zeros((self.numparticles, r.shape[1]))
+            distanceSqrd = np.empty(len(i))
+            u, virial = self.kernel(r, i, j, self.lenbox, self.cutoffSqrd,
+                                    forceParticles, distanceSqrd)
+            inside = distanceSqrd >= 0
+            return forceParticles, u, virial, (i[inside], j[inside]), distanceSqrd[inside]
+            
+        dr = self.boundaries.checkDistance(r[i] - r[j])
+        distanceSqrd = np.einsum('ij,ij->i',dr,dr)
+        indices = np.nonzero(distanceSqrd<self.cutoffSqrd)
+        i, j, distanceSqrd, dr = i[indices], j[indices], distanceSqrd[indices], dr[indices]
+        force, u = self.pairForces(distanceSqrd, dr)
+        u[u == np.inf] = 0
+        forceParticles = self.accumulateForces(force, (i, j), self.numparticles)
+        return forceParticles, np.sum(u), np.einsum('ij,ij', force, dr), (i, j), distanceSqrd
+        
+    def chunkedForces(self, r):
+        """ Inter-atomic force computed from the candidate pairs, split
+        into chunks that are handled by the thread pool. Without a 
+        thread pool, all the pairs are handled as one chunk.
+        
+        Parameters
+        ----------
+        r : ndarray
+            spatial coordinates at some timestep
+            
+        Returns
+        -------
+        ndarray
+            the netto force acting on every particle
         float
             total potential energy
         """
+        if self.neighbors is not None:
+            i, j = self.neighbors.candidates(r)
+        else:
+            i, j = self.upperTri
+        if self.pool is None:
+            results = [self.chunkForces(r, i, j)]
+        else:
+            chunks = zip(np.array_split(i, self.workers), np.array_split(j, self.workers))
+            results = list(self.pool.map(lambda chunk: self.chunkForces(r, *chunk), chunks))
+        
+        forces, u, virial, pairs, distanceSqrd = zip(*results)
+        self.virial = sum(virial)
+        self.pairs = (np.concatenate([pair[0] for pair in pairs]),
+                      np.concatenate([pair[1] for pair in pairs]))
+        self.distanceSqrd = np.concatenate(distanceSqrd)
+        return np.sum(forces, axis=0), self.potentialEnergy(np.array(u), self.cutoff)
+        
+    def replicaForces(self, r):
+        """ Inter-atomic force of all replicas. The pairs of the upper
+        triangle that are closer than the cutoff are picked from all
+        replicas at once, such that all replicas are handled by the 
+        same array operations.
+        
+        Parameters
+        ----------
+        r : ndarray
+            spatial coordinates of all replicas at some timestep
+            
+        Returns
+        -------
+        ndarray
+            the netto force acting on every particle in every replica
+        ndarray
+            total potential energy of every replica
+        """
+        i, j = self.upperTri
+        dr = self.boundaries.checkDistance(r[:,i] - r[:,j])
+        distanceSqrd = np.einsum('ijk,ijk->ij',dr,dr)
+        replica, pair = np.nonzero(distanceSqrd < self.cutoffSqrd)
+        dr = dr[replica, pair]
+        force, u = self.pairForces(distanceSqrd[replica, pair], dr)
         u[u == np.inf] = 0
-        return 4 * (np.sum(u) - cutoff**(-12) - cutoff**(-6))
+        replicas = len(r)
+        self.virial = np.bincount(replica, np.einsum('ij,ij->i', force, dr), replicas)
+        
+        # Sum the pair forces of all replicas in one scatter-add by
+        # numbering the particles of replica k from k*P to (k+1)*P-1 
+        offset = replica * self.numparticles
+        forceParticles = self.accumulateForces(force, (i[pair] + offset, j[pair] + offset), 
+                                               replicas * self.numparticles)
+        u = np.bincount(replica, u, replicas)
+        u = np.array([self.potentialEnergy(u[k:k+1], self.cutoff) for k in range(replicas)])
+        return forceParticles.reshape(r.shape), u
         
     def __call__(self, r):
-        """ Lennard-Jones inter-atomic force. This is used in the
-        integration loop to calculate the acceleration of particles. 
+        """ Inter-atomic force. This is used in the integration loop to
+        calculate the acceleration of particles. 
         
         Parameters
         ----------
@@ -121,24 +315,377 @@ class LennardJones(Potential):
             the netto force acting on every particle
         float
             total potential energy
-        ndarray
-            current distance matrix
+        ndarray or None
+            current distance matrix. None if a neighbor list, multiple
+            workers or a compiled kernel are used
         """
+        if r.ndim == 3:
+            self.pairs = self.distanceSqrd = None
+            forceParticles, u = self.replicaForces(r)
+            return forceParticles, u, None
+            
+        if self.pool is not None or self.kernel is not None:
+            forceParticles, u = self.chunkedForces(r)
+            return forceParticles, u, None
+            
         # Compute force between particles closer than cutoff
-        distanceSqrdAll, distanceSqrd, dr, indices = self.calculateDistanceMatrix(r)
+        distanceSqrdAll, distanceSqrd, dr, pairs = self.calculateDistanceMatrix(r)
+        self.pairs, self.distanceSqrd = pairs, distanceSqrd
+        force, u = self.pairForces(distanceSqrd, dr)
+        self.virial = np.einsum('ij,ij', force, dr)
+        
+        # Return net force on each particle and potetial energy
+        forceParticles = self.accumulateForces(force, pairs, self.numparticles)
+        u = self.potentialEnergy(u, self.cutoff)
+        return forceParticles, u, distanceSqrdAll
+
+class LennardJones(PairPotential):
+    """ The Lennard-Jones potential. Taking the form
+        U(r) = 4ε((σ/r)^12 - (σ/r)^6)
+    
+    Parameters
+    ----------
+    solver : obj
+        class object defined by moleculardynamics.py. Takes the MDSolver 
+        class as argument
+    cutoff : float
+        cutoff distance: maximum length of the interactions. 3 by default.
+    neighbors : obj
+        class object defined by neighborlists.py. If not given, the 
+        distance between all particles is computed (O(N^2)).
+    workers : int
+        number of threads used to compute the forces. 1 by default.
+    backend : str
+        'numpy', 'numba' or 'auto' (default). The numba backend computes
+        the forces in a compiled loop over the pairs, see kernels.py. 
+        'auto' picks numba if it is installed and a neighbor list is
+        used, and numpy otherwise. The distance matrix is not computed
+        by the numba backend.
+        
+    See PairPotential for the stored pairs, replicas and workers.
+    """
+    def __init__(self, solver, cutoff=3, neighbors=None, workers=1, backend="auto"):
+        PairPotential.__init__(self, solver, cutoff, neighbors, workers)
+        
+        if backend not in ("auto", "numpy", "numba"):
+            raise ValueError("Backend needs to be 'auto', 'numpy' or 'numba'")
+        elif backend == "numba" and not HAVE_NUMBA:
+            raise ImportError("The numba backend requires Numba to be installed")
+        elif backend == "auto":
+            backend = "numba" if HAVE_NUMBA and neighbors is not None else "numpy"
+        if backend == "numba" and np.ndim(getattr(self.boundaries, "lenbox", 0)) != 0:
+            raise ValueError("The numba backend does not support a box length per replica")
+        if backend == "numba" and self.numreplicas is not None:
+            raise ValueError("The numba backend is not supported with replicas")
+        self.backend = backend
+        if backend == "numba":
+            self.kernel = lennardJonesKernel
+        
+    def __repr__(self):
+        """ Representing the potential.
+        """
+        return "Lennard-Jones potential"
+        
+    def pairForces(self, distanceSqrd, dr):
+        """ Lennard-Jones force between the particles in every pair.
+        
+        Parameters
+        ----------
+        distanceSqrd : ndarray
+            distance between the particles in every pair squared
+        dr : ndarray
+            distance vector between the particles in every pair
+            
+        Returns
+        -------
+        ndarray
+            force between the particles in every pair
+        ndarray
+            unscaled potential energy (1/r^12 - 1/r^6) of every pair
+        """
         distancePowSixInv = np.nan_to_num(distanceSqrd**(-3))      # 1/r^6
         distancePowTwelveInv = distancePowSixInv**2                # 1/r^12
         factor = np.divide(2 * distancePowTwelveInv - distancePowSixInv, distanceSqrd)            # (2/r^12 - 1/r^6)/r^2
         factor[factor == np.inf] = 0
         force = 24 * np.einsum('i,ij->ij',factor,dr)
+        return force, distancePowTwelveInv - distancePowSixInv
         
-        # Connect forces to correct particles
-        forceMatrix = self.forceShell.copy()
-        index = self.index[indices].T
-        forceMatrix[(index[0],index[1])] = force
-        forceMatrix[(index[1],index[0])] = -force
+    @staticmethod
+    def potentialEnergy(u, cutoff):
+        """ Calculates the total potential energy, based on 
+        the potential energies of all particles stored in the matrix
+        u. Shifts the potential according to the cutoff.
         
-        # Return net force on each particle and potetial energy
-        forceParticles = np.sum(forceMatrix, axis=1)
-        u = self.potentialEnergy(distancePowTwelveInv - distancePowSixInv, self.cutoff)
-        return forceParticles, u, distanceSqrdAll
+        Parameters
+        ----------
+        u : ndarray
+            array containing the potential energy of all the particles.
+        cutoff : float
+            cutoff distance: maximum length of the interactions. 3 by default.
+            
+        Returns
+        -------
+        float
+            total potential energy
+        """
+        u[u == np.inf] = 0
+        return 4 * (np.sum(u) - cutoff**(-12) - cutoff**(-6))
+
+class TabulatedPotential(PairPotential):
+    """ Tabulated pair potential. The force and the energy of a pair are
+    computed once on a uniform grid in r^2 between rmin and the cutoff,
+    and interpolated when the forces are computed. Since the grid is
+    uniform in r^2, the grid point of a pair is found without a 
+    square-root or a search, such that any pair potential is as cheap 
+    as the table lookup. The potential is either given by functions of
+    the distance, or taken from another pair potential using 
+    'fromPotential'.
+    
+    Parameters
+    ----------
+    solver : obj
+        class object defined by moleculardynamics.py. Takes the MDSolver 
+        class as argument
+    energy : callable
+        pair energy U(r) as a function of the distance r (ndarray)
+    force : callable
+        magnitude of the pair force, -dU/dr, as a function of the 
+        distance r. If not given, it is found by numerical derivation
+        of the energy on the grid.
+    cutoff : float
+        cutoff distance: maximum length of the interactions. 3 by default.
+    rmin : float
+        smallest distance in the table. Pairs closer than rmin get the
+        values at rmin. 0.5 by default.
+    points : int
+        number of grid points. 10000 by default.
+    interpolation : str
+        'linear' (default) or 'spline'. The spline interpolation uses 
+        cubic Hermite splines, which are more accurate on a coarse grid.
+    neighbors : obj
+        class object defined by neighborlists.py
+    workers : int
+        number of threads used to compute the forces. 1 by default.
+    """
+    def __init__(self, solver, energy, force=None, cutoff=3, rmin=0.5, points=10000,
+                 interpolation="linear", neighbors=None, workers=1):
+        PairPotential.__init__(self, solver, cutoff, neighbors, workers)
+        if interpolation not in ("linear", "spline"):
+            raise ValueError("Interpolation needs to be 'linear' or 'spline'")
+        self.interpolation = interpolation
+        self.points = points
+        self.rminSqrd = rmin * rmin
+        self.step = (self.cutoffSqrd - self.rminSqrd) / (points - 1)
+        distanceSqrd = self.rminSqrd + self.step * np.arange(points)
+        distance = np.sqrt(distanceSqrd)
+        
+        # Tabulate the energy and the force divided by the distance, such
+        # that the force vector of a pair is the factor times dr
+        self.energyTable = np.asarray(energy(distance), dtype=float)
+        if force is None:
+            self.factorTable = -2 * np.gradient(self.energyTable, self.step)
+        else:
+            self.factorTable = np.asarray(force(distance), dtype=float) / distance
+            
+        # Slopes with respect to r^2, used by the spline interpolation.
+        # The slope of the energy is given by the force factor
+        self.energySlope = -0.5 * self.factorTable
+        self.factorSlope = np.gradient(self.factorTable, self.step)
+        self.shift = 0.0
+        
+    def __repr__(self):
+        """ Representing the potential.
+        """
+        return "Tabulated potential with {} points".format(self.points)
+        
+    @classmethod
+    def fromPotential(cls, solver, potential, **kwargs):
+        """ Tabulate another pair potential, e.g. LennardJones. The 
+        cutoff and the energy shift of the potential are kept.
+        
+        Parameters
+        ----------
+        solver : obj
+            class object defined by moleculardynamics.py
+        potential : obj
+            pair potential defining 'pairForces' and 'potentialEnergy'
+        kwargs
+            rmin, points, interpolation, neighbors and workers, see the
+            class parameters
+            
+        Returns
+        -------
+        obj
+            tabulated potential
+        """
+        def pairValues(distance):
+            dr = np.zeros((len(distance), solver.numdimensions))
+            dr[:,0] = distance
+            return potential.pairForces(distance**2, dr)
+            
+        # The total energy is taken to be linear in the pair energies
+        cutoff = potential.cutoff
+        shift = potential.potentialEnergy(np.zeros(1), cutoff)
+        scale = potential.potentialEnergy(np.ones(1), cutoff) - shift
+        tabulated = cls(solver, 
+                        energy=lambda distance: scale * pairValues(distance)[1],
+                        force=lambda distance: pairValues(distance)[0][:,0],
+                        cutoff=cutoff, **kwargs)
+        tabulated.shift = shift
+        return tabulated
+        
+    def interpolate(self, table, slope, k, w):
+        """ Interpolate a table between grid point k and k+1.
+        
+        Parameters
+        ----------
+        table : ndarray
+            tabulated values
+        slope : ndarray
+            slope of the tabulated values with respect to r^2
+        k : ndarray
+            index of the grid point below every pair
+        w : ndarray
+            relative position of every pair between grid point k and k+1
+            
+        Returns
+        -------
+        ndarray
+            interpolated values
+        """
+        if self.interpolation == "linear":
+            return table[k] + w * (table[k+1] - table[k])
+        wSqrd = w * w
+        wCube = wSqrd * w
+        return (2*wCube - 3*wSqrd + 1) * table[k] + (3*wSqrd - 2*wCube) * table[k+1] \
+             + self.step * ((wCube - 2*wSqrd + w) * slope[k] + (wCube - wSqrd) * slope[k+1])
+             
+    def pairForces(self, distanceSqrd, dr):
+        """ Interpolated force between the particles in every pair.
+        
+        Parameters
+        ----------
+        distanceSqrd : ndarray
+            distance between the particles in every pair squared
+        dr : ndarray
+            distance vector between the particles in every pair
+            
+        Returns
+        -------
+        ndarray
+            force between the particles in every pair
+        ndarray
+            potential energy of every pair
+        """
+        x = np.maximum(distanceSqrd - self.rminSqrd, 0) / self.step
+        k = np.minimum(x.astype(int), self.points - 2)
+        w = x - k
+        factor = self.interpolate(self.factorTable, self.factorSlope, k, w)
+        u = self.interpolate(self.energyTable, self.energySlope, k, w)
+        return factor[:,np.newaxis] * dr, u
+        
+    def potentialEnergy(self, u, cutoff):
+        """ Calculates the total potential energy, based on the pair 
+        energies u.
+        
+        Parameters
+        ----------
+        u : ndarray
+            array containing the potential energy of all the pairs
+        cutoff : float
+            cutoff distance: maximum length of the interactions
+            
+        Returns
+        -------
+        float
+            total potential energy
+        """
+        u[u == np.inf] = 0
+        return np.sum(u) + self.shift
+
+class SwitchedPotential(PairPotential):
+    """ Pair potential multiplied by a switching function S(r), which
+    goes smoothly from 1 at (cutoff - width) to 0 at the cutoff of the
+    given potential. The switched potential and its force both go to
+    zero at the cutoff, which makes it suitable as the short-range part
+    of a potential, see MultipleTimestep in integrator.py. The switching 
+    function is
+        S(x) = 1 - 3x^2 + 2x^3,   x = (r - cutoff + width) / width
+        
+    Parameters
+    ----------
+    solver : obj
+        class object defined by moleculardynamics.py. Takes the MDSolver 
+        class as argument
+    potential : obj
+        pair potential to switch off, e.g. LennardJones with a short 
+        cutoff. Its neighbor list and workers are reused.
+    width : float
+        width of the switching region. 0.5 by default.
+    """
+    def __init__(self, solver, potential, width=0.5):
+        PairPotential.__init__(self, solver, potential.cutoff, potential.neighbors, 
+                               potential.workers)
+        if not 0 < width < potential.cutoff:
+            raise ValueError("The width needs to be between 0 and the cutoff")
+        self.potential = potential
+        self.width = width
+        self.rswitch = potential.cutoff - width
+        
+        # The total energy is taken to be linear in the pair energies
+        shift = potential.potentialEnergy(np.zeros(1), potential.cutoff)
+        self.scale = potential.potentialEnergy(np.ones(1), potential.cutoff) - shift
+        
+    def __repr__(self):
+        """ Representing the potential.
+        """
+        return "{} switched off from {} to {}".format(self.potential, self.rswitch, 
+                                                      self.cutoff)
+        
+    def pairForces(self, distanceSqrd, dr):
+        """ Switched force between the particles in every pair, 
+            F = S F_0 - U_0 dS/dr
+        
+        Parameters
+        ----------
+        distanceSqrd : ndarray
+            distance between the particles in every pair squared
+        dr : ndarray
+            distance vector between the particles in every pair
+            
+        Returns
+        -------
+        ndarray
+            force between the particles in every pair
+        ndarray
+            switched potential energy of every pair
+        """
+        force, u = self.potential.pairForces(distanceSqrd, dr)
+        u = self.scale * u
+        distance = np.sqrt(distanceSqrd)
+        x = np.clip((distance - self.rswitch) / self.width, 0, 1)
+        switch = 1 - x * x * (3 - 2 * x)
+        slope = 6 * x * (x - 1) / self.width              # dS/dr
+        slope = np.divide(slope, distance, out=np.zeros_like(slope), where=slope!=0)
+        force = switch[:,np.newaxis] * force - (u * slope)[:,np.newaxis] * dr
+        return force, switch * u
+        
+    @staticmethod
+    def potentialEnergy(u, cutoff):
+        """ Calculates the total potential energy, based on the pair 
+        energies u.
+        
+        Parameters
+        ----------
+        u : ndarray
+            array containing the potential energy of all the pairs
+        cutoff : float
+            cutoff distance: maximum length of the interactions
+            
+        Returns
+        -------
+        float
+            total potential energy
+        """
+        u[u == np.inf] = 0
+        return np.sum(u)
@@ -0,0 +1,313 @@
+""" Opt-in profiling of the integration loop. The profiler wraps the
+potential and the integrator, and times the phases of every step with
+perf_counter_ns. The time of the methods called by name, such as the
+pair search and the boundary checks, is measured by replacing them on
+the instance during the run. The profiler is enabled by the 'profile'
+argument of the solver, and prints a summary table at the end of the
+run and optionally writes it to a JSON file.
+"""
+
+import json
+import threading
+from time import perf_counter_ns
+
+# Methods timed on the instances, with the phase they belong to
+PHASES = {"potential" : (("calculateDistanceMatrix", "pair search"),
+                         ("accumulateForces", "force assembly")),
+          "neighbors" : (("candidates", "pair search"),),
+          "boundaries" : (("checkPosition", "boundaries"),
+                          ("checkVelocity", "boundaries")),
+          "solver" : (("dumpPositions", "dump"),)}
+
+def untimed(function):
+    """ Unpickle a timed function as the wrapped function.
+    """
+    return function
+
+class TimedFunction:
+    """ Function wrapper adding the time of every call to a phase. The
+    wrapper is pickled as the wrapped function, such that instrumented
+    objects can still be written to a checkpoint.
+
+    Parameters
+    ----------
+    function : callable
+        function to time
+    phase : str
+        name of the phase
+    profiler : obj
+        Profiler object collecting the timings
+    """
+    def __init__(self, function, phase, profiler):
+        self.function = function
+        self.phase = phase
+        self.profiler = profiler
+
+    def __reduce__(self):
+        return untimed, (self.function,)
+
+    def __call__(self, *args, **kwargs):
+        start = perf_counter_ns()
+        try:
+            return self.function(*args, **kwargs)
+        finally:
+            self.profiler.add(self.phase, perf_counter_ns() - start)
+
+class TimedPotential:
+    """ Potential wrapper timing every force evaluation and counting the
+    pairs closer than the cutoff. All other attributes are taken from the
+    wrapped potential.
+
+    Parameters
+    ----------
+    potential : obj
+        object defining the inter-atomic potential
+    profiler : obj
+        Profiler object collecting the timings
+    """
+    def __init__(self, potential, profiler):
+        self.potential = potential
+        self.profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self.potential, name)
+
+    def __repr__(self):
+        return repr(self.potential)
+
+    def __call__(self, r):
+        start = perf_counter_ns()
+        result = self.potential(r)
+        phase = "forces" if self.profiler.stepping else "initial forces"
+        self.profiler.add(phase, perf_counter_ns() - start)
+        pairs = getattr(self.potential, "pairs", None)
+        if pairs is not None:
+            self.profiler.pairs += len(pairs[0])
+            self.profiler.pairCalls += 1
+        return result
+
+class TimedIntegrator:
+    """ Integrator wrapper timing every step. All other attributes are
+    taken from the wrapped integrator.
+
+    Parameters
+    ----------
+    integrator : obj
+        object defining the integrator
+    profiler : obj
+        Profiler object collecting the timings
+    """
+    def __init__(self, integrator, profiler):
+        self.integrator = integrator
+        self.profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self.integrator, name)
+
+    def __repr__(self):
+        return repr(self.integrator)
+
+    def __call__(self, r, v, a, rNew=None, vNew=None):
+        start = perf_counter_ns()
+        self.profiler.stepping = True
+        try:
+            result = self.integrator(r, v, a, rNew, vNew)
+        finally:
+            self.profiler.stepping = False
+        self.profiler.add("integrator", perf_counter_ns() - start)
+        self.profiler.steps += 1
+        return result
+
+class Profiler:
+    """ Per-phase timers of the integration loop. The phases are
+
+    - integrator: the full integration step, including the phases below
+    - forces: the force evaluation of the potential
+    - initial forces: the force evaluation before the first step
+    - pair search: the neighbor list or the distance matrix
+    - force assembly: the sum of the pair forces on every particle
+    - boundaries: the position and velocity boundary checks
+    - sinks: the sinks, including the dump file
+    - dump: writing the dump file (in a background thread)
+    - callbacks: the registered callbacks
+    - progress bar: updating the progress bar
+    - loop: the rest of the run, i.e., storing the observables and
+      closing the sinks
+
+    Phases running in worker threads are summed over the threads. After
+    the run, the summary is found in 'summary'.
+
+    Parameters
+    ----------
+    filename : str
+        name and address of the JSON file the summary is written to. If
+        not given, the summary is only printed.
+    """
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.running = False
+
+    def __repr__(self):
+        return "Profiler"
+
+    def add(self, phase, ns):
+        """ Add the time of one call to a phase.
+
+        Parameters
+        ----------
+        phase : str
+            name of the phase
+        ns : int
+            time in nanoseconds
+        """
+        with self.lock:
+            self.times[phase] = self.times.get(phase, 0) + ns
+            self.calls[phase] = self.calls.get(phase, 0) + 1
+
+    def timed(self, function, phase):
+        """ Wrap a function, such that its time is added to a phase.
+
+        Parameters
+        ----------
+        function : callable
+            function to time
+        phase : str
+            name of the phase
+
+        Returns
+        -------
+        callable
+            timed function
+        """
+        return TimedFunction(function, phase, self)
+
+    def iterate(self, iterable, phase):
+        """ Iterate over an iterable, such that the time of every next
+        item is added to a phase.
+
+        Parameters
+        ----------
+        iterable : iterable
+            iterable to time, such as a progress bar
+        phase : str
+            name of the phase
+
+        Yields
+        ------
+        obj
+            the items of the iterable
+        """
+        iterator = iter(iterable)
+        while True:
+            start = perf_counter_ns()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.add(phase, perf_counter_ns() - start)
+            yield item
+
+    def start(self, solver, potential, integrator):
+        """ Reset the timers and instrument the objects of a run.
+
+        Parameters
+        ----------
+        solver : obj
+            the MDSolver object running the simulation
+        potential : obj
+            object defining the inter-atomic potential
+        integrator : obj
+            object defining the integrator
+
+        Returns
+        -------
+        obj
+            timed potential
+        obj
+            timed integrator
+        """
+        self.times, self.calls = {}, {}
+        self.steps = self.pairs = self.pairCalls = 0
+        self.stepping = False
+        self.numatoms = solver.numparticles * (solver.numreplicas or 1)
+
+        # Replace the timed methods on the instances, and remember the
+        # ones that were already set on the instance
+        self.replaced = []
+        objects = {"potential" : potential,
+                   "neighbors" : getattr(potential, "neighbors", None),
+                   "boundaries" : solver.boundaries,
+                   "solver" : solver}
+        for key, methods in PHASES.items():
+            obj = objects[key]
+            for name, phase in methods:
+                if obj is None or not hasattr(obj, name):
+                    continue
+                self.replaced.append((obj, name, obj.__dict__.get(name)))
+                setattr(obj, name, self.timed(getattr(obj, name), phase))
+
+        self.running = True
+        self.wallStart = perf_counter_ns()
+        return TimedPotential(potential, self), TimedIntegrator(integrator, self)
+
+    def stop(self):
+        """ Restore the instrumented objects, and print and write the
+        summary.
+
+        Returns
+        -------
+        dict
+            summary of the run
+        """
+        wall = perf_counter_ns() - self.wallStart
+        self.running = False
+        for obj, name, original in reversed(self.replaced):
+            if original is None:
+                delattr(obj, name)
+            else:
+                setattr(obj, name, original)
+        self.replaced = []
+
+        # Time of the run not spent in any of the top-level phases
+        loop = wall - sum(self.times.get(phase, 0) for phase in 
+                          ("integrator", "initial forces", "sinks", "callbacks",
+                           "progress bar"))
+        self.times["loop"], self.calls["loop"] = max(loop, 0), self.steps
+
+        seconds = wall * 1e-9
+        self.summary = {"steps" : self.steps,
+                        "walltime" : seconds,
+                        "stepspersecond" : self.steps / seconds if seconds > 0 else 0.0,
+                        "atomstepspersecond" : self.steps * self.numatoms / seconds if seconds > 0 else 0.0,
+                        "pairsperstep" : self.pairs / self.pairCalls if self.pairCalls else None,
+                        "phases" : {phase : {"seconds" : self.times[phase] * 1e-9,
+                                             "calls" : self.calls[phase],
+                                             "fraction" : self.times[phase] / wall if wall > 0 else 0.0}
+                                    for phase in sorted(self.times, key=self.times.get, reverse=True)}}
+        self.printSummary()
+        if self.filename is not None:
+            with open(self.filename, 'w') as f:
+                json.dump(self.summary, f, indent=2)
+        return self.summary
+
+    def printSummary(self):
+        """ Print the summary table to terminal.
+        """
+        s = self.summary
+        print("\n\n" + 18 * "=", " PROFILE ", 19 * "=")
+        print("{:<16} {:>10} {:>7} {:>8} {:>8}".format(
+              "phase", "time [s]", "share", "calls", "us/call"))
+        for phase, p in s["phases"].items():
+            print("{:<16} {:>10.4f} {:>6.1f}% {:>8} {:>8.1f}".format(
+                  phase, p["seconds"], 100 * p["fraction"], p["calls"],
+                  1e6 * p["seconds"] / max(p["calls"], 1)))
+        print(50 * "-")
+        print("Steps:                ", s["steps"])
+        print("Wall time:            ", "{:.4f} s".format(s["walltime"]))
+        print("Steps per second:     ", "{:.1f}".format(s["stepspersecond"]))
+        print("Atom-steps per second:", "{:.4g}".format(s["atomstepspersecond"]))
+        if s["pairsperstep"] is not None:
+            print("Pairs per step:       ", "{:.1f}".format(s["pairsperstep"]))
+        print(50 * "=" + "\n\n")
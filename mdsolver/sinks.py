@@ -0,0 +1,651 @@
+import time
+import queue
+import threading
+import numpy as np
+
+class Sink:
+    """ Sink class. Receives the state of the system every 'stride'
+    steps during the integration loop, such that positions, velocities
+    and observables can be stored or written without keeping the full
+    trajectory in memory.
+
+    Parameters
+    ----------
+    stride : int
+        number of steps between every time the sink is called
+    """
+    def __init__(self, stride=1):
+        self.stride = stride
+
+    def open(self, solver):
+        """ Called once before the integration loop starts.
+
+        Parameters
+        ----------
+        solver : obj
+            the MDSolver object running the simulation
+        """
+        pass
+
+    def __call__(self, t, r, v, u):
+        raise NotImplementedError ("Class {} has no instance '__call__'."
+                                   .format(self.__class__.__name__))
+
+    def flush(self):
+        """ Flush buffered output to disk.
+        """
+        pass
+
+    def close(self):
+        """ Called once after the integration loop is finished.
+        """
+        pass
+
+class MemorySink(Sink):
+    """ Store positions, velocities and potential energy in memory every
+    'stride' steps. After the simulation, the stored states are found
+    in the arrays 't', 'r', 'v' and 'u'.
+
+    Parameters
+    ----------
+    stride : int
+        number of steps between every stored state
+    positions : bool
+        whether or not the positions should be stored
+    velocities : bool
+        whether or not the velocities should be stored
+    """
+    def __init__(self, stride=1, positions=True, velocities=True):
+        self.stride = stride
+        self.positions = positions
+        self.velocities = velocities
+
+    def __repr__(self):
+        return "Memory sink with stride {}".format(self.stride)
+
+    def open(self, solver):
+        """ Reset the stored states.
+
+        Parameters
+        ----------
+        solver : obj
+            the MDSolver object running the simulation
+        """
+        self.solver = solver
+        self.steps, self.rList, self.vList, self.uList = [], [], [], []
+
+    def __call__(self, t, r, v, u):
+        """ Store the current state.
+
+        Parameters
+        ----------
+        t : int
+            current step
+        r : ndarray
+            current position array
+        v : ndarray
+            current velocity array
+        u : float
+            current potential energy
+        """
+        self.steps.append(t)
+        self.uList.append(u)
+        if self.positions:
+            self.rList.append(r.copy())
+        if self.velocities:
+            self.vList.append(v.copy())
+
+    def close(self):
+        """ Convert the stored states to arrays.
+        """
+        self.t = self.solver.timeOf(self.steps)
+        self.u = np.array(self.uList)
+        self.r = np.array(self.rList)
+        self.v = np.array(self.vList)
+
+class EnergySink(Sink):
+    """ Store the kinetic and potential energy every 'stride' steps.
+    After the simulation, the energies are found in the arrays 't',
+    'k' and 'u'.
+
+    Parameters
+    ----------
+    stride : int
+        number of steps between every stored energy
+    """
+    def __init__(self, stride=1):
+        self.stride = stride
+
+    def __repr__(self):
+        return "Energy sink with stride {}".format(self.stride)
+
+    def open(self, solver):
+        """ Reset the stored energies.
+
+        Parameters
+        ----------
+        solver : obj
+            the MDSolver object running the simulation
+        """
+        self.solver = solver
+        self.steps, self.kList, self.uList = [], [], []
+
+    def __call__(self, t, r, v, u):
+        """ Store the current energies.
+
+        Parameters
+        ----------
+        t : int
+            current step
+        r : ndarray
+            current position array
+        v : ndarray
+            current velocity array
+        u : float
+            current potential energy
+        """
+        self.steps.append(t)
+        self.kList.append((v**2).sum(axis=(-2,-1))/2)
+        self.uList.append(u)
+
+    def close(self):
+        """ Convert the stored energies to arrays.
+        """
+        self.t = self.solver.timeOf(self.steps)
+        self.k = np.array(self.kList)
+        self.u = np.array(self.uList)
+
+class XYZSink(Sink):
+    """ Dump positions to a xyz-file every 'stride' steps.
+
+    Parameters
+    ----------
+    dumpfile : str
+        name and address of dumpfile
+    stride : int
+        number of steps between every dumped frame
+    """
+    def __init__(self, dumpfile, stride=1):
+        self.dumpfile = dumpfile
+        self.stride = stride
+
+    def __repr__(self):
+        return "XYZ sink '{}' with stride {}".format(self.dumpfile, self.stride)
+
+    def open(self, solver):
+        """ Open the dumpfile.
+
+        Parameters
+        ----------
+        solver : obj
+            the MDSolver object running the simulation
+        """
+        self.dumpPositions = solver.dumpPositions
+        self.f = open(self.dumpfile, 'w')
+
+    def __call__(self, t, r, v, u):
+        """ Dump the current positions.
+
+        Parameters
+        ----------
+        t : int
+            current step
+        r : ndarray
+            current position array
+        v : ndarray
+            current velocity array
+        u : float
+            current potential energy
+        """
+        self.dumpPositions(r, self.f)
+
+    def flush(self):
+        """ Flush written frames to disk.
+        """
+        self.f.flush()
+
+    def close(self):
+        """ Close the dumpfile.
+        """
+        self.f.close()
+
+class DistanceSink(Sink):
+    """ Store the distance between the particle pairs closer than the 
+    cutoff every 'stride' steps. The pairs are taken from the potential, 
+    and stored as a compact sparse record: the pairs of all the frames 
+    are concatenated, and frame k is found between offsets[k] and 
+    offsets[k+1]. The dense distance tensor is never built.
+    
+    Parameters
+    ----------
+    stride : int
+        number of steps between every stored frame
+    pairs : array_like
+        pairs (i, j) that should be stored. If not given, all the pairs 
+        closer than the cutoff are stored.
+    rmax : float
+        maximum distance stored. If not given, the cutoff is used.
+    """
+    def __init__(self, stride=1, pairs=None, rmax=None):
+        self.stride = stride
+        self.pairFilter = pairs
+        self.rmax = rmax
+        
+    def __repr__(self):
+        return "Distance sink with stride {}".format(self.stride)
+        
+    @staticmethod
+    def pairKey(i, j, numparticles):
+        """ Unique key of the pairs (i, j), independent of the order.
+        """
+        i, j = np.asarray(i, dtype=np.int64), np.asarray(j, dtype=np.int64)
+        return np.minimum(i, j) * numparticles + np.maximum(i, j)
+        
+    def open(self, solver):
+        """ Reset the stored frames.
+        
+        Parameters
+        ----------
+        solver : obj
+            the MDSolver object running the simulation
+        """
+        self.solver = solver
+        self.potential = solver.potential
+        self.numparticles = solver.numparticles
+        self.keys = None
+        if self.pairFilter is not None:
+            i, j = np.asarray(self.pairFilter).T
+            self.keys = self.pairKey(i, j, self.numparticles)
+        self.steps, self.iList, self.jList, self.dList = [], [], [], []
+        
+    def __call__(self, t, r, v, u):
+        """ Store the distances of the current frame.
+        
+        Parameters
+        ----------
+        t : int
+            current step
+        r : ndarray
+            current position array
+        v : ndarray
+            current velocity array
+        u : float
+            current potential energy
+        """
+        if getattr(self.potential, "pairs", None) is None:
+            raise ValueError("{} does not store its pairs, which is needed "
+                             "by DistanceSink".format(self.potential))
+        i, j = self.potential.pairs
+        distanceSqrd = self.potential.distanceSqrd
+        keep = np.ones(len(i), dtype=bool)
+        if self.keys is not None:
+            keep &= np.isin(self.pairKey(i, j, self.numparticles), self.keys)
+        if self.rmax is not None:
+            keep &= distanceSqrd < self.rmax**2
+        self.steps.append(t)
+        self.iList.append(i[keep].astype(np.int32))
+        self.jList.append(j[keep].astype(np.int32))
+        self.dList.append(np.sqrt(distanceSqrd[keep]).astype(np.float32))
+        
+    def close(self):
+        """ Concatenate the stored frames.
+        """
+        self.t = self.solver.timeOf(self.steps)
+        self.offsets = np.cumsum([0] + [len(i) for i in self.iList])
+        self.i = np.concatenate(self.iList)
+        self.j = np.concatenate(self.jList)
+        self.d = np.concatenate(self.dList)
+        del self.iList, self.jList, self.dList
+        
+    def __len__(self):
+        return len(self.t)
+        
+    def frame(self, k):
+        """ Get the stored pairs and distances of frame k.
+        
+        Parameters
+        ----------
+        k : int
+            frame number
+            
+        Returns
+        -------
+        i : ndarray
+            index of the first particle in every pair
+        j : ndarray
+            index of the second particle in every pair
+        d : ndarray
+            distance between the particles in every pair
+        """
+        start, stop = self.offsets[k], self.offsets[k+1]
+        return self.i[start:stop], self.j[start:stop], self.d[start:stop]
+        
+    def uniquePairs(self):
+        """ Get all the pairs that are stored in at least one frame.
+        
+        Returns
+        -------
+        ndarray
+            pairs (i, j) with i<j
+        """
+        keys = np.unique(self.pairKey(self.i, self.j, self.numparticles))
+        return np.column_stack(np.divmod(keys, self.numparticles))
+        
+    def pair(self, i, j):
+        """ Get the distance between particle i and j as a function of 
+        time. Frames where the distance is not stored are NaN.
+        
+        Parameters
+        ----------
+        i : int
+            index of the first particle
+        j : int
+            index of the second particle
+            
+        Returns
+        -------
+        ndarray
+            distance between particle i and j in every frame
+        """
+        key = self.pairKey(i, j, self.numparticles)
+        index = np.nonzero(self.pairKey(self.i, self.j, self.numparticles) == key)[0]
+        frames = np.searchsorted(self.offsets, index, side="right") - 1
+        d = np.full(len(self), np.nan)
+        d[frames] = self.d[index]
+        return d
+
+class TrajectorySink(Sink):
+    """ Write positions to a binary trajectory file every 'stride' steps.
+    The file can be read using the Trajectory class in trajectory.py, 
+    and exported to a xyz-file when needed.
+    
+    Parameters
+    ----------
+    filename : str
+        name and address of the trajectory file
+    stride : int
+        number of steps between every written frame
+    dtype : data-type
+        floating point type of the stored positions. float32 by default.
+    append : bool
+        whether or not to append to an existing trajectory file
+    """
+    def __init__(self, filename, stride=1, dtype=np.float32, append=False):
+        self.filename = filename
+        self.stride = stride
+        self.dtype = dtype
+        self.append = append
+        
+    def __repr__(self):
+        return "Trajectory sink '{}' with stride {}".format(self.filename, self.stride)
+        
+    def open(self, solver):
+        """ Open the trajectory file.
+        
+        Parameters
+        ----------
+        solver : obj
+            the MDSolver object running the simulation
+        """
+        from mdsolver.trajectory import TrajectoryWriter
+        self.writer = TrajectoryWriter(self.filename, solver.numparticles, 
+                                       solver.numdimensions, self.dtype, 
+                                       self.append)
+        
+    def __call__(self, t, r, v, u):
+        """ Write the current positions.
+        
+        Parameters
+        ----------
+        t : int
+            current step
+        r : ndarray
+            current position array
+        v : ndarray
+            current velocity array
+        u : float
+            current potential energy
+        """
+        self.writer.write(r, t)
+        
+    def flush(self):
+        """ Flush written frames to disk.
+        """
+        self.writer.flush()
+        
+    def close(self):
+        """ Close the trajectory file.
+        """
+        self.writer.close()
+
+class CompressedTrajectorySink(Sink):
+    """ Write positions to a compressed trajectory file every 'stride' 
+    steps. The coordinates are quantized to the given precision. The file 
+    can be read using the CompressedTrajectory class in trajectory.py.
+    
+    Parameters
+    ----------
+    filename : str
+        name and address of the trajectory file
+    stride : int
+        number of steps between every written frame
+    precision : float
+        precision of the stored coordinates. 1e-3 by default.
+    chunksize : int
+        number of frames compressed together. 100 by default.
+    method : str
+        compression method, 'zlib' (default) or 'lzma'
+    """
+    def __init__(self, filename, stride=1, precision=1e-3, chunksize=100, 
+                 method="zlib"):
+        self.filename = filename
+        self.stride = stride
+        self.precision = precision
+        self.chunksize = chunksize
+        self.method = method
+        
+    def __repr__(self):
+        return "Compressed trajectory sink '{}' with stride {}".format(self.filename, self.stride)
+        
+    def open(self, solver):
+        """ Open the trajectory file.
+        
+        Parameters
+        ----------
+        solver : obj
+            the MDSolver object running the simulation
+        """
+        from mdsolver.trajectory import CompressedTrajectoryWriter
+        self.writer = CompressedTrajectoryWriter(self.filename, solver.numparticles, 
+                                                 solver.numdimensions, self.precision,
+                                                 self.chunksize, self.method)
+        
+    def __call__(self, t, r, v, u):
+        """ Write the current positions.
+        
+        Parameters
+        ----------
+        t : int
+            current step
+        r : ndarray
+            current position array
+        v : ndarray
+            current velocity array
+        u : float
+            current potential energy
+        """
+        self.writer.write(r, t)
+        
+    def flush(self):
+        """ Flush written chunks to disk.
+        """
+        self.writer.flush()
+        
+    def close(self):
+        """ Close the trajectory file.
+        """
+        self.writer.close()
+        
+class CheckpointSink(Sink):
+    """ Write a checkpoint every 'stride' steps, such that a killed run
+    can be continued using MDSolver.fromCheckpoint. The checkpoint file
+    is overwritten every time.
+    
+    Parameters
+    ----------
+    filename : str
+        name and address of the checkpoint file
+    stride : int
+        number of steps between every checkpoint
+    """
+    def __init__(self, filename, stride=1000):
+        self.filename = filename
+        self.stride = stride
+        
+    def __repr__(self):
+        return "Checkpoint sink '{}' with stride {}".format(self.filename, self.stride)
+        
+    def open(self, solver):
+        """ Connect to the solver.
+        
+        Parameters
+        ----------
+        solver : obj
+            the MDSolver object running the simulation
+        """
+        self.solver = solver
+        
+    def __call__(self, t, r, v, u):
+        """ Write a checkpoint of the current state.
+        
+        Parameters
+        ----------
+        t : int
+            current step
+        r : ndarray
+            current position array
+        v : ndarray
+            current velocity array
+        u : float
+            current potential energy
+        """
+        self.solver.checkpoint(self.filename, t)
+        
+class ThreadedSink(Sink):
+    """ Call a sink from a background writer thread, such that the 
+    integration loop does not stall on disk I/O. The states are passed
+    through a bounded queue. When the queue is full, the integration 
+    loop waits until the writer has caught up (backpressure). The writer
+    handles all the queued states at once, and flushes the sink every 
+    'flushinterval' seconds.
+    
+    Only sinks that use the arguments passed to them can be threaded,
+    sinks reading the state of the solver (like DistanceSink) cannot.
+    
+    Parameters
+    ----------
+    sink : obj
+        class object defined by sinks.py
+    maxsize : int
+        maximum number of states in the queue. 64 by default.
+    flushinterval : float
+        number of seconds between every flush. 1 by default.
+    """
+    def __init__(self, sink, maxsize=64, flushinterval=1.0):
+        self.sink = sink
+        self.stride = sink.stride
+        self.maxsize = maxsize
+        self.flushinterval = flushinterval
+        
+    def __repr__(self):
+        return "Threaded {}".format(self.sink)
+        
+    def open(self, solver):
+        """ Open the sink and start the writer thread.
+        
+        Parameters
+        ----------
+        solver : obj
+            the MDSolver object running the simulation
+        """
+        self.sink.open(solver)
+        self.queue = queue.Queue(self.maxsize)
+        self.error = None
+        self.thread = threading.Thread(target=self.write, daemon=True)
+        self.thread.start()
+        
+    def write(self):
+        """ Writer thread. Takes all the queued states and passes them 
+        to the sink, until the end of the simulation is signaled. 
+        """
+        lastFlush = time.monotonic()
+        done = False
+        while not done:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for state in batch:
+                if state is None:
+                    done = True
+                elif self.error is None:
+                    try:
+                        self.sink(*state)
+                    except Exception as error:
+                        self.error = error
+            if self.error is None and time.monotonic() - lastFlush > self.flushinterval:
+                try:
+                    self.sink.flush()
+                except Exception as error:
+                    self.error = error
+                lastFlush = time.monotonic()
+                
+    def put(self, item):
+        """ Put an item in the queue. Raises an error instead of waiting
+        forever if the writer thread is not running.
+        
+        Parameters
+        ----------
+        item : tuple or None
+            queued state, or None to signal the end of the simulation
+        """
+        while True:
+            if not self.thread.is_alive():
+                raise RuntimeError("The writer thread of {} is not running"
+                                   .format(self))
+            try:
+                self.queue.put(item, timeout=1.0)
+                return
+            except queue.Full:
+                pass
+                
+    def __call__(self, t, r, v, u):
+        """ Queue a copy of the current state. 
+        
+        Parameters
+        ----------
+        t : int
+            current step
+        r : ndarray
+            current position array
+        v : ndarray
+            current velocity array
+        u : float
+            current potential energy
+        """
+        if self.error is not None:
+            raise self.error
+        self.put((t, r.copy(), v.copy(), u))
+        
+    def close(self):
+        """ Wait for the writer thread to handle all the queued states, 
+        and close the sink.
+        """
+        if self.thread.is_alive():
+            self.put(None)
+            self.thread.join()
+        self.sink.close()
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,245 @@
+""" Parameter sweeps. Runs a grid of simulations in a process pool, where
+every point of the grid is an FCC lattice simulated with the
+Lennard-Jones potential. Every point writes its results to its own files,
+such that finished points are kept when other points fail, and a summary
+table is gathered at the end.
+
+Usage from the command line:
+    python -m mdsolver.sweep grid.json --workers 4 --outdir sweep
+
+where grid.json maps parameter names to a value or a list of values, e.g.
+    {"temperature": [100, 200, 300], "lenbulk": [3.4, 3.6], "dt": 0.005}
+"""
+
+import io
+import os
+import csv
+import json
+import time
+import argparse
+import itertools
+import contextlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULTS = {"cells" : 2,                    # FCC unit cells in each dimension
+            "lenbulk" : 3.4,                # length of the FCC lattice
+            "dim" : 3,                      # number of dimensions
+            "temperature" : 300,            # initial temperature in Kelvin
+            "boundaries" : "periodic",      # periodic, reflective or open
+            "lenbox" : None,                # box length, lenbulk by default
+            "T" : 1,                        # total time
+            "dt" : 0.01,                    # time step
+            "cutoff" : 3,                   # cutoff distance of the potential
+            "neighbors" : None,             # None, 'cells' or 'verlet'
+            "integrator" : "VelocityVerlet",
+            "stride" : 10,                  # steps between stored energies
+            "seed" : None}                  # seed of the random numbers
+
+def expandGrid(grid):
+    """ Expand a grid of parameters into a list of points. Parameters
+    given as lists are combined in all possible ways.
+
+    Parameters
+    ----------
+    grid : dict
+        parameter names mapped to a value or a list of values
+
+    Returns
+    -------
+    list of dict
+        parameters of every point
+    """
+    unknown = set(grid) - set(DEFAULTS)
+    if unknown:
+        raise ValueError("Unknown sweep parameters {}".format(sorted(unknown)))
+    names = list(grid)
+    values = [grid[name] if isinstance(grid[name], list) else [grid[name]]
+              for name in names]
+    return [dict(DEFAULTS, **dict(zip(names, point)))
+            for point in itertools.product(*values)]
+
+def simulate(params):
+    """ Run the simulation of a single point.
+
+    Parameters
+    ----------
+    params : dict
+        parameters of the point
+
+    Returns
+    -------
+    obj
+        EnergySink holding the kinetic and potential energy
+    """
+    from mdsolver import MDSolver
+    from mdsolver import integrator
+    from mdsolver.potential import LennardJones
+    from mdsolver.initpositions import FCC
+    from mdsolver.initvelocities import Temperature
+    from mdsolver.boundaryconditions import Open, Reflective, Periodic
+    from mdsolver.neighborlists import CellList, VerletList
+    from mdsolver.sinks import EnergySink
+
+    if params["seed"] is not None:
+        np.random.seed(params["seed"])
+    lenbox = params["lenbox"] or params["lenbulk"]
+    boundaries = {"open" : lambda: Open(),
+                  "reflective" : lambda: Reflective(lenbox),
+                  "periodic" : lambda: Periodic(lenbox)}[params["boundaries"]]()
+    neighbors = {None : lambda: None,
+                 "cells" : CellList,
+                 "verlet" : VerletList}[params["neighbors"]]()
+    solver = MDSolver(positions=FCC(params["cells"], params["lenbulk"], params["dim"]),
+                      velocities=Temperature(params["temperature"]),
+                      boundaries=boundaries,
+                      T=params["T"],
+                      dt=params["dt"],
+                      buffersize=1,
+                      initialdump=None)
+    energy = EnergySink(params["stride"])
+    solver(potential=LennardJones(solver, params["cutoff"], neighbors),
+           integrator=getattr(integrator, params["integrator"])(solver),
+           poteng=False,
+           sinks=[energy],
+           progress=False)
+    energy.temperature = energy.k * 2 * 119.7 / (solver.numparticles * solver.numdimensions)
+    return energy
+
+def runPoint(index, params, outdir):
+    """ Run a single point of the sweep and write the energies to
+    'point_<index>.npz' and the summary to 'point_<index>.json' in outdir.
+    Errors are caught and reported in the summary, such that one failing
+    point does not stop the sweep. The energies of a failed point are 
+    removed, such that they never belong to another run than the summary.
+
+    Parameters
+    ----------
+    index : int
+        index of the point
+    params : dict
+        parameters of the point
+    outdir : str
+        directory where the results are written
+
+    Returns
+    -------
+    dict
+        summary of the point
+    """
+    name = os.path.join(outdir, "point_{:04d}".format(index))
+    summary = {"index" : index}
+    summary.update(params)
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), \
+             contextlib.redirect_stderr(io.StringIO()):
+            energy = simulate(params)
+        e = energy.k + energy.u
+        np.savez(name + ".tmp.npz", t=energy.t, k=energy.k, u=energy.u,
+                 temperature=energy.temperature)
+        os.replace(name + ".tmp.npz", name + ".npz")
+        summary.update(status="ok", error="",
+                       meantemperature=float(np.mean(energy.temperature)),
+                       energy=float(e[-1]),
+                       drift=float(np.abs(e[-1] - e[0]) / np.abs(e[0])))
+    except Exception as error:
+        summary.update(status="failed", error=repr(error))
+        
+        # Remove the energies of an earlier run of the point
+        for filename in (name + ".tmp.npz", name + ".npz"):
+            if os.path.exists(filename):
+                os.remove(filename)
+    summary["walltime"] = time.perf_counter() - start
+    with open(name + ".json", 'w') as f:
+        json.dump(summary, f)
+    return summary
+
+def sweep(grid, workers=None, outdir="sweep", overwrite=False):
+    """ Run all points of a parameter grid in a process pool, and write a
+    summary table 'summary.csv' to outdir. Points that already finished
+    successfully in outdir are not run again, unless overwrite=True.
+
+    Parameters
+    ----------
+    grid : dict
+        parameter names mapped to a value or a list of values
+    workers : int
+        number of worker processes. Number of CPUs by default.
+    outdir : str
+        directory where the results are written
+    overwrite : bool
+        whether or not to rerun points that already finished
+
+    Returns
+    -------
+    list of dict
+        summary of every point
+    """
+    points = expandGrid(grid)
+    outdir = os.path.abspath(outdir)
+    os.makedirs(outdir, exist_ok=True)
+
+    summaries = [None] * len(points)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for index, params in enumerate(points):
+            name = os.path.join(outdir, "point_{:04d}.json".format(index))
+            if not overwrite and os.path.exists(name):
+                with open(name) as f:
+                    summary = json.load(f)
+                if summary["status"] == "ok" and \
+                   all(summary[key] == value for key, value in params.items()):
+                    summaries[index] = summary
+                    continue
+            futures[index] = pool.submit(runPoint, index, params, outdir)
+        for index, future in futures.items():
+            try:
+                summaries[index] = future.result()
+            except Exception as error:  # the worker process died
+                summaries[index] = dict({"index" : index}, **points[index])
+                summaries[index].update(status="failed", error=repr(error))
+
+    columns = ["index"] + list(DEFAULTS) + ["status", "meantemperature",
+               "energy", "drift", "walltime", "error"]
+    with open(os.path.join(outdir, "summary.csv"), 'w', newline='') as f:
+        writer = csv.DictWriter(f, columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(summaries)
+    return summaries
+
+def printSummary(summaries):
+    """ Print the summary table to terminal.
+
+    Parameters
+    ----------
+    summaries : list of dict
+        summary of every point
+    """
+    print("\n\n" + 22 * "=", " SWEEP SUMMARY ", 22 * "=")
+    print("{:>5} {:>8} {:>12} {:>12} {:>10} {:>8}".format(
+          "point", "status", "mean temp.", "energy", "drift", "time"))
+    for s in summaries:
+        if s["status"] == "ok":
+            print("{:>5} {:>8} {:>12.2f} {:>12.4f} {:>10.2e} {:>8.2f}".format(
+                  s["index"], s["status"], s["meantemperature"], s["energy"],
+                  s["drift"], s["walltime"]))
+        else:
+            print("{:>5} {:>8}  {}".format(s["index"], s["status"], s["error"]))
+    print(61 * "=" + "\n\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a parameter sweep of "
+                                     "Lennard-Jones FCC simulations")
+    parser.add_argument("grid", help="JSON file mapping parameter names to "
+                        "a value or a list of values")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes")
+    parser.add_argument("--outdir", default="sweep",
+                        help="directory where the results are written")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="rerun points that already finished")
+    args = parser.parse_args()
+    with open(args.grid) as f:
+        grid = json.load(f)
+    printSummary(sweep(grid, args.workers, args.outdir, args.overwrite))
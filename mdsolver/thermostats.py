@@ -0,0 +1,207 @@
+import numpy as np
+from mdsolver import MDSolver
+
+class Thermostat:
+    """ Thermostat class. Controls the temperature by changing the
+    velocities after every integration step. The thermostat is active
+    during an equilibration phase of a given number of steps, after
+    which the simulation continues in the microcanonical ensemble (NVE).
+    A thermostat is given to the integrator by the 'thermostat' argument.
+
+    The temperature is found from the kinetic energy as in
+    plot_temperature, T = 2 * 119.7 * K / (N * D), and the target
+    temperature is given in Kelvin.
+    """
+    def __init__(self):
+        pass
+
+    @staticmethod
+    def temperature(v):
+        """ Temperature of the system (of every replica).
+
+        Parameters
+        ----------
+        v : ndarray
+            velocity array
+
+        Returns
+        -------
+        float or ndarray
+            temperature in Kelvin
+        """
+        numparticles, numdimensions = v.shape[-2:]
+        return MDSolver.kineticEnergy(v) * 2 * 119.7 / (numparticles * numdimensions)
+
+    @staticmethod
+    def perReplica(x):
+        """ Reshape a scalar or a value per replica, such that it can be
+        multiplied with the velocity array.
+        """
+        return np.reshape(x, np.shape(x) + (1, 1))
+
+    def __call__(self, v, dt):
+        """ Apply the thermostat to the velocities in place, if the
+        equilibration phase is not finished.
+
+        Parameters
+        ----------
+        v : ndarray
+            velocity array of the new state
+        dt : float
+            timestep
+        """
+        if self.steps is not None and self.step >= self.steps:
+            return
+        self.step += 1
+        self.apply(v, dt)
+
+    def getState(self):
+        """ State of the thermostat that changes during the run, which is
+        written to checkpoints.
+
+        Returns
+        -------
+        dict
+            state of the thermostat
+        """
+        return {"step" : self.step}
+
+    def setState(self, state):
+        """ Continue from a state written by 'getState'.
+
+        Parameters
+        ----------
+        state : dict
+            state of the thermostat
+        """
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    def apply(self, v, dt):
+        raise NotImplementedError ("Class {} has no instance 'apply'."
+                                   .format(self.__class__.__name__))
+
+class Berendsen(Thermostat):
+    """ Berendsen thermostat. The velocities are scaled every step by
+        λ = sqrt(1 + dt/τ (T_0/T - 1)),
+    which makes the temperature relax exponentially to T_0 with the
+    time constant τ. Fast and robust, but does not give the canonical
+    distribution, which makes it best suited for equilibration.
+
+    Parameters
+    ----------
+    T : float
+        target temperature given in Kelvin
+    tau : float
+        relaxation time. 0.1 by default.
+    steps : int
+        number of steps the thermostat is active. Always active if None
+        (default).
+    """
+    def __init__(self, T, tau=0.1, steps=None):
+        self.T = T
+        self.tau = tau
+        self.steps = steps
+        self.step = 0
+
+    def __repr__(self):
+        return "Berendsen thermostat at {} K".format(self.T)
+
+    def apply(self, v, dt):
+        """ Scale the velocities.
+
+        Parameters
+        ----------
+        v : ndarray
+            velocity array of the new state
+        dt : float
+            timestep
+        """
+        T = self.temperature(v)
+        scale = np.sqrt(np.maximum(1 + dt / self.tau * (self.T / T - 1), 0))
+        v *= self.perReplica(np.nan_to_num(scale, nan=1.0, posinf=1.0))
+
+class Langevin(Thermostat):
+    """ Langevin thermostat. Every particle feels a friction and a random
+    force, which are integrated exactly over a timestep:
+        v = c v + sqrt((1 - c^2) T_0) ξ,    c = exp(-γ dt),
+    where ξ are standard normal numbers and T_0 is in reduced units.
+    Gives the canonical distribution.
+
+    Parameters
+    ----------
+    T : float
+        target temperature given in Kelvin
+    gamma : float
+        friction coefficient. 1 by default.
+    steps : int
+        number of steps the thermostat is active. Always active if None
+        (default).
+    """
+    def __init__(self, T, gamma=1, steps=None):
+        self.T = T
+        self.gamma = gamma
+        self.steps = steps
+        self.step = 0
+
+    def __repr__(self):
+        return "Langevin thermostat at {} K".format(self.T)
+
+    def apply(self, v, dt):
+        """ Add friction and random kicks to the velocities.
+
+        Parameters
+        ----------
+        v : ndarray
+            velocity array of the new state
+        dt : float
+            timestep
+        """
+        c = np.exp(-self.gamma * dt)
+        v *= c
+        v += np.sqrt((1 - c * c) * self.T / 119.7) * np.random.normal(size=v.shape)
+
+class NoseHoover(Thermostat):
+    """ Nosé-Hoover thermostat. The velocities are coupled to a friction
+    variable ζ, which grows when the system is too hot and shrinks when
+    it is too cold:
+        dζ/dt = (T/T_0 - 1) / τ^2,    dv/dt = -ζ v.
+    Gives the canonical distribution for ergodic systems.
+
+    Parameters
+    ----------
+    T : float
+        target temperature given in Kelvin
+    tau : float
+        period of the temperature oscillations. 0.1 by default.
+    steps : int
+        number of steps the thermostat is active. Always active if None
+        (default).
+    """
+    def __init__(self, T, tau=0.1, steps=None):
+        self.T = T
+        self.tau = tau
+        self.steps = steps
+        self.step = 0
+        self.zeta = 0.0
+
+    def __repr__(self):
+        return "Nosé-Hoover thermostat at {} K".format(self.T)
+
+    def getState(self):
+        """ The step and the friction variable ζ.
+        """
+        return {"step" : self.step, "zeta" : self.zeta}
+
+    def apply(self, v, dt):
+        """ Update the friction variable and damp the velocities.
+
+        Parameters
+        ----------
+        v : ndarray
+            velocity array of the new state
+        dt : float
+            timestep
+        """
+        self.zeta = self.zeta + dt * (self.temperature(v) / self.T - 1) / self.tau**2
+        v *= self.perReplica(np.exp(-self.zeta * dt))
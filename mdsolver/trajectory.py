@@ -0,0 +1,376 @@
+import os
+import zlib
+import lzma
+import numpy as np
+
+MAGIC = b"MDTRAJ01"
+HEADERSIZE = 32
+COMPRESSEDMAGIC = b"MDTRAJZ1"
+COMPRESSEDHEADERSIZE = 40
+CHUNKHEADER = np.dtype([("frames", "<u4"), ("itemsize", "<u4"), ("length", "<u8")])
+COMPRESSORS = {"zlib" : (zlib.compress, zlib.decompress),
+               "lzma" : (lambda data, level: lzma.compress(data, preset=level), 
+                         lzma.decompress)}
+
+def frameType(numparticles, numdimensions, dtype):
+    """ Data type of a single frame: the step followed by the positions
+    of all the particles.
+
+    Parameters
+    ----------
+    numparticles : int
+        number of particles
+    numdimensions : int
+        number of dimensions
+    dtype : data-type
+        floating point type of the positions
+
+    Returns
+    -------
+    numpy.dtype
+        structured frame type
+    """
+    return np.dtype([("step", "<i8"),
+                     ("r", np.dtype(dtype).newbyteorder("<"),
+                      (numparticles, numdimensions))])
+
+def readHeader(f):
+    """ Read the header of a binary trajectory file.
+
+    Parameters
+    ----------
+    f : file
+        binary file object positioned at the start of the file
+
+    Returns
+    -------
+    numparticles : int
+        number of particles
+    numdimensions : int
+        number of dimensions
+    dtype : numpy.dtype
+        floating point type of the positions
+    """
+    header = f.read(HEADERSIZE)
+    if len(header) != HEADERSIZE or header[:8] != MAGIC:
+        raise ValueError("'{}' is not a binary trajectory file".format(f.name))
+    dtype = np.dtype(header[8:16].rstrip(b"\0").decode())
+    numparticles, numdimensions = np.frombuffer(header[16:32], dtype="<u8")
+    return int(numparticles), int(numdimensions), dtype
+
+class TrajectoryWriter:
+    """ Write positions to a binary trajectory file. The file consists
+    of a small header followed by fixed-size frames, such that frames
+    can be appended one by one and read back in O(1) by frame number.
+
+    Parameters
+    ----------
+    filename : str
+        name and address of the trajectory file
+    numparticles : int
+        number of particles
+    numdimensions : int
+        number of dimensions
+    dtype : data-type
+        floating point type of the stored positions. float32 by default.
+    append : bool
+        whether or not to append to an existing file. The header of the
+        existing file has to match.
+    """
+    def __init__(self, filename, numparticles, numdimensions,
+                 dtype=np.float32, append=False):
+        self.filename = filename
+        self.frame = np.zeros(1, frameType(numparticles, numdimensions, dtype))
+        if append and os.path.exists(filename):
+            with open(filename, 'rb') as f:
+                header = readHeader(f)
+            if header != (numparticles, numdimensions, np.dtype(dtype)):
+                raise ValueError("Trajectory '{}' does not match, it has "
+                                 "(particles, dimensions, type) = {}"
+                                 .format(filename, header))
+            self.f = open(filename, 'ab')
+        else:
+            self.f = open(filename, 'wb')
+            self.f.write(MAGIC)
+            self.f.write(np.dtype(dtype).str.encode().ljust(8, b"\0"))
+            self.f.write(np.array([numparticles, numdimensions], dtype="<u8")
+                         .tobytes())
+
+    def __repr__(self):
+        return "Binary trajectory writer '{}'".format(self.filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, r, step=0):
+        """ Append a frame to the trajectory.
+
+        Parameters
+        ----------
+        r : ndarray
+            position array
+        step : int
+            step of the frame
+        """
+        self.frame["step"] = step
+        self.frame["r"] = r
+        self.f.write(self.frame.tobytes())
+
+    def flush(self):
+        """ Flush written frames to disk.
+        """
+        self.f.flush()
+
+    def close(self):
+        """ Close the trajectory file.
+        """
+        self.f.close()
+
+class Trajectory:
+    """ Read a binary trajectory file written by TrajectoryWriter. The
+    file is memory-mapped, such that frame k is accessed in O(1) without
+    reading the rest of the file.
+
+    Parameters
+    ----------
+    filename : str
+        name and address of the trajectory file
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            par, dim, dtype = readHeader(f)
+        self.numparticles, self.numdimensions = par, dim
+        frame = frameType(par, dim, dtype)
+        numframes = (os.path.getsize(filename) - HEADERSIZE) // frame.itemsize
+        if numframes > 0:
+            self.frames = np.memmap(filename, dtype=frame, mode='r',
+                                    offset=HEADERSIZE, shape=(numframes,))
+        else:
+            self.frames = np.zeros(0, dtype=frame)
+
+    def __repr__(self):
+        return "Binary trajectory '{}' with {} frames".format(self.filename, len(self))
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, k):
+        """ Get the positions of frame k.
+
+        Parameters
+        ----------
+        k : int or slice
+            frame number
+
+        Returns
+        -------
+        ndarray
+            position array of frame k
+        """
+        return self.frames["r"][k]
+
+    @property
+    def steps(self):
+        """ Step of every frame.
+        """
+        return np.asarray(self.frames["step"])
+
+    def toXYZ(self, dumpfile, stride=1):
+        """ Export the trajectory to a xyz-file, which can easily be
+        visualized using Ovito.
+
+        Parameters
+        ----------
+        dumpfile : str
+            name and address of the xyz-file
+        stride : int
+            number of frames between every exported frame
+        """
+        from mdsolver import MDSolver
+        with open(dumpfile, 'w') as f:
+            for k in range(0, len(self), stride):
+                MDSolver.dumpPositions(self[k], f)
+
+class CompressedTrajectoryWriter:
+    """ Write positions to a compressed trajectory file. The coordinates 
+    are quantized to a given precision and stored as integers. Frames 
+    are collected in chunks, where the first frame is stored as it is 
+    and the remaining frames as the difference from the previous frame. 
+    Every chunk is compressed using zlib or lzma. 
+    
+    Parameters
+    ----------
+    filename : str
+        name and address of the trajectory file
+    numparticles : int
+        number of particles
+    numdimensions : int
+        number of dimensions
+    precision : float
+        precision of the stored coordinates. 1e-3 by default.
+    chunksize : int
+        number of frames in every chunk. 100 by default.
+    method : str
+        compression method, 'zlib' (default) or 'lzma'
+    level : int
+        compression level. 6 by default.
+    """
+    def __init__(self, filename, numparticles, numdimensions, precision=1e-3,
+                 chunksize=100, method="zlib", level=6):
+        if method not in COMPRESSORS:
+            raise ValueError("Compression method needs to be in {}"
+                             .format(list(COMPRESSORS)))
+        self.filename = filename
+        self.precision = precision
+        self.chunksize = chunksize
+        self.compress = COMPRESSORS[method][0]
+        self.level = level
+        self.steps, self.frames = [], []
+        self.f = open(filename, 'wb')
+        self.f.write(COMPRESSEDMAGIC)
+        self.f.write(method.encode().ljust(8, b"\0"))
+        self.f.write(np.array([precision], dtype="<f8").tobytes())
+        self.f.write(np.array([numparticles, numdimensions], dtype="<u8")
+                     .tobytes())
+        
+    def __repr__(self):
+        return "Compressed trajectory writer '{}'".format(self.filename)
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, *args):
+        self.close()
+        
+    def write(self, r, step=0):
+        """ Append a frame to the trajectory. The frame is written when
+        the chunk is full.
+        
+        Parameters
+        ----------
+        r : ndarray
+            position array
+        step : int
+            step of the frame
+        """
+        self.steps.append(step)
+        self.frames.append(np.rint(np.asarray(r) / self.precision).astype(np.int64))
+        if len(self.frames) >= self.chunksize:
+            self.writeChunk()
+            
+    def writeChunk(self):
+        """ Compress and write the collected frames as one chunk. The 
+        differences are stored using the smallest integer type that fits.
+        """
+        if not self.frames:
+            return
+        q = np.array(self.frames)
+        q[1:] = np.diff(q, axis=0)
+        largest = np.abs(q).max()
+        for dtype in (np.int8, np.int16, np.int32, np.int64):
+            if largest <= np.iinfo(dtype).max:
+                break
+        payload = np.array(self.steps, dtype="<i8").tobytes() \
+                + q.astype(np.dtype(dtype).newbyteorder("<")).tobytes()
+        data = self.compress(payload, self.level)
+        header = np.array([(len(self.frames), np.dtype(dtype).itemsize, len(data))], 
+                          dtype=CHUNKHEADER)
+        self.f.write(header.tobytes())
+        self.f.write(data)
+        self.steps, self.frames = [], []
+        
+    def flush(self):
+        """ Flush written chunks to disk. Frames in an unfinished chunk
+        are not written.
+        """
+        self.f.flush()
+        
+    def close(self):
+        """ Write the unfinished chunk and close the trajectory file.
+        """
+        self.writeChunk()
+        self.f.close()
+        
+class CompressedTrajectory:
+    """ Read a compressed trajectory file written by 
+    CompressedTrajectoryWriter. The file is read one chunk at a time,
+    such that the full trajectory is never held in memory.
+    
+    Parameters
+    ----------
+    filename : str
+        name and address of the trajectory file
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            header = f.read(COMPRESSEDHEADERSIZE)
+        if len(header) != COMPRESSEDHEADERSIZE or header[:8] != COMPRESSEDMAGIC:
+            raise ValueError("'{}' is not a compressed trajectory file".format(filename))
+        self.method = header[8:16].rstrip(b"\0").decode()
+        self.decompress = COMPRESSORS[self.method][1]
+        self.precision = float(np.frombuffer(header[16:24], dtype="<f8")[0])
+        par, dim = np.frombuffer(header[24:40], dtype="<u8")
+        self.numparticles, self.numdimensions = int(par), int(dim)
+        
+    def __repr__(self):
+        return "Compressed trajectory '{}'".format(self.filename)
+        
+    def chunks(self):
+        """ Read the trajectory chunk by chunk.
+        
+        Yields
+        ------
+        steps : ndarray
+            step of every frame in the chunk
+        r : ndarray
+            position array of every frame in the chunk
+        """
+        shape = (self.numparticles, self.numdimensions)
+        with open(self.filename, 'rb') as f:
+            f.seek(COMPRESSEDHEADERSIZE)
+            while True:
+                header = f.read(CHUNKHEADER.itemsize)
+                if len(header) < CHUNKHEADER.itemsize:
+                    break
+                frames, itemsize, length = np.frombuffer(header, dtype=CHUNKHEADER)[0]
+                payload = self.decompress(f.read(int(length)))
+                steps = np.frombuffer(payload, dtype="<i8", count=frames)
+                q = np.frombuffer(payload, dtype="<i{}".format(itemsize), 
+                                  offset=8*int(frames)).reshape((frames,) + shape)
+                yield steps, np.cumsum(q, axis=0, dtype=np.int64) * self.precision
+                
+    def __iter__(self):
+        """ Read the trajectory frame by frame.
+        
+        Yields
+        ------
+        step : int
+            step of the frame
+        r : ndarray
+            position array of the frame
+        """
+        for steps, r in self.chunks():
+            for k in range(len(steps)):
+                yield int(steps[k]), r[k]
+                
+    def toXYZ(self, dumpfile, stride=1):
+        """ Export the trajectory to a xyz-file, which can easily be
+        visualized using Ovito.
+
+        Parameters
+        ----------
+        dumpfile : str
+            name and address of the xyz-file
+        stride : int
+            number of frames between every exported frame
+        """
+        from mdsolver import MDSolver
+        with open(dumpfile, 'w') as f:
+            for k, (step, r) in enumerate(self):
+                if k % stride == 0:
+                    MDSolver.dumpPositions(r, f)
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from mdsolver import MDSolver
+from mdsolver.potential import LennardJones
+from mdsolver.initpositions import SetPositions
+from mdsolver.boundaryconditions import Periodic
+from mdsolver.analysis import RDF, MSD, VACF
+
+LENBOX = 10.0
+
+def makeSolver(r):
+    solver = MDSolver(positions=SetPositions(r), boundaries=Periodic(LENBOX),
+                      T=1, dt=0.01, initialdump=None)
+    solver.potential = LennardJones(solver, cutoff=3, backend="numpy")
+    return solver
+
+def test_rdf_matches_direct_histogram():
+    rng = np.random.default_rng(19)
+    frames = [rng.uniform(0, LENBOX, size=(500, 3)) for _ in range(3)]
+    solver = makeSolver(frames[0])
+    rdf = RDF(bins=30)
+    rdf.open(solver)
+    histogram = np.zeros(30)
+    for t, r in enumerate(frames):
+        solver.potential(r)
+        rdf(t, r, None, None)
+        i, j = np.triu_indices(len(r), 1)
+        distance = np.linalg.norm(solver.boundaries.checkDistance(r[i] - r[j]), axis=1)
+        histogram += np.histogram(distance, np.linspace(0, 3, 31))[0]
+    rdf.close()
+
+    shells = 4 / 3 * np.pi * np.diff(np.linspace(0, 3, 31)**3)
+    ideal = 500 * 499 / 2 * shells / LENBOX**3
+    np.testing.assert_allclose(rdf.r, np.linspace(0.05, 2.95, 30))
+    np.testing.assert_allclose(rdf.g, histogram / (3 * ideal))
+
+    # An ideal gas has g = 1
+    assert rdf.g[10:].mean() == pytest.approx(1, rel=0.05)
+
+def test_msd_unwraps_periodic_boundaries():
+    rng = np.random.default_rng(23)
+    r0 = rng.uniform(0, LENBOX, size=(50, 3))
+    v = rng.normal(scale=2, size=r0.shape)
+    solver = makeSolver(r0)
+    msd = MSD(stride=1)
+    msd.open(solver)
+    for t in range(40):
+        r = solver.boundaries.checkPosition(r0 + v * t * solver.dt)
+        msd(t, r, v, None)
+    msd.close()
+
+    # Particles moving in straight lines cross the box, which the
+    # unwrapped displacement has to follow
+    t = np.arange(40) * solver.dt
+    rEnd = r0 + v * t[-1]
+    assert np.any((rEnd < 0) | (rEnd > LENBOX))
+    np.testing.assert_allclose(msd.t, t)
+    np.testing.assert_allclose(msd.msd, np.mean(np.sum(v**2, axis=1)) * t**2, rtol=1e-10)
+
+def test_vacf_matches_direct_correlation():
+    rng = np.random.default_rng(29)
+    numframes, points = 64, 8
+    velocities = rng.normal(size=(numframes, 20, 3))
+    solver = makeSolver(rng.uniform(0, LENBOX, size=(20, 3)))
+    vacf = VACF(stride=1, points=points, average=2, levels=3)
+    vacf.open(solver)
+    for t, v in enumerate(velocities):
+        vacf(t, None, v, None)
+    vacf.close()
+
+    # Level 0 correlates the raw velocities over all time origins
+    direct = [np.mean(np.sum(velocities[lag:] * velocities[:numframes-lag], axis=2))
+              for lag in range(points)]
+    np.testing.assert_allclose(vacf.t[:points], np.arange(points) * solver.dt)
+    np.testing.assert_allclose(vacf.vacf[:points], direct, rtol=1e-10)
+
+    # The lags of the levels above grow geometrically
+    lags = np.round(vacf.t / solver.dt).astype(int)
+    np.testing.assert_array_equal(lags[points:], [8, 10, 12, 14, 16, 20, 24, 28])
+
+def test_vacf_of_constant_velocities():
+    v = np.random.default_rng(31).normal(size=(20, 3))
+    solver = makeSolver(np.zeros((20, 3)))
+    vacf = VACF(points=4, levels=4)
+    vacf.open(solver)
+    for t in range(100):
+        vacf(t, None, v, None)
+    vacf.close()
+    np.testing.assert_allclose(vacf.vacf, np.sum(v**2) / 20, rtol=1e-12)
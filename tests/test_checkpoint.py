@@ -0,0 +1,47 @@
+import os
+import numpy as np
+import pytest
+
+from mdsolver import MDSolver
+from mdsolver.potential import LennardJones
+from mdsolver.integrator import VelocityVerlet
+from mdsolver.initpositions import FCC
+from mdsolver.initvelocities import Temperature
+from mdsolver.boundaryconditions import Periodic
+from mdsolver.neighborlists import VerletList
+from mdsolver.sinks import CheckpointSink, MemorySink
+
+def makeSolver(**kwargs):
+    np.random.seed(9)
+    return MDSolver(positions=FCC(cells=2, lenbulk=6.8), velocities=Temperature(300),
+                    boundaries=Periodic(6.8), T=0.5, dt=0.01, initialdump=None,
+                    **kwargs)
+
+def run(solver, sinks=(), neighbors=None):
+    solver(LennardJones(solver, neighbors=neighbors), VelocityVerlet(solver),
+           sinks=list(sinks), progress=False)
+    return solver
+
+NEIGHBORS = {"dense" : lambda: None, "verlet" : VerletList}
+
+@pytest.mark.parametrize("buffersize", [None, 3])
+@pytest.mark.parametrize("neighbors", NEIGHBORS)
+def test_resumed_run_matches_uninterrupted_run(tmp_path, buffersize, neighbors):
+    filename = str(tmp_path / "run.chk")
+    full = run(makeSolver(), neighbors=NEIGHBORS[neighbors]())
+
+    # A run killed at step 30, with the last checkpoint at step 20
+    killed = makeSolver(buffersize=buffersize)
+    killed.register(lambda state: state.t == 30)
+    run(killed, [CheckpointSink(filename, stride=20)], NEIGHBORS[neighbors]())
+    assert not os.path.exists(filename + ".tmp")
+
+    resumed = MDSolver.fromCheckpoint(filename)
+    memory = MemorySink()
+    run(resumed, [memory], NEIGHBORS[neighbors]())
+    assert memory.steps[0] == 21 and memory.steps[-1] == full.N
+    np.testing.assert_array_equal(memory.r, full.r[21:])
+    np.testing.assert_array_equal(memory.v, full.v[21:])
+    np.testing.assert_allclose(memory.t, np.arange(21, full.N + 1) * full.dt)
+    if buffersize is None:
+        np.testing.assert_array_equal(resumed.u, full.u)
@@ -0,0 +1,152 @@
+import numpy as np
+import pytest
+
+from mdsolver import MDSolver
+from mdsolver.potential import LennardJones, SwitchedPotential
+from mdsolver.integrator import ForwardEuler, EulerChromer, VelocityVerlet, MultipleTimestep
+from mdsolver.initpositions import FCC, SetPositions
+from mdsolver.initvelocities import Temperature
+from mdsolver.boundaryconditions import Open, Reflective, Periodic
+from mdsolver.sinks import MemorySink
+
+LENBULK = 6.8
+
+def makeState(boundaries):
+    """ Solver with a connected potential, and a state of 108 particles
+    moving fast enough to cross the boundaries in one step.
+    """
+    rng = np.random.default_rng(13)
+    r = FCC(cells=3, lenbulk=LENBULK)()
+    r += rng.normal(scale=0.05, size=r.shape)
+    solver = MDSolver(positions=SetPositions(r), boundaries=boundaries, T=0.1,
+                      dt=0.02, initialdump=None)
+    solver.potential = LennardJones(solver)
+    v = rng.normal(scale=10, size=r.shape)
+    a = solver.potential(r)[0]
+    return solver, r, v, a
+
+def referenceStep(name, solver, r, v, a):
+    """ Integration step of the original integrators, which copied the
+    state and allocated new arrays.
+    """
+    dt, boundaries = solver.dt, solver.boundaries
+    if name == "ForwardEuler":
+        rNew, vNew = r + v * dt, v + a * dt
+    elif name == "EulerChromer":
+        vNew = v + a * dt
+        rNew = r + vNew * dt
+    else:
+        rNew = r + v * dt + 0.5 * a * dt**2
+    rNew = boundaries.checkPosition(rNew)
+    aNew, u, _ = solver.potential(rNew)
+    if name == "VelocityVerlet":
+        vNew = v + 0.5 * (a + aNew) * dt
+    vNew = boundaries.checkVelocity(vNew)
+    return rNew, vNew, aNew, u
+
+INTEGRATORS = {"ForwardEuler" : ForwardEuler, "EulerChromer" : EulerChromer,
+               "VelocityVerlet" : VelocityVerlet}
+BOUNDARIES = {"open" : Open, "reflective" : lambda: Reflective(LENBULK),
+              "periodic" : lambda: Periodic(LENBULK)}
+
+@pytest.mark.parametrize("integrator", INTEGRATORS)
+@pytest.mark.parametrize("boundaries", BOUNDARIES)
+def test_in_place_step_matches_reference(integrator, boundaries):
+    solver, r, v, a = makeState(BOUNDARIES[boundaries]())
+    rRef, vRef, aRef, uRef = referenceStep(integrator, solver, r, v, a)
+
+    step = INTEGRATORS[integrator](solver)
+    rOld, vOld, aOld = r.copy(), v.copy(), a.copy()
+    rNew, vNew = np.empty_like(r), np.empty_like(v)
+    rOut, vOut, aOut, u, _ = step(r, v, a, rNew, vNew)
+    assert rOut is rNew and vOut is vNew
+    np.testing.assert_array_equal(r, rOld)
+    np.testing.assert_array_equal(v, vOld)
+    np.testing.assert_array_equal(a, aOld)
+    np.testing.assert_allclose(rOut, rRef, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(vOut, vRef, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(aOut, aRef, rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(u, uRef, rtol=1e-12)
+
+@pytest.mark.parametrize("integrator", INTEGRATORS)
+def test_step_may_overwrite_the_old_state(integrator):
+    solver, r, v, a = makeState(Reflective(LENBULK))
+    step = INTEGRATORS[integrator](solver)
+    rExpected, vExpected = [x.copy() for x in step(r, v, a)[:2]]
+    rOut, vOut = step(r, v, a, r, v)[:2]
+    assert rOut is r and vOut is v
+    np.testing.assert_array_equal(rOut, rExpected)
+    np.testing.assert_array_equal(vOut, vExpected)
+
+def runLiquid(integrator, dt, T=1.0):
+    """ Run 108 particles of a dense liquid, and return the solver and
+    the largest relative change of the total energy.
+    """
+    np.random.seed(4)
+    solver = MDSolver(positions=FCC(cells=3, lenbulk=5.1), velocities=Temperature(100),
+                      boundaries=Periodic(5.1), T=T, dt=dt, initialdump=None)
+    solver(LennardJones(solver, 2.5), integrator(solver), progress=False)
+    e = solver.u + solver.kineticEnergy(solver.v[1:])
+    return solver, np.abs(e - e[0]).max() / abs(e[0])
+
+def respa(steps):
+    """ Multiple-timestep integrator with a short-range cutoff of 1.6.
+    """
+    return lambda solver: MultipleTimestep(solver, LennardJones(solver, 1.6), steps=steps)
+
+def test_multiple_timestep_with_one_inner_step_is_velocity_verlet():
+    verlet, _ = runLiquid(VelocityVerlet, 0.01, T=0.2)
+    multiple, _ = runLiquid(respa(1), 0.01, T=0.2)
+    np.testing.assert_allclose(multiple.r, verlet.r, rtol=1e-10, atol=1e-10)
+    np.testing.assert_allclose(multiple.v, verlet.v, rtol=1e-10, atol=1e-10)
+
+def test_multiple_timestep_conserves_energy_at_large_timestep():
+    _, driftVerlet = runLiquid(VelocityVerlet, 0.04)
+    _, driftRespa = runLiquid(respa(4), 0.04)
+    assert driftRespa < 0.25 * driftVerlet
+
+def test_switched_force_is_derivative_of_energy():
+    solver, _, _, _ = makeState(Open())
+    switched = SwitchedPotential(solver, LennardJones(solver, cutoff=2), width=0.5)
+    distance = np.linspace(0.9, 2.0, 221)
+    h = 1e-6
+
+    def pairValues(distance):
+        dr = np.zeros((len(distance), 3))
+        dr[:,0] = distance
+        force, u = switched.pairForces(distance**2, dr)
+        return force[:,0], u
+
+    force, u = pairValues(distance)
+    derivative = (pairValues(distance + h)[1] - pairValues(distance - h)[1]) / (2 * h)
+    np.testing.assert_allclose(force, -derivative, rtol=1e-6, atol=1e-6)
+
+    # Unchanged below the switching region, and zero at the cutoff
+    inner = distance <= 1.5
+    np.testing.assert_allclose(u[inner], 4 * (distance[inner]**-12 - distance[inner]**-6))
+    assert abs(u[-1]) < 1e-12 and abs(force[-1]) < 1e-12
+
+@pytest.mark.parametrize("integrator", [EulerChromer, VelocityVerlet])
+def test_adaptive_timestep_ends_at_total_time(integrator):
+    np.random.seed(6)
+    solver = MDSolver(positions=FCC(cells=2, lenbulk=6.8), velocities=Temperature(300),
+                      boundaries=Periodic(6.8), T=1, dt=0.01, initialdump=None)
+    memory = MemorySink(stride=1)
+    step = integrator(solver, adaptive=True, maxdisplacement=0.02)
+    solver(LennardJones(solver), step, sinks=[memory], progress=False)
+
+    assert memory.steps[-1] == len(memory.steps) - 1
+    assert memory.t[0] == 0 and memory.t[-1] == 1.0
+    dt = np.diff(memory.t)
+    assert np.all(dt[:-1] >= step.dtmin) and np.all(dt <= step.dtmax)
+    assert 0 < dt[-1] <= step.dtmax
+    np.testing.assert_array_equal(memory.r[-1], solver.r[-1])
+
+def test_adaptive_timestep_limits_the_displacement():
+    np.random.seed(6)
+    solver = MDSolver(positions=FCC(cells=2, lenbulk=6.8), velocities=Temperature(1000),
+                      boundaries=Periodic(6.8), T=0.5, dt=0.01, initialdump=None)
+    solver(LennardJones(solver), VelocityVerlet(solver, adaptive=True, maxdisplacement=0.01),
+           progress=False)
+    dr = solver.boundaries.checkDistance(np.diff(solver.r, axis=0))
+    assert np.sqrt(np.einsum('...i,...i->...', dr, dr)).max() <= 0.01 * (1 + 1e-9)
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from mdsolver import MDSolver
+from mdsolver.potential import LennardJones
+from mdsolver.minimize import FIRE
+from mdsolver.initpositions import SetPositions, Replicas
+from mdsolver.boundaryconditions import Open, Periodic
+
+def randomGas(seed, numparticles=64, lenbox=4.5):
+    """ Random positions in a box, with overlapping particles.
+    """
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0, lenbox, size=(numparticles, 3))
+
+class RecordedPotential:
+    """ Potential wrapper storing every evaluated position array.
+    """
+    def __init__(self, potential):
+        self.potential = potential
+        self.positions = []
+
+    def __call__(self, r):
+        self.positions.append(r.copy())
+        return self.potential(r)
+
+def test_fire_relaxes_cluster_below_tolerance():
+    rng = np.random.default_rng(1)
+    solver = MDSolver(positions=SetPositions(rng.uniform(0, 2.2, size=(13, 3))),
+                      T=0.1, dt=0.005, initialdump=None)
+    potential = LennardJones(solver, cutoff=10)
+    minimizer = FIRE(solver, potential, ftol=1e-4)
+    assert minimizer()
+    force, u, _ = potential(solver.r[0])
+    assert np.sqrt(np.einsum('...i,...i->...', force, force)).max() < 1e-4
+    assert minimizer.fmax < 1e-4 and minimizer.energy == pytest.approx(np.sum(u))
+    assert minimizer.energy < -30
+
+def test_fire_limits_the_step_of_every_particle():
+    solver = MDSolver(positions=SetPositions(randomGas(2)), boundaries=Periodic(4.5),
+                      T=0.1, dt=0.005, initialdump=None)
+    potential = RecordedPotential(LennardJones(solver, cutoff=2.2))
+    assert FIRE(solver, potential, maxmove=0.05)()
+    dr = solver.boundaries.checkDistance(np.diff(potential.positions, axis=0))
+    assert np.sqrt(np.einsum('...i,...i->...', dr, dr)).max() <= 0.05 * (1 + 1e-9)
+
+def test_fire_relaxes_replicas_independently():
+    positions = [randomGas(3), randomGas(4)]
+    relaxed, steps = [], []
+    for r in positions:
+        solver = MDSolver(positions=SetPositions(r), boundaries=Periodic(4.5),
+                          T=0.1, dt=0.005, initialdump=None)
+        minimizer = FIRE(solver, LennardJones(solver, cutoff=2.2))
+        assert minimizer()
+        relaxed.append(solver.r[0].copy())
+        steps.append(minimizer.steps)
+
+    solver = MDSolver(positions=Replicas(*[SetPositions(r) for r in positions]),
+                      boundaries=Periodic(4.5), T=0.1, dt=0.005, initialdump=None)
+    minimizer = FIRE(solver, LennardJones(solver, cutoff=2.2))
+    assert minimizer()
+    assert minimizer.steps == max(steps)
+
+    # The replica finishing last follows the same path as on its own
+    last = int(np.argmax(steps))
+    np.testing.assert_allclose(solver.r[0][last], relaxed[last], rtol=1e-10, atol=1e-10)
@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from mdsolver import MDSolver
+from mdsolver.potential import LennardJones
+from mdsolver.initpositions import FCC, SetPositions
+from mdsolver.neighborlists import CellList, VerletList
+from mdsolver.boundaryconditions import Open, Periodic
+
+LENBULK = 8.5
+CUTOFF = 3.0
+
+def makePositions():
+    """ FCC lattice of 256 particles with randomly displaced positions.
+    """
+    rng = np.random.default_rng(7)
+    r = FCC(cells=4, lenbulk=LENBULK)()
+    return r + rng.normal(scale=0.1, size=r.shape)
+
+def bruteForcePairs(r, boundaries):
+    """ All pairs closer than the cutoff, found from the full distance
+    matrix.
+    """
+    i, j = np.triu_indices(len(r), 1)
+    dr = boundaries.checkDistance(r[i] - r[j])
+    inside = np.einsum('ij,ij->i', dr, dr) < CUTOFF * CUTOFF
+    return set(zip(i[inside].tolist(), j[inside].tolist()))
+
+def foundPairs(neighbors, r):
+    i, j, _, _ = neighbors(r)
+    return set((min(a, b), max(a, b)) for a, b in zip(i.tolist(), j.tolist()))
+
+BOUNDARIES = {"open" : Open, "periodic" : lambda: Periodic(LENBULK)}
+NEIGHBORS = {"cells" : CellList, "verlet" : VerletList}
+
+@pytest.mark.parametrize("boundaries", BOUNDARIES)
+@pytest.mark.parametrize("neighbors", NEIGHBORS)
+def test_pairs_match_brute_force(boundaries, neighbors):
+    boundaries = BOUNDARIES[boundaries]()
+    neighbors = NEIGHBORS[neighbors]()
+    neighbors.setup(boundaries, CUTOFF)
+    r = makePositions()
+    assert foundPairs(neighbors, r) == bruteForcePairs(r, boundaries)
+
+@pytest.mark.parametrize("boundaries", BOUNDARIES)
+@pytest.mark.parametrize("neighbors", NEIGHBORS)
+def test_forces_match_dense(boundaries, neighbors):
+    solver = MDSolver(positions=SetPositions(makePositions()),
+                      boundaries=BOUNDARIES[boundaries](), T=0.1, initialdump=None)
+    r = solver.r[0]
+    forceDense, uDense, _ = LennardJones(solver, CUTOFF, backend="numpy")(r)
+    forceList, uList, _ = LennardJones(solver, CUTOFF, NEIGHBORS[neighbors](),
+                                       backend="numpy")(r)
+    np.testing.assert_allclose(forceList, forceDense, rtol=1e-10, atol=1e-10)
+    np.testing.assert_allclose(uList, uDense, rtol=1e-12)
+
+def test_verlet_list_rebuilds_after_half_skin():
+    boundaries = Periodic(LENBULK)
+    neighbors = VerletList(skin=0.4)
+    neighbors.setup(boundaries, CUTOFF)
+    r = makePositions()
+    neighbors(r)
+    assert neighbors.rebuilds == 1
+
+    # Moving less than half the skin reuses the list, and still finds
+    # all the pairs within the cutoff
+    r[0] += [0.15, 0, 0]
+    assert foundPairs(neighbors, r) == bruteForcePairs(r, boundaries)
+    assert neighbors.rebuilds == 1
+
+    r[0] += [0.1, 0, 0]
+    assert foundPairs(neighbors, r) == bruteForcePairs(r, boundaries)
+    assert neighbors.rebuilds == 2
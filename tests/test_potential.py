@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from mdsolver import MDSolver
+from mdsolver.potential import PairPotential, LennardJones, TabulatedPotential
+from mdsolver.kernels import HAVE_NUMBA
+from mdsolver.initpositions import FCC, SetPositions
+from mdsolver.neighborlists import CellList
+from mdsolver.boundaryconditions import Open, Periodic
+
+LENBULK = 6.8
+
+def makeSolver(boundaries):
+    """ FCC lattice of 108 particles with randomly displaced positions,
+    such that the forces do not cancel.
+    """
+    rng = np.random.default_rng(42)
+    r = FCC(cells=3, lenbulk=LENBULK)()
+    r += rng.normal(scale=0.05, size=r.shape)
+    return MDSolver(positions=SetPositions(r), boundaries=boundaries,
+                    T=0.1, initialdump=None)
+
+BOUNDARIES = {"open" : Open, "periodic" : lambda: Periodic(LENBULK)}
+NEIGHBORS = {"dense" : lambda: None, "cells" : CellList}
+
+@pytest.mark.skipif(not HAVE_NUMBA, reason="Numba is not installed")
+@pytest.mark.parametrize("boundaries", BOUNDARIES)
+@pytest.mark.parametrize("neighbors", NEIGHBORS)
+def test_numba_backend_matches_numpy(boundaries, neighbors):
+    solver = makeSolver(BOUNDARIES[boundaries]())
+    r = solver.r[0]
+    forceNumpy, uNumpy, _ = LennardJones(solver, neighbors=NEIGHBORS[neighbors](),
+                                         backend="numpy")(r)
+    forceNumba, uNumba, _ = LennardJones(solver, neighbors=NEIGHBORS[neighbors](),
+                                         backend="numba")(r)
+    np.testing.assert_allclose(forceNumba, forceNumpy, rtol=1e-10, atol=1e-10)
+    np.testing.assert_allclose(uNumba, uNumpy, rtol=1e-12)
+
+@pytest.mark.parametrize("boundaries", BOUNDARIES)
+@pytest.mark.parametrize("neighbors", NEIGHBORS)
+def test_workers_match_serial(boundaries, neighbors):
+    solver = makeSolver(BOUNDARIES[boundaries]())
+    r = solver.r[0]
+    forceSerial, uSerial, _ = LennardJones(solver, neighbors=NEIGHBORS[neighbors](),
+                                           workers=1, backend="numpy")(r)
+    forceThreads, uThreads, _ = LennardJones(solver, neighbors=NEIGHBORS[neighbors](),
+                                             workers=3, backend="numpy")(r)
+    np.testing.assert_allclose(forceThreads, forceSerial, rtol=1e-10, atol=1e-10)
+    np.testing.assert_allclose(uThreads, uSerial, rtol=1e-12)
+
+def test_accumulated_forces_match_dense_sum():
+    rng = np.random.default_rng(3)
+    numparticles, numpairs = 20, 60
+    i = rng.integers(0, numparticles, numpairs)
+    j = rng.integers(0, numparticles, numpairs)
+    force = rng.normal(size=(numpairs, 3))
+
+    # Force on every particle summed from a P x P x D matrix, where
+    # repeated pairs add up
+    forceShell = np.zeros((numparticles, numparticles, 3))
+    np.add.at(forceShell, (i, j), force)
+    np.add.at(forceShell, (j, i), -force)
+    expected = forceShell.sum(axis=1)
+
+    forces = PairPotential.accumulateForces(force, (i, j), numparticles)
+    np.testing.assert_allclose(forces, expected, rtol=1e-12, atol=1e-12)
+
+@pytest.mark.parametrize("boundaries", BOUNDARIES)
+def test_forces_match_pair_loop(boundaries):
+    solver = makeSolver(BOUNDARIES[boundaries]())
+    r = solver.r[0]
+    force, _, _ = LennardJones(solver, cutoff=3, backend="numpy")(r)
+
+    expected = np.zeros_like(r)
+    for a in range(len(r)):
+        for b in range(a + 1, len(r)):
+            dr = solver.boundaries.checkDistance(r[a] - r[b])
+            rSqrd = dr @ dr
+            if rSqrd < 9:
+                expected[a] += 24 * (2 * rSqrd**-7 - rSqrd**-4) * dr
+                expected[b] -= 24 * (2 * rSqrd**-7 - rSqrd**-4) * dr
+    np.testing.assert_allclose(force, expected, rtol=1e-10, atol=1e-10)
+    np.testing.assert_allclose(np.sum(force, axis=0), 0, atol=1e-10)
+
+@pytest.mark.parametrize("interpolation, points, tolerance",
+                         [("linear", 10000, 1e-6), ("spline", 1000, 1e-6),
+                          ("spline", 10000, 1e-9)])
+def test_tabulated_potential_matches_lennard_jones(interpolation, points, tolerance):
+    solver = makeSolver(Periodic(LENBULK))
+    r = solver.r[0]
+    force, u, _ = LennardJones(solver, backend="numpy")(r)
+    tabulated = TabulatedPotential.fromPotential(solver, LennardJones(solver),
+                                                 interpolation=interpolation, points=points)
+    forceTable, uTable, _ = tabulated(r)
+    assert np.abs(forceTable - force).max() < tolerance * np.abs(force).max()
+    assert abs(uTable - u) < tolerance * abs(u)
+
+@pytest.mark.parametrize("analytic", [True, False])
+def test_tabulated_potential_from_functions(analytic):
+    solver = makeSolver(Open())
+    r = solver.r[0]
+    energy = lambda distance: 4 * (distance**-12 - distance**-6)
+    force = lambda distance: 24 * (2 * distance**-13 - distance**-7)
+    tabulated = TabulatedPotential(solver, energy, force if analytic else None,
+                                   interpolation="spline")
+    forceTable, uTable, _ = tabulated(r)
+
+    forceExpected, _, _ = LennardJones(solver, backend="numpy")(r)
+    i, j = np.triu_indices(len(r), 1)
+    distance = np.linalg.norm(r[i] - r[j], axis=1)
+    uExpected = np.sum(energy(distance[distance < 3]))
+    np.testing.assert_allclose(forceTable, forceExpected, rtol=1e-5,
+                               atol=1e-5 * np.abs(forceExpected).max())
+    np.testing.assert_allclose(uTable, uExpected, rtol=1e-9)
+
+def test_tabulated_potential_rejects_unknown_interpolation():
+    solver = makeSolver(Open())
+    with pytest.raises(ValueError):
+        TabulatedPotential(solver, lambda distance: distance, interpolation="cubic")
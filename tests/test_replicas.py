@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from mdsolver import MDSolver
+from mdsolver.potential import LennardJones
+from mdsolver.integrator import VelocityVerlet
+from mdsolver.initpositions import FCC, SetPositions, Replicas
+from mdsolver.initvelocities import SetVelocities
+from mdsolver.initvelocities import Replicas as VelocityReplicas
+from mdsolver.neighborlists import CellList
+from mdsolver.boundaryconditions import Periodic, Reflective
+from mdsolver.sinks import CheckpointSink
+
+LENBOX = [6.8, 7.0, 7.2]
+
+def makeStates():
+    """ Positions and velocities of three replicas of 32 particles.
+    """
+    rng = np.random.default_rng(17)
+    r = FCC(cells=2, lenbulk=6.8)()
+    positions = [r + rng.normal(scale=0.05, size=r.shape) for _ in LENBOX]
+    velocities = [rng.normal(scale=1.5, size=r.shape) for _ in LENBOX]
+    return positions, velocities
+
+def run(positions, velocities, boundaries, **kwargs):
+    solver = MDSolver(positions=positions, velocities=velocities,
+                      boundaries=boundaries, T=0.3, dt=0.01, initialdump=None)
+    solver(LennardJones(solver), VelocityVerlet(solver), progress=False, **kwargs)
+    return solver
+
+@pytest.mark.parametrize("boundaries", [Periodic, Reflective])
+@pytest.mark.parametrize("lenbox", ["shared", "per replica"])
+def test_replicas_match_independent_runs(boundaries, lenbox):
+    positions, velocities = makeStates()
+    lengths = LENBOX if lenbox == "per replica" else [LENBOX[0]] * len(LENBOX)
+    batch = run(Replicas(*[SetPositions(r) for r in positions]),
+                VelocityReplicas(*[SetVelocities(v) for v in velocities]),
+                boundaries(lengths if lenbox == "per replica" else LENBOX[0]))
+    assert batch.r.shape[1:] == (len(LENBOX), 32, 3)
+    for k, length in enumerate(lengths):
+        single = run(SetPositions(positions[k]), SetVelocities(velocities[k]),
+                     boundaries(length))
+        np.testing.assert_allclose(batch.r[:,k], single.r, rtol=1e-10, atol=1e-10)
+        np.testing.assert_allclose(batch.v[:,k], single.v, rtol=1e-10, atol=1e-10)
+        np.testing.assert_allclose(batch.u[:,k], single.u, rtol=1e-10)
+
+def test_resumed_replicas_match_uninterrupted_run(tmp_path):
+    filename = str(tmp_path / "replicas.chk")
+    positions, velocities = makeStates()
+    replicas = Replicas(*[SetPositions(r) for r in positions])
+    replicaVelocities = VelocityReplicas(*[SetVelocities(v) for v in velocities])
+    full = run(replicas, replicaVelocities, Periodic(LENBOX))
+
+    killed = MDSolver(positions=replicas, velocities=replicaVelocities,
+                      boundaries=Periodic(LENBOX), T=0.3, dt=0.01, initialdump=None)
+    killed.register(lambda state: state.t == 15)
+    killed(LennardJones(killed), VelocityVerlet(killed),
+           sinks=[CheckpointSink(filename, stride=10)], progress=False)
+
+    resumed = MDSolver.fromCheckpoint(filename)
+    resumed(LennardJones(resumed), VelocityVerlet(resumed), progress=False)
+    np.testing.assert_array_equal(resumed.r[-1], full.r[-1])
+    np.testing.assert_array_equal(resumed.v[-1], full.v[-1])
+    np.testing.assert_array_equal(resumed.u, full.u)
+
+def test_replicas_reject_neighbor_lists():
+    positions, velocities = makeStates()
+    solver = MDSolver(positions=Replicas(*[SetPositions(r) for r in positions]),
+                      boundaries=Periodic(LENBOX[0]), T=0.3, initialdump=None)
+    with pytest.raises(ValueError):
+        LennardJones(solver, neighbors=CellList())
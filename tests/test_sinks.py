@@ -0,0 +1,82 @@
+import threading
+import numpy as np
+import pytest
+
+from mdsolver import MDSolver
+from mdsolver.potential import LennardJones
+from mdsolver.integrator import VelocityVerlet
+from mdsolver.initpositions import FCC
+from mdsolver.initvelocities import Temperature
+from mdsolver.boundaryconditions import Periodic
+from mdsolver.sinks import Sink, MemorySink, EnergySink, ThreadedSink
+
+def makeSolver(**kwargs):
+    """ FCC lattice of 32 particles at 300 K in a periodic box, with a
+    fixed seed such that every solver starts from the same state.
+    """
+    np.random.seed(5)
+    return MDSolver(positions=FCC(cells=2, lenbulk=6.8), velocities=Temperature(300),
+                    boundaries=Periodic(6.8), T=0.5, dt=0.01, initialdump=None,
+                    **kwargs)
+
+def run(solver, sinks):
+    solver(LennardJones(solver), VelocityVerlet(solver), sinks=sinks, progress=False)
+    return solver
+
+@pytest.mark.parametrize("buffersize", [2, 7])
+def test_buffered_run_matches_full_trajectory(buffersize):
+    full = run(makeSolver(), [])
+    memory, energy = MemorySink(stride=5), EnergySink(stride=5)
+    buffered = run(makeSolver(buffersize=buffersize), [memory, energy])
+
+    assert buffered.r.shape[0] == buffersize
+    steps = np.arange(0, full.N + 1, 5)
+    np.testing.assert_array_equal(memory.steps, steps)
+    np.testing.assert_array_equal(memory.r, full.r[steps])
+    np.testing.assert_array_equal(memory.v, full.v[steps])
+    np.testing.assert_array_equal(energy.k, full.kineticEnergy(full.v[steps]))
+
+    # The ring buffer holds the last states of the run
+    np.testing.assert_array_equal(buffered.r[full.N % buffersize], full.r[-1])
+    np.testing.assert_array_equal(buffered.v[full.N % buffersize], full.v[-1])
+
+def test_sinks_store_potential_energy_of_every_state():
+    solver = makeSolver()
+    memory = MemorySink(stride=1, positions=False, velocities=False)
+    run(solver, [memory])
+    assert len(memory.u) == solver.N + 1
+    np.testing.assert_array_equal(memory.u[1:], solver.u)
+    np.testing.assert_allclose(memory.t, np.arange(solver.N + 1) * solver.dt)
+
+def test_threaded_sink_matches_direct_sink():
+    direct = MemorySink(stride=3)
+    run(makeSolver(), [direct])
+    threaded = MemorySink(stride=3)
+    run(makeSolver(), [ThreadedSink(threaded, maxsize=2, flushinterval=0)])
+    np.testing.assert_array_equal(threaded.steps, direct.steps)
+    np.testing.assert_array_equal(threaded.r, direct.r)
+    np.testing.assert_array_equal(threaded.v, direct.v)
+    np.testing.assert_array_equal(threaded.u, direct.u)
+
+class FailingSink(Sink):
+    """ Sink failing at a given step, and recording whether it was closed.
+    """
+    def __init__(self, step):
+        self.stride = 1
+        self.step = step
+        self.closed = False
+
+    def __call__(self, t, r, v, u):
+        if t == self.step:
+            raise IOError("Disk full")
+
+    def close(self):
+        self.closed = True
+
+def test_threaded_sink_raises_writer_errors():
+    threads = threading.active_count()
+    sink = FailingSink(step=5)
+    with pytest.raises(IOError):
+        run(makeSolver(), [ThreadedSink(sink, maxsize=2)])
+    assert sink.closed
+    assert threading.active_count() == threads
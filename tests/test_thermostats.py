@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from mdsolver import MDSolver
+from mdsolver.potential import LennardJones
+from mdsolver.integrator import VelocityVerlet
+from mdsolver.initpositions import FCC, Replicas
+from mdsolver.initvelocities import Temperature
+from mdsolver.boundaryconditions import Periodic
+from mdsolver.thermostats import Thermostat, Berendsen, Langevin, NoseHoover
+from mdsolver.sinks import CheckpointSink
+
+def makeSolver(T=3, positions=None):
+    """ Dense liquid of 108 particles, starting far above 100 K.
+    """
+    np.random.seed(8)
+    return MDSolver(positions=positions or FCC(cells=3, lenbulk=5.1),
+                    velocities=Temperature(300), boundaries=Periodic(5.1),
+                    T=T, dt=0.005, initialdump=None)
+
+def run(solver, thermostat, **kwargs):
+    solver(LennardJones(solver, 2.5), VelocityVerlet(solver, thermostat=thermostat),
+           progress=False, **kwargs)
+    return Thermostat.temperature(solver.v)
+
+THERMOSTATS = {"Berendsen" : lambda **kwargs: Berendsen(100, tau=0.1, **kwargs),
+               "Langevin" : lambda **kwargs: Langevin(100, gamma=5, **kwargs),
+               "NoseHoover" : lambda **kwargs: NoseHoover(100, tau=0.1, **kwargs)}
+
+@pytest.mark.parametrize("thermostat", THERMOSTATS)
+def test_thermostat_reaches_target_temperature(thermostat):
+    T = run(makeSolver(), THERMOSTATS[thermostat]())
+    assert T[0] > 200
+    assert T[len(T)//2:].mean() == pytest.approx(100, rel=0.1)
+
+def test_berendsen_scales_every_replica():
+    solver = makeSolver(T=1, positions=Replicas(FCC(3, 5.1), FCC(3, 5.1)))
+    T = run(solver, Berendsen(100, tau=0.05))
+    assert T.shape[1:] == (2,)
+    np.testing.assert_allclose(T[-50:].mean(axis=0), 100, rtol=0.1)
+
+def test_thermostat_switches_to_nve_after_equilibration():
+    solver = makeSolver(T=1.5)
+    thermostat = Berendsen(100, tau=0.1, steps=100)
+    run(solver, thermostat)
+    assert thermostat.step == 100
+    e = solver.u + solver.kineticEnergy(solver.v[1:])
+    assert np.abs(e[100:] - e[100]).max() < 0.01 * abs(e[100] - e[0])
+
+@pytest.mark.parametrize("thermostat", THERMOSTATS)
+@pytest.mark.parametrize("steps", [None, 40])
+def test_resumed_thermostat_matches_uninterrupted_run(tmp_path, thermostat, steps):
+    filename = str(tmp_path / "run.chk")
+    full = makeSolver(T=0.5)
+    run(full, THERMOSTATS[thermostat](steps=steps))
+
+    killed = makeSolver(T=0.5)
+    killed.register(lambda state: state.t == 70)
+    run(killed, THERMOSTATS[thermostat](steps=steps), sinks=[CheckpointSink(filename, 60)])
+
+    resumed = MDSolver.fromCheckpoint(filename)
+    resumedThermostat = THERMOSTATS[thermostat](steps=steps)
+    run(resumed, resumedThermostat)
+    assert resumedThermostat.step == (full.N if steps is None else steps)
+    np.testing.assert_array_equal(resumed.r[-1], full.r[-1])
+    np.testing.assert_array_equal(resumed.v[-1], full.v[-1])
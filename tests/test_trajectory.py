@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from mdsolver import MDSolver
+from mdsolver.potential import LennardJones
+from mdsolver.integrator import VelocityVerlet
+from mdsolver.initpositions import FCC
+from mdsolver.initvelocities import Temperature
+from mdsolver.boundaryconditions import Periodic
+from mdsolver.trajectory import (TrajectoryWriter, Trajectory,
+                                 CompressedTrajectoryWriter, CompressedTrajectory)
+from mdsolver.sinks import TrajectorySink, CompressedTrajectorySink
+
+def makeFrames(numframes=10, numparticles=20, numdimensions=3):
+    rng = np.random.default_rng(11)
+    return rng.uniform(-5, 5, size=(numframes, numparticles, numdimensions))
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_trajectory_reads_back_written_frames(tmp_path, dtype):
+    filename = str(tmp_path / "r.traj")
+    frames = makeFrames()
+    with TrajectoryWriter(filename, 20, 3, dtype) as writer:
+        for k, r in enumerate(frames):
+            writer.write(r, step=10 * k)
+
+    trajectory = Trajectory(filename)
+    assert len(trajectory) == len(frames)
+    np.testing.assert_array_equal(trajectory.steps, 10 * np.arange(len(frames)))
+    np.testing.assert_array_equal(trajectory[:], frames.astype(dtype))
+    np.testing.assert_array_equal(trajectory[7], frames[7].astype(dtype))
+
+def test_trajectory_appends_frames(tmp_path):
+    filename = str(tmp_path / "r.traj")
+    frames = makeFrames()
+    with TrajectoryWriter(filename, 20, 3, np.float64) as writer:
+        for k in range(4):
+            writer.write(frames[k], step=k)
+    with TrajectoryWriter(filename, 20, 3, np.float64, append=True) as writer:
+        for k in range(4, len(frames)):
+            writer.write(frames[k], step=k)
+
+    trajectory = Trajectory(filename)
+    np.testing.assert_array_equal(trajectory.steps, np.arange(len(frames)))
+    np.testing.assert_array_equal(trajectory[:], frames)
+
+    with pytest.raises(ValueError):
+        TrajectoryWriter(filename, 21, 3, np.float64, append=True)
+
+def test_trajectory_sink_stores_the_run(tmp_path):
+    filename = str(tmp_path / "run.traj")
+    np.random.seed(5)
+    solver = MDSolver(positions=FCC(cells=2, lenbulk=6.8), velocities=Temperature(300),
+                      boundaries=Periodic(6.8), T=0.2, dt=0.01, initialdump=None)
+    solver(LennardJones(solver), VelocityVerlet(solver),
+           sinks=[TrajectorySink(filename, stride=4, dtype=np.float64)], progress=False)
+
+    trajectory = Trajectory(filename)
+    steps = np.arange(0, solver.N + 1, 4)
+    np.testing.assert_array_equal(trajectory.steps, steps)
+    np.testing.assert_array_equal(trajectory[:], solver.r[steps])
+
+def test_trajectory_exports_xyz(tmp_path):
+    filename, dumpfile = str(tmp_path / "r.traj"), str(tmp_path / "r.xyz")
+    frames = makeFrames(numframes=3, numparticles=4)
+    with TrajectoryWriter(filename, 4, 3, np.float64) as writer:
+        for r in frames:
+            writer.write(r)
+    Trajectory(filename).toXYZ(dumpfile)
+
+    with open(dumpfile) as f:
+        lines = f.read().splitlines()
+    assert len(lines) == 3 * (4 + 2)
+    assert lines[0] == "4"
+    r = np.array([line.split()[1:] for line in lines[2:6]], dtype=float)
+    np.testing.assert_array_equal(r, frames[0])
+
+@pytest.mark.parametrize("method", ["zlib", "lzma"])
+@pytest.mark.parametrize("precision", [1e-3, 1e-6])
+def test_compressed_trajectory_reads_back_within_precision(tmp_path, method, precision):
+    filename = str(tmp_path / "r.ztraj")
+    frames = makeFrames()
+    frames[1:] = frames[0] + np.cumsum(1e-2 * frames[1:], axis=0)
+    with CompressedTrajectoryWriter(filename, 20, 3, precision, chunksize=3,
+                                    method=method) as writer:
+        for k, r in enumerate(frames):
+            writer.write(r, step=10 * k)
+
+    trajectory = CompressedTrajectory(filename)
+    assert (trajectory.numparticles, trajectory.numdimensions) == (20, 3)
+    steps, read = zip(*trajectory)
+    np.testing.assert_array_equal(steps, 10 * np.arange(len(frames)))
+    assert np.abs(np.array(read) - frames).max() <= 0.5 * precision * (1 + 1e-6)
+
+def test_compressed_trajectory_rejects_other_files(tmp_path):
+    filename = str(tmp_path / "r.traj")
+    with TrajectoryWriter(filename, 20, 3) as writer:
+        writer.write(makeFrames()[0])
+    with pytest.raises(ValueError):
+        CompressedTrajectory(filename)
+
+def test_compressed_trajectory_sink_stores_the_run(tmp_path):
+    filename = str(tmp_path / "run.ztraj")
+    np.random.seed(5)
+    solver = MDSolver(positions=FCC(cells=2, lenbulk=6.8), velocities=Temperature(300),
+                      boundaries=Periodic(6.8), T=0.2, dt=0.01, initialdump=None)
+    solver(LennardJones(solver), VelocityVerlet(solver),
+           sinks=[CompressedTrajectorySink(filename, stride=2, precision=1e-4,
+                                           chunksize=4)], progress=False)
+
+    steps, read = zip(*CompressedTrajectory(filename))
+    np.testing.assert_array_equal(steps, np.arange(0, solver.N + 1, 2))
+    assert np.abs(np.array(read) - solver.r[list(steps)]).max() <= 0.5e-4 * (1 + 1e-6)